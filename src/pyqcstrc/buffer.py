@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+#
+# PyQCstrc - Python library for Quasi-Crystal structure
+# Copyright (c) 2021 Tsunetomo Yamada <tsunetomo.yamada@rs.tus.ac.jp>
+#
+"""Growable arrays of simplices.
+
+Results of intersection and subtraction are collected a few simplices at
+a time. SimplexBuffer keeps them in an array of which capacity is doubled
+when it is full, so that appending is amortized O(1), and array() returns
+the filled part as a view without copying.
+"""
+import numpy as np
+from numpy.typing import NDArray
+
+class SimplexBuffer:
+    """growable array of (k,)+shape, e.g. (k,4,6,3), (k,3,6,3) or (k,6,3).
+
+    Parameters
+    ----------
+    shape: tuple
+        shape of an element, e.g. (4,6,3) for tetrahedra in TAU-style
+    dtype: data-type
+        The buffer turns into object dtype when an object array (python
+        int, see pyqcstrc.qfield) is appended.
+    capacity: int
+        initial number of elements
+    """
+    def __init__(self, shape: tuple=(4,6,3), dtype=np.int64, capacity: int=16):
+        self.shape=tuple(shape)
+        self._data=np.empty((max(capacity,1),)+self.shape,dtype=dtype)
+        self._size=0
+
+    def __len__(self):
+        return self._size
+
+    def __repr__(self):
+        return 'SimplexBuffer(%d x %s)'%(self._size,self.shape)
+
+    def _reserve(self, size: int, dtype):
+        capacity=len(self._data)
+        dtype=np.result_type(self._data.dtype,dtype)
+        if size>capacity or dtype!=self._data.dtype:
+            while capacity<size:
+                capacity*=2
+            data=np.empty((capacity,)+self.shape,dtype=dtype)
+            data[:self._size]=self._data[:self._size]
+            self._data=data
+
+    def append(self, x: NDArray[np.int64]):
+        """append an element, shape, or a set of elements, (k,)+shape.
+
+        Parameters
+        ----------
+        x: array
+        """
+        x=np.asarray(x)
+        if x.shape==self.shape:
+            x=x[np.newaxis]
+        if x.shape[1:]!=self.shape:
+            print('incorrect shape found in SimplexBuffer.append')
+            return
+        size=self._size+len(x)
+        self._reserve(size,x.dtype)
+        self._data[self._size:size]=x
+        self._size=size
+
+    def array(self) -> NDArray[np.int64]:
+        """elements appended so far, (k,)+shape.
+
+        Returns
+        -------
+        array
+            view of the buffer (not a copy)
+        """
+        return self._data[:self._size]
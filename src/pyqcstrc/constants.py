@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+#
+# PyQCstrc - Python library for Quasi-Crystal structure
+# Copyright (c) 2021 Tsunetomo Yamada <tsunetomo.yamada@rs.tus.ac.jp>
+#
+"""Constants and projection matrices of the 6d lattices.
+
+The projection matrices are built once at import, in exact form and in
+float form, so that every projection is a plain matrix product:
+
+    exact: (6,6,3) matrices of values in TAU-style or SIN-style, used with
+           dot_product_batch() (see pyqcstrc.qfield)
+    float: (6,k) matrices, used as vn@MATRIX
+
+The coefficient (alpha) of the projection matrices is set to be 1
+(see Yamamoto ActaCrystal (1997)).
+"""
+import numpy as np
+
+from pyqcstrc.qfield import normalize_batch
+
+def values(a, b, c):
+    """values (a+b*w)/c of integer matrices a, b and denominator c.
+
+    Parameters
+    ----------
+    a, b: array
+        integer and irrational parts
+    c: int
+        denominator
+
+    Returns
+    -------
+    array, a.shape+(3,)
+    """
+    x=np.empty(np.shape(a)+(3,),dtype=np.int64)
+    x[...,0]=a
+    x[...,1]=b
+    x[...,2]=c
+    return normalize_batch(x)
+
+#----------------------------
+# Icosahedral (pyqcstrc.ico2), TAU-style
+#----------------------------
+TAU=(1+np.sqrt(5))/2.0
+
+# projection onto (x,y,z) in Epar and (x,y,z) in Eperp, INT+TAU*TAU_PART
+ICO_EPAR_INT=np.array([[ 1, 0, 0, 0,-1, 0],\
+                       [ 0, 0, 0, 1, 0, 1],\
+                       [ 0, 1,-1, 0, 0, 0]],dtype=np.int64)
+ICO_EPAR_TAU=np.array([[ 0, 1, 1, 0, 0, 0],\
+                       [ 1, 0, 0, 0, 1, 0],\
+                       [ 0, 0, 0,-1, 0, 1]],dtype=np.int64)
+ICO_EPERP_INT=np.array([[ 0,-1,-1, 0, 0, 0],\
+                        [-1, 0, 0, 0,-1, 0],\
+                        [ 0, 0, 0, 1, 0,-1]],dtype=np.int64)
+ICO_EPERP_TAU=np.array([[ 1, 0, 0, 0,-1, 0],\
+                        [ 0, 0, 0, 1, 0, 1],\
+                        [ 0, 1,-1, 0, 0, 0]],dtype=np.int64)
+
+# exact, rows 0-2: Epar, rows 3-5: Eperp
+ICO_PROJECTION=values(np.vstack([ICO_EPAR_INT,ICO_EPERP_INT]),np.vstack([ICO_EPAR_TAU,ICO_EPERP_TAU]),1)
+# float, vn@ICO_PROJECTION_NUMERICAL = [vn@INT.T | vn@TAU_PART.T]. The two
+# parts are kept apart so that the result is identical to the explicit
+# formula, (vn0-vn4)+TAU*(vn1+vn2), ...
+ICO_PROJECTION_NUMERICAL=np.hstack([np.vstack([ICO_EPAR_INT,ICO_EPERP_INT]).T,\
+                                    np.vstack([ICO_EPAR_TAU,ICO_EPERP_TAU]).T]).astype(np.float64)
+ICO_PROJECTION3_NUMERICAL=ICO_PROJECTION_NUMERICAL[:,[3,4,5,9,10,11]]
+
+# 6d indices of the projection onto Eperp, (5*I-S+2*TAU*S)/10,
+# where the diagonal is 1/2 and the others are +-TAU/2/(2+TAU).
+ICO_PERP_SIGN=np.array([[ 0,-1,-1,-1,-1,-1],\
+                        [-1, 0,-1, 1, 1,-1],\
+                        [-1,-1, 0,-1, 1, 1],\
+                        [-1, 1,-1, 0,-1, 1],\
+                        [-1, 1, 1,-1, 0,-1],\
+                        [-1,-1, 1, 1,-1, 0]],dtype=np.int64)
+ICO_PROJECTION_PERP=values(5*np.identity(6,dtype=np.int64)-ICO_PERP_SIGN,2*ICO_PERP_SIGN,10)
+
+#----------------------------
+# Dodecagonal (pyqcstrc.dode2), SIN-style
+#----------------------------
+SIN=np.sqrt(3)/2.0
+
+# projection onto (x,y,z) in Epar and (x,y,z) in Eperp, (INT+SIN*SIN_PART)/2
+DODE_EPAR_INT=np.array([[ 0, 2, 0,-1, 0, 0],\
+                        [-1, 0, 2, 0, 0, 0],\
+                        [ 0, 0, 0, 0, 2, 0]],dtype=np.int64)
+DODE_EPAR_SIN=np.array([[ 2, 0, 0, 0, 0, 0],\
+                        [ 0, 0, 0, 2, 0, 0],\
+                        [ 0, 0, 0, 0, 0, 0]],dtype=np.int64)
+DODE_EPERP_INT=np.array([[ 0, 2, 0,-1, 0, 0],\
+                         [-1, 0, 2, 0, 0, 0],\
+                         [ 0, 0, 0, 0, 0, 2]],dtype=np.int64)
+DODE_EPERP_SIN=np.array([[-2, 0, 0, 0, 0, 0],\
+                         [ 0, 0, 0,-2, 0, 0],\
+                         [ 0, 0, 0, 0, 0, 0]],dtype=np.int64)
+
+# exact, rows 0-2: Epar, rows 3-5: Eperp (z in Eperp is a dummy)
+DODE_PROJECTION=values(np.vstack([DODE_EPAR_INT,DODE_EPERP_INT]),np.vstack([DODE_EPAR_SIN,DODE_EPERP_SIN]),2)
+# float, vn@DODE_PROJECTION_NUMERICAL
+DODE_PROJECTION_NUMERICAL=((np.vstack([DODE_EPAR_INT,DODE_EPERP_INT])+SIN*np.vstack([DODE_EPAR_SIN,DODE_EPERP_SIN]))/2.0).T
+DODE_PROJECTION3_NUMERICAL=DODE_PROJECTION_NUMERICAL[:,3:]
@@ -35,6 +35,10 @@ from pyqcstrc.dode2.numericalc import (numeric_value,
                                     check_intersection_two_segment_numerical,
                                     inside_outside_triangle,
                                     inside_outside_triangle_tau,
+                                    check_intersection_segment_surface_numerical_batch,
+                                    check_intersection_segment_surface_numerical_6d_tau_batch,
+                                    inside_outside_triangle_batch,
+                                    inside_outside_triangle_tau_batch,
                                     on_out_surface,
                                     )
 from pyqcstrc.dode2.utils import (remove_doubling_in_perp_space,
@@ -47,7 +51,6 @@ from pyqcstrc.dode2.utils import (remove_doubling_in_perp_space,
                                 generate_convex_hull,
                                 )
 
-TAU=np.sqrt(3)/2.0
 EPS=1e-6
 
 def ball_radius_obj(obj: NDArray[np.int64], centroid: NDArray[np.int64]) -> float:
@@ -191,6 +194,32 @@ def check_intersection_two_triangles(triangle_1: NDArray[np.int64], triangle_2:
         else:
             return 0 # no intersection
 
+def check_intersection_two_triangles_batch(obj1: NDArray[np.int64], obj2: NDArray[np.int64]) -> NDArray[np.int64]:
+    """check_intersection_two_triangles() for all pairs of triangles in two objects.
+    
+    Parameters
+    ----------
+    obj1: array, (n1,3,6,3)
+    obj2: array, (n2,3,6,3)
+        triangles in TAU-style
+    
+    Returns
+    -------
+    flag: array, (n1,n2)
+        1 (obj1[i] is fully inside obj2[j]), 2 (obj2[j] is fully inside obj1[i]),
+        3 (intersecting), 0 (no intersection)
+    """
+    p1=get_internal_component_sets_numerical(obj1) # (n1,3,3)
+    p2=get_internal_component_sets_numerical(obj2) # (n2,3,3)
+    inside1=np.all(inside_outside_triangle_batch(p1[:,np.newaxis],p2[np.newaxis,:,np.newaxis]),axis=2)
+    inside2=np.all(inside_outside_triangle_batch(p2[np.newaxis],p1[:,np.newaxis,np.newaxis]),axis=2)
+    comb=[[0,1],[0,2],[1,2]]
+    e1=p1[:,comb][:,np.newaxis] # (n1,1,3,2,3)
+    e2=p2[:,comb][np.newaxis]   # (1,n2,3,2,3)
+    cross=np.any(check_intersection_segment_surface_numerical_batch(e1,p2[np.newaxis,:,np.newaxis]),axis=2)
+    cross|=np.any(check_intersection_segment_surface_numerical_batch(e2,p1[:,np.newaxis,np.newaxis]),axis=2)
+    return np.where(inside1,1,np.where(inside2,2,np.where(cross,3,0)))
+
 def intersection_two_segment(segment_1: NDArray[np.int64], segment_2: NDArray[np.int64]) -> NDArray[np.int64]:
     """check intersection between two line segments.
     
@@ -386,23 +415,19 @@ def intersection_two_triangles(triangle_1: NDArray[np.int64], triangle_2: NDArra
     tmp=tmp.reshape(int(len(tmp)/6),6,3)
     
     # get vertces of triangle_1 that are inside triangle_2
-    for vtx in triangle_1:
-        if inside_outside_triangle_tau(vtx,triangle_2): # inside
-            if counter==0:
-                tmp=vtx.reshape(1,6,3)
-            else:
-                tmp=np.vstack([tmp,[vtx]])
-            counter+=1
+    for vtx in triangle_1[inside_outside_triangle_tau_batch(triangle_1,triangle_2)]: # inside
+        if counter==0:
+            tmp=vtx.reshape(1,6,3)
+        else:
+            tmp=np.vstack([tmp,[vtx]])
+        counter+=1
     # get vertces of triangle_2 that are inside triangle_1
-    for vtx in triangle_2:
-        if inside_outside_triangle_tau(vtx,triangle_1): # inside
-            if counter==0:
-                tmp=vtx.reshape(1,6,3)
-            else:
-                tmp=np.vstack([tmp,[vtx]])
-            counter+=1
+    for vtx in triangle_2[inside_outside_triangle_tau_batch(triangle_2,triangle_1)]: # inside
+        if counter==0:
+            tmp=vtx.reshape(1,6,3)
         else:
-            pass
+            tmp=np.vstack([tmp,[vtx]])
+        counter+=1
     
     if counter>=3:
         tmp=remove_doubling_in_perp_space(tmp)
@@ -463,8 +488,9 @@ def intersection_two_obj_1(obj1: NDArray[np.int64],obj2: NDArray[np.int64],selec
             if verbose>0:
                 print("          Rough_check:True")
             counter1=0
+            flags=check_intersection_two_triangles_batch(triangle1.reshape(1,3,6,3),obj2)[0]
             for i2,triangle2 in enumerate(obj2):
-                flag=check_intersection_two_triangles(triangle1,triangle2)
+                flag=flags[i2]
                 if verbose>0:
                     print("          %d-th triangle in obj2, flag:%d"%(i2,flag))
                 #
@@ -601,56 +627,18 @@ def intersection_two_obj_convex(obj1: NDArray[np.int64], obj2: NDArray[np.int64]
     # (1) Extract vertces of 2nd OD which are insede 1st OD --> point_a1
     #     Extract vertces of 2nd OD which are outsede 1st OD --> point_b2
     #
-    counter1a=0
-    #counter2a=0
     vertices1=remove_doubling_in_perp_space(obj1_edge) # generating vertces of 1st OD
-    for vrtx in vertices1:
-        counter2a=0
-        for triangle2 in obj2:
-            if inside_outside_ttriangle_tau(vrtx,triangle2):
-                counter2a+=1
-                break
-            else:
-                pass
-        if counter2a>0:
-            if counter1a==0:
-                point_a1=vrtx.reshape(1,6,3)
-            else:
-                point_a1=np.vstack([point_a1,[vrtx]])
-            counter1a+=1
-        #else:
-        #    if counter2==0:
-        #        point_b2=vrtx.reshape(1,6,3)
-        #    else:
-        #        point_b2=np.vstack([point_b2,[vrtx]])
-        #    counter2+=1
+    mask=np.any(inside_outside_triangle_tau_batch(vertices1[:,np.newaxis],obj2[np.newaxis]),axis=1)
+    point_a1=vertices1[mask]
+    counter1a=len(point_a1)
     #
     # (2) Extract vertces of 1st OD which are insede 2nd OD --> point_b1
     #     Extract vertces of 1st OD which are outsede 2nd OD --> point_a2
     #
-    counter1b=0
-    #counter2b=0
     vertices2=remove_doubling_in_perp_space(obj2_edge) # generating vertces of 2nd OD
-    for vrtx in vertices2:
-        counter2b=0
-        for triangle1 in obj1:
-            if inside_outside_triangle_tau(vrtx,triangle1):
-                counter2b+=1
-                break
-            else:
-                pass
-        if counter2b>0:
-            if counter1b==0:
-                point_b1=vrtx.reshape(1,6,3)
-            else:
-                point_b1=np.vstack([point_b1,[vrtx]])
-            counter1b+=1
-        #else:
-        #    if counter2==0:
-        #        point_a2=vrtx.reshape(1,6,3)
-        #    else:
-        #        point_a2=np.vstack([point_a2,[vrtx]])
-        #    counter2+=1
+    mask=np.any(inside_outside_triangle_tau_batch(vertices2[:,np.newaxis],obj1[np.newaxis]),axis=1)
+    point_b1=vertices2[mask]
+    counter1b=len(point_b1)
     if counter1a==len(vertices1): # obj1 is fully inside obj2
         return obj1
     elif counter1b==len(vertices2): # obj2 is fully inside obj1
@@ -659,32 +647,17 @@ def intersection_two_obj_convex(obj1: NDArray[np.int64], obj2: NDArray[np.int64]
         #
         # (3) Get intersecting points between obj1 and obj2
         #
-        counter=0
-        for tr1 in obj1_surf:
-            for ed2 in obj2_edge:
-                if check_intersection_segment_surface_numerical_6d_tau(ed2,tr1): # intersection
-                    tmp=intersection_segment_surface(ed2,tr1)
-                    if counter==0:
-                        p=tmp
-                    else:
-                        p=np.vstack([p,tmp])
-                    counter+=1
-                else:
-                    pass
-        for tr2 in obj2_surf:
-            for ed1 in obj1_edge:
-                if check_intersection_segment_surface_numerical_6d_tau(ed1,tr2): # intersection
-                    tmp=intersection_segment_surface(ed1,tr2)
-                    if counter==0:
-                        p=tmp
-                    else:
-                        p=np.vstack([p,tmp])
-                    counter+=1
-                else:
-                    pass
-        if counter==0:
+        p=[]
+        for edge,surf in [(obj2_edge,obj1_surf),(obj1_edge,obj2_surf)]:
+            hit=check_intersection_segment_surface_numerical_6d_tau_batch(edge[np.newaxis],surf[:,np.newaxis])
+            for i1,i2 in zip(*np.nonzero(hit)): # intersection
+                tmp=intersection_segment_surface(edge[i2],surf[i1])
+                if np.all(tmp!=None):
+                    p.append(tmp)
+        if len(p)==0:
             return 
         else:
+            p=np.vstack(p).reshape(-1,6,3)
             point1=remove_doubling_in_perp_space(p)
             #
             # (3) Sum point A, point B and Intersections --->>> common part
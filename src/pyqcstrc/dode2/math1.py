@@ -4,13 +4,76 @@
 # Copyright (c) 2021 Tsunetomo Yamada <tsunetomo.yamada@rs.tus.ac.jp>
 #
 import sys
+import warnings
 import numpy as np
 from numpy.typing import NDArray
 #sys.path.append('.')
 #from numericalc import coplanar_check_numeric_tau
 from pyqcstrc.dode2.numericalc import coplanar_check_numeric_tau
+from pyqcstrc import qfield
+from pyqcstrc.qfield import (set_overflow_check,
+                            overflow_count,
+                            reset_overflow_count,
+                            add_batch,
+                            )
+from pyqcstrc.constants import (DODE_PROJECTION,
+                                )
+
+# SIN-style, (a+b*SIN)/c, where 4*SIN**2 = 3 (see pyqcstrc.qfield)
+FIELD=(3,0,4)
+
+def mul_batch(a: NDArray[np.int64], b:NDArray[np.int64], normalize: bool=True) -> NDArray[np.int64]:
+    """
+    # multiplication (a*b) of sets of values in SIN-style
+    
+    Parameters
+    ----------
+    a: array, (...,3)
+        values in SIN-style
+    b: array, (...,3)
+        values in SIN-style, broadcastable with a
+    normalize: bool
+        False: the gcd reduction is deferred (see pyqcstrc.qfield.lazy_reduce).
+    
+    Returns
+    -------
+    array, (...,3)
+    """
+    return qfield.mul_batch(a,b,FIELD,normalize)
+
+def div_batch(a: NDArray[np.int64], b:NDArray[np.int64], normalize: bool=True) -> NDArray[np.int64]:
+    """
+    # division (a/b) of sets of values in SIN-style
+    
+    Parameters
+    ----------
+    a: array, (...,3)
+        values in SIN-style
+    b: array, (...,3)
+        values in SIN-style, broadcastable with a
+    normalize: bool
+        False: the gcd reduction is deferred (see pyqcstrc.qfield.lazy_reduce).
+    
+    Returns
+    -------
+    array, (...,3)
+    """
+    return qfield.div_batch(a,b,FIELD,normalize)
 
-SIN=np.sqrt(3)/2
+def sign_batch(x: NDArray[np.int64]) -> NDArray[np.int64]:
+    """exact sign of a set of values in SIN-style.
+    
+    Parameters
+    ----------
+    x: array, (...,3)
+        values in SIN-style
+    
+    Returns
+    -------
+    array, (...)
+        -1, 0 or 1
+    """
+    return qfield.sign_batch(x,FIELD)
 
 def add(a: NDArray[np.int64], b:NDArray[np.int64]) -> NDArray[np.int64]:
     """
@@ -27,18 +90,7 @@ def add(a: NDArray[np.int64], b:NDArray[np.int64]) -> NDArray[np.int64]:
     -------
     array
     """
-    c1=a[0]*b[2]+b[0]*a[2]
-    c2=a[1]*b[2]+b[1]*a[2]
-    c3=a[2]*b[2]
-    x=np.array([c1,c2,c3],dtype=np.int64)
-    g=np.gcd.reduce(x)
-    c1=int(c1/g)
-    c2=int(c2/g)
-    c3=int(c3/g)
-    if c3<0:
-        return np.array([-c1,-c2,-c3])
-    else:
-        return np.array([c1,c2,c3])
+    return add_batch(a,b)
 
 def mul(a: NDArray[np.int64], b:NDArray[np.int64]) -> NDArray[np.int64]:
     """
@@ -55,18 +107,7 @@ def mul(a: NDArray[np.int64], b:NDArray[np.int64]) -> NDArray[np.int64]:
     -------
     array
     """
-    c1=4*a[0]*b[0]+3*a[1]*b[1]
-    c2=4*(a[0]*b[1]+a[1]*b[0])
-    c3=4*a[2]*b[2]
-    x=np.array([c1,c2,c3],dtype=np.int64)
-    g=np.gcd.reduce(x)
-    c1=int(c1/g)
-    c2=int(c2/g)
-    c3=int(c3/g)
-    if c3<0:
-        return np.array([-c1,-c2,-c3])
-    else:
-        return np.array([c1,c2,c3])
+    return mul_batch(a,b)
 
 def sub(a: NDArray[np.int64], b:NDArray[np.int64]) -> NDArray[np.int64]:
     """
@@ -102,44 +143,7 @@ def div(a: NDArray[np.int64], b:NDArray[np.int64]) -> NDArray[np.int64]:
     -------
     array
     """
-    if np.all(b[:2]==0):
-        print('ERROR_1:division error')
-        return 
-    else:
-        if np.all(a[:2]==0):
-            return np.array([0,0,1],dtype=np.int64)
-        else:
-            if b[1]!=0:
-                if b[0]!=0:
-                    if 4*b[0]**2-3*b[1]**2!=0:
-                        c1=b[2]*(4*a[0]*b[0]-3*a[1]*b[1])
-                        c2=-4*b[2]*(a[0]*b[1]-a[1]*b[0])
-                        c3=a[2]*(4*b[0]**2-3*b[1]**2)
-                    else:
-                        c1=3*a[1]*b[2]
-                        c2=4*a[0]*b[2]
-                        c3=6*a[2]*b[1]
-                else:
-                    c1=3*a[1]*b[2]
-                    c2=4*a[0]*b[2]
-                    c3=3*a[2]*b[1]
-            else:
-                c1=a[0]*b[2]
-                c2=a[1]*b[2]
-                c3=b[0]*a[2]
-            x=np.array([c1,c2,c3],dtype=np.int64)
-            g=np.gcd.reduce(x)
-            if g!=0:
-                c1=int(c1/g)
-                c2=int(c2/g)
-                c3=int(c3/g)
-                if c3<0:
-                    return np.array([-c1,-c2,-c3],dtype=np.int64)
-                else:
-                    return np.array([c1,c2,c3],dtype=np.int64)
-            else:
-                print('ERROR_2:division error')
-                return 
+    return div_batch(a,b)
 
 def add_vectors(vt1: NDArray[np.int64], vt2:NDArray[np.int64]) -> NDArray[np.int64]:
     """Composition of two vectors, v1+v2
@@ -421,20 +425,9 @@ def projection(vt: NDArray[np.int64]) -> NDArray[np.int64]:
     -------
     array containing two 3d vectors projected onto Epar and Eperp in SIN-style.
     """
-    M0=np.array([ 0, 0, 1])
-    M1=np.array([ 1, 0, 1])
-    M2=np.array([-1, 0, 1])
-    M3=np.array([ 1, 0, 2])
-    M4=np.array([-1, 0, 2])
-    M5=np.array([ 0, 1, 1])
-    M6=np.array([ 0,-1, 1])
-    v1e=mtrixcal(M5,M1,M0,M4,M0,M0,vt) # sin,1,0,-0.5,0,0
-    v2e=mtrixcal(M4,M0,M1,M5,M0,M0,vt) # -0.5,0,1,sin,0,0
-    v1i=mtrixcal(M6,M1,M0,M4,M0,M0,vt) # -sin,1,0,-0.5,0,0
-    v2i=mtrixcal(M4,M0,M1,M6,M0,M0,vt) # -0.5,0,1,-sin,0,0
-    v3e=mtrixcal(M0,M0,M0,M0,M1,M0,vt) # 0,0,0,0,1,0
-    v3i=mtrixcal(M0,M0,M0,M0,M0,M1,vt) # 0,0,0,0,0,1
-    return np.array([[v1e,v2e,v3e],[v1i,v2i,v3i]],dtype=np.int64)
+    vt=qfield.as_array(vt)
+    v=qfield.dot_product_batch(DODE_PROJECTION,vt[...,np.newaxis,:],FIELD)
+    return v.reshape(vt.shape[:-2]+(2,3,3))
 
 def projection3(vt: NDArray[np.int64]) -> NDArray[np.int64]:
     """projection of a 6d vector onto Eperp in "SIN-style"
@@ -451,20 +444,8 @@ def projection3(vt: NDArray[np.int64]) -> NDArray[np.int64]:
     -------
     3d vectors projected onto Eperp in TAU-style.
     """
-    M0=np.array([ 0, 0, 1])
-    M1=np.array([ 1, 0, 1])
-    M2=np.array([-1, 0, 1])
-    M3=np.array([ 1, 0, 2])
-    M4=np.array([-1, 0, 2])
-    M5=np.array([ 0, 1, 1])
-    M6=np.array([ 0,-1, 1])
-    #v1e=mtrixcal(M5,M1,M0,M4,M0,M0,vt) # sin,1,0,-0.5,0,0
-    #v2e=mtrixcal(M4,M0,M1,M5,M0,M0,vt) # -0.5,0,1,sin,0,0
-    v1i=mtrixcal(M6,M1,M0,M4,M0,M0,vt) # -sin,1,0,-0.5,0,0
-    v2i=mtrixcal(M4,M0,M1,M6,M0,M0,vt) # -0.5,0,1,-sin,0,0
-    #v3e=mtrixcal(M0,M0,M0,M0,M1,M0,vt) # 0,0,0,0,1,0
-    v3i=mtrixcal(M0,M0,M0,M0,M0,M1,vt) # 0,0,0,0,0,1
-    return np.array([v1i,v2i,v3i],dtype=np.int64)
+    vt=qfield.as_array(vt)
+    return qfield.dot_product_batch(DODE_PROJECTION[3:],vt[...,np.newaxis,:],FIELD)[...,0,:]
 
 def projection_perp(vt: NDArray[np.int64]) -> NDArray[np.int64]:
     """This returns 6D indeces of a projection of 6D vector (v) onto Eperp
@@ -480,34 +461,6 @@ def projection_perp(vt: NDArray[np.int64]) -> NDArray[np.int64]:
     """
     return 
 
-def mtrixcal(m1: NDArray[np.int64],m2: NDArray[np.int64],m3: NDArray[np.int64],m4: NDArray[np.int64],m5: NDArray[np.int64],m6: NDArray[np.int64],v: NDArray[np.int64]) -> NDArray[np.int64]:
-    """function used in projection()
-                        projection3()
-                        projection_perp()
-    
-    Parameters
-    ----------
-    m1,m2,m3,m4,m5,m6:array for projection materix
-    v: array
-        6-dimensional vector in TAU-style
-
-    Returns
-    -------
-    6d vectors projected onto Eperp in TAU-style.
-    """
-    a1=mul(m1,v[0])
-    a2=mul(m2,v[1])
-    a3=mul(m3,v[2])
-    a4=mul(m4,v[3])
-    a5=mul(m5,v[4])
-    a6=mul(m6,v[5])
-    a1=add(a1,a2)
-    a1=add(a1,a3)
-    a1=add(a1,a4)
-    a1=add(a1,a5)
-    a1=add(a1,a6)
-    return a1
-
 def centroid(obj: NDArray[np.int64]) -> NDArray[np.int64]:
     """geometric center, centroid of tetrahedron, triangle or edge, in TAU-style.
 
@@ -555,16 +508,18 @@ def centroid_obj(obj: NDArray[np.int64]) -> NDArray[np.int64]:
         tmp=add_vectors(tmp,p)
     return mul_vector(tmp,np.array([1,0,len(obj)]))
 
-def coplanar_check(p: NDArray[np.int64],num_iteration: int=5) -> bool:
+def coplanar_check(p: NDArray[np.int64],num_iteration: int=None) -> bool:
     """Check whether a given set of points (in TAU-style) is coplanar or not.
     
-    メモ：xyz1とxyz2の選び方次第で、outer_product(v1,v2)が小さくなりcoplanarと間違って判定する場合がある。
-    これを避けるために適切なxyz1とxyz2の選び方が必要。以下では、ランダムにxyz1とxyz2の選ぶ。
+    メモ：点の組からランダムに選んだ３点の外積を使う判定は、選び方次第でcoplanarと間違うことがあった。
+    現在はcoplanar_check_numeric_tau()で点の組全体のrankを用いて判定する（乱数は使わない）。
     
     Parameters
     ----------
     p: array
         a set of pointsin TAU-style.
+    num_iteration: int
+        deprecated and not used. A DeprecationWarning is issued when it is given.
 
     Returns
     -------
@@ -613,7 +568,9 @@ def coplanar_check(p: NDArray[np.int64],num_iteration: int=5) -> bool:
     else:
         return True # coplanar
     """
-    return coplanar_check_numeric_tau(p,num_iteration)
+    if num_iteration is not None:
+        warnings.warn('num_iteration is deprecated and not used; the test is deterministic.',DeprecationWarning,stacklevel=2)
+    return coplanar_check_numeric_tau(p)
 
 def matrixpow(ma: NDArray[np.int64], n: int) -> NDArray[np.int64]:
     """
@@ -3,14 +3,28 @@
 # PyQCstrc - Python library for Quasi-Crystal structure
 # Copyright (c) 2021 Tsunetomo Yamada <tsunetomo.yamada@rs.tus.ac.jp>
 #
+import warnings
 import numpy as np
 from numpy.typing import NDArray
-import random
 
-TAU=np.sqrt(3)/2.0
-EPS=1e-6
+from pyqcstrc.constants import (SIN as TAU,
+                                DODE_PROJECTION_NUMERICAL,
+                                DODE_PROJECTION3_NUMERICAL,
+                                )
 
-def coplanar_check_numeric_tau(pts: NDArray[np.int64], num_iteration: int=5) -> bool:
+EPS=1e-6
+# relative tolerance of the smallest singular value (see coplanar_check_numeric_batch())
+COPLANAR_TOL=1e-9
+# relative error bound of the float areas (see obj_volume_6d_numerical())
+VOLUME_TOL=1e-12
+
+# Projection of 6d vectors, vn@PROJECTION_MATRIX_NUMERICAL = (x,y,z) in Epar and
+# (x,y,z) in Eperp, where z in Eperp is a dummy (see pyqcstrc.constants,
+# projection_numerical()).
+PROJECTION_MATRIX_NUMERICAL=DODE_PROJECTION_NUMERICAL
+PROJECTION3_MATRIX_NUMERICAL=DODE_PROJECTION3_NUMERICAL
+
+def coplanar_check_numeric_tau(pts: NDArray[np.int64], num_iteration: int=None) -> bool:
     """check the points (pts) are in coplanar or not
     
     Parameters
@@ -18,68 +32,73 @@ def coplanar_check_numeric_tau(pts: NDArray[np.int64], num_iteration: int=5) ->
     pns: array
         6d coordinates of the points, xyz, in TAU-style
     num_iteration: int
-        number of iterations.
+        deprecated and not used. A DeprecationWarning is issued when it is given.
     
     Returns
     -------
     bool
     
     """
+    if num_iteration is not None:
+        warnings.warn('num_iteration is deprecated and not used; the test is deterministic.',DeprecationWarning,stacklevel=2)
     p=get_internal_component_sets_numerical(pts)
-    return coplanar_check_numeric(p,num_iteration)
+    return coplanar_check_numeric(p)
 
-def coplanar_check_numeric(pns: NDArray[np.float64],num_iteration: int=5) -> bool:
+def coplanar_check_numeric(pns: NDArray[np.float64],num_iteration: int=None) -> bool:
     """check the points (pns) are in coplanar or not
-    メモ：xyz1とxyz2の選び方次第で、outer_product(v1,v2)が小さくなりcoplanarと間違って判定する場合がある。
-    これを避けるために適切なxyz1とxyz2の選び方が必要。以下では、ランダムにxyz1とxyz2の選ぶ。
     
     Parameters
     ----------
     pns: array
         coordinate of the points in Eperp, xyz.
     num_iteration: int
-        number of iterations.
+        deprecated and not used (it was the number of the former random
+        samplings). A DeprecationWarning is issued when it is given.
     
     Returns
     -------
     bool
     """
-    num=len(pns)
-    if num>3:
-        flag=0
-        lst0=[i for i in range(num)]
-        for _ in range(num_iteration):
-            lst3=random.sample(lst0, 3)
-            #
-            xyz1=pns[lst3[1]]-pns[lst3[0]]
-            xyz2=pns[lst3[2]]-pns[lst3[0]]
-            vec=np.cross(xyz1,xyz2)
-            flg=0
-            if np.all(abs(vec)<EPS):
-                pass
-            else:
-                flag=1
-                break
-        if flag==1:
-            counter=0
-            lst=list(filter(lambda x: x not in lst3, lst0))
-            for i in lst:
-            #for i in list(filter(lambda x: x not in lst3, lst0)):
-                xyzi=pns[i]-pns[lst3[0]]
-                if abs(np.dot(vec,xyzi))<1e-10:
-                    pass
-                else:
-                    counter=1
-                    break
-            if counter==0:
-                return True
-            else:
-                return False
-        else:
-            'error in coplanar_check_numeric. increase num_iteration.'
-            return 
-    else:
-        return True
+    if num_iteration is not None:
+        warnings.warn('num_iteration is deprecated and not used; the test is deterministic.',DeprecationWarning,stacklevel=2)
+    return bool(coplanar_check_numeric_batch(pns))
+
+def coplanar_check_numeric_tau_batch(pts: NDArray[np.int64]) -> NDArray[np.bool_]:
+    """check the groups of points are in coplanar or not (see coplanar_check_numeric_batch()).
+    
+    Parameters
+    ----------
+    pts: array, (...,k,6,3)
+        groups of k points in TAU-style
+    
+    Returns
+    -------
+    array of bool, (...)
+    """
+    return coplanar_check_numeric_batch(get_internal_component_sets_numerical(pts))
+
+def coplanar_check_numeric_batch(pns: NDArray[np.float64]) -> NDArray[np.bool_]:
+    """check the groups of points are in coplanar or not
+    
+    The points are coplanar when the rank of their displacements from the mean
+    is 2 or less, i.e. when the smallest singular value is negligible compared
+    with the largest one. A pair of triangles is given as a group of 6 points.
+    
+    Parameters
+    ----------
+    pns: array, (...,k,3)
+        groups of k points in Eperp, xyz.
+    
+    Returns
+    -------
+    array of bool, (...)
+    """
+    pns=np.asarray(pns,dtype=np.float64)
+    if pns.shape[-2]<=3:
+        return np.ones(pns.shape[:-2],dtype=bool)
+    d=pns-pns.mean(axis=-2,keepdims=True)
+    sv=np.linalg.svd(d,compute_uv=False)
+    return sv[...,2]<=COPLANAR_TOL*sv[...,0]
 
 def point_on_segment(point: NDArray[np.int64], line_segment: NDArray[np.int64]) -> bool:
     """judge whether a point is on a line segment, A-B, or not.
@@ -179,36 +198,29 @@ def numerical_vector(vt: NDArray[np.int64]) -> NDArray[np.int64]:
 
     Parameters
     ----------
-    vt: array
+    vt: array, (...,3)
         vector in TAU-style
     
     Returns
     -------
-    array
+    array, (...)
     """
-    n=len(vt)
-    w=np.zeros(n,dtype=np.float64)
-    for i in range(n):
-        w[i]=numeric_value(vt[i])
-    return w
+    vt=np.asarray(vt)
+    return np.asarray((vt[...,0]+vt[...,1]*TAU)/vt[...,2],dtype=np.float64)
 
 def numerical_vectors(vts: NDArray[np.int64]) -> NDArray[np.int64]:
-    """Numeric value of a TAU-style vector, v.
+    """Numeric value of a set of TAU-style vectors.
 
     Parameters
     ----------
-    vts: array
-        vector in TAU-style
+    vts: array, (...,n,3)
+        vectors in TAU-style
     
     Returns
     -------
-    array
+    array, (...,n)
     """
-    n1,n2,_=vts.shape
-    w=np.zeros((n1,n2),dtype=np.float64)
-    for i1 in range(n1):
-        w[i1]=numerical_vector(vts[i1])
-    return w
+    return numerical_vector(vts)
 
 def length_numerical(vt: NDArray[np.int64]) -> float:
     """numerical value of norm of vector, v, in Tau-style
@@ -570,18 +582,53 @@ def inside_outside_triangle(point: NDArray[np.float64], triangle: NDArray[np.flo
 
 
 
-def obj_volume_6d_numerical(obj: NDArray[np.int64]) -> float:
+def obj_volume_6d_numerical(obj: NDArray[np.int64], threshold: float=None, return_each: bool=False):
     """This function returns volume of an object (set of triangle).
         
     Parameters
     ----------
     object: array
         6-dimensional vertex coordinates of triangle.
+    threshold: float
+        When the float area is as close to threshold as its error bound,
+        it is replaced by the numeric value of the exact area (utils.obj_area_6d()).
+    return_each: bool
+        True: the areas of the triangles are returned as well.
+    
+    Returns
+    -------
+    vol: float
+    vols: array, (n)
+        when return_each=True
+    """
+    xyz=get_internal_component_sets_numerical(np.asarray(obj).reshape(-1,3,6,3))
+    vols=triangle_area_numerical_batch(xyz)
+    vol=vols.sum()
+    if threshold is not None:
+        # |cross product| is bounded by the product of the lengths of the edges
+        e=np.linalg.norm(xyz[:,1:]-xyz[:,:1],axis=2)
+        err=VOLUME_TOL*(np.prod(e,axis=1).sum()/2.0+abs(threshold))
+        if abs(vol-threshold)<=err:
+            from pyqcstrc.dode2.utils import obj_area_6d
+            vol=numeric_value(obj_area_6d(obj))
+    if return_each:
+        return vol,vols
+    else:
+        return vol
+
+def triangles_volume_6d_numerical(obj: NDArray[np.int64]) -> NDArray[np.float64]:
+    """areas of a set of triangles.
+        
+    Parameters
+    ----------
+    obj: array, (n,3,6,3)
+        6-dimensional vertex coordinates of triangles in TAU-style.
+    
+    Returns
+    -------
+    array, (n)
     """
-    vol=0
-    for triangle in obj:
-        vol+=triangle_volume_6d_numerical(triangle)
-    return vol
+    return triangle_area_numerical_batch(get_internal_component_sets_numerical(obj))
 
 def triangle_volume_6d_numerical(triangle: NDArray[np.int64]) -> float:
     """This function returns volume of a triangle
@@ -658,63 +705,191 @@ def projection_numerical(vn: NDArray[np.float64]) -> NDArray[np.float64]:
     
     Parameters
     ----------
-    vn: array
+    vn: array, (...,6)
         6-dimensional vector, xyzuvw.
     """
-    v1 =  TAU*vn[0]+vn[1]-0.5*vn[3] # x in Epar
-    v2 = -0.5*vn[0]+vn[2]+TAU*vn[3] # y in Epar
-    v3 = vn[4]                      # z in Epar
-    v4 = -TAU*vn[0]+vn[1]-0.5*vn[3] # x in Eperp
-    v5 = -0.5*vn[0]+vn[2]-TAU*vn[3] # y in Eperp
-    v6 = vn[5]                      # z in Epperp, dummy
-    return np.array([v1,v2,v3,v4,v5,v6],dtype=np.float64)
+    return np.asarray(vn,dtype=np.float64)@PROJECTION_MATRIX_NUMERICAL
 
 def projection_sets_numerical(vns: NDArray[np.float64]) -> NDArray[np.float64]:
-    """parallel and perpendicular components of a 6D lattice vector in direct space.
+    """parallel and perpendicular components of a set of 6D lattice vectors in direct space.
     
     Parameters
     ----------
-    vsn: array
+    vns: array, (...,6)
         set of 6-dimensional vectors, xyzuvw1, xyzuvw2, ...
     """
-    num=len(vns)
-    m=np.zeros((num,6),dtype=np.float64)
-    for i in range(num):
-        m[i]=projection_numerical(vns[i])
-    return m
+    return projection_numerical(vns)
     
 def projection3_numerical(vn: NDArray[np.float64]) -> NDArray[np.float64]:
     """perpendicular component of a 6D lattice vector in direct space.
     
     Parameters
     ----------
-    vn: array
+    vn: array, (...,6)
         6-dimensional vector, xyzuvw.
     """
-    #v1 =  TAU*vn[0]+vn[1]-0.5*vn[3] # x in Epar
-    #v2 = -0.5*vn[0]+vn[2]+TAU*vn[3] # y in Epar
-    #v3 = vn[4]                      # z in Epar
-    v4 = -TAU*vn[0]+vn[1]-0.5*vn[3] # x in Eperp
-    v5 = -0.5*vn[0]+vn[2]-TAU*vn[3] # y in Eperp
-    v6 = vn[5]                      # z in Epperp, dummy
-    return np.array([v4,v5,v6],dtype=np.float64)
+    return np.asarray(vn,dtype=np.float64)@PROJECTION3_MATRIX_NUMERICAL
 
 def projection3_sets_numerical(vns: NDArray[np.float64]) -> NDArray[np.float64]:
-    """perpendicular component of a 6D lattice vector in direct space.
+    """perpendicular component of a set of 6D lattice vectors in direct space.
     
     Parameters
     ----------
-    vsn: array
+    vns: array, (...,6)
         set of 6-dimensional vectors, xyzuvw1, xyzuvw2, ...
     """
-    num=len(vns)
-    m=np.zeros((num,3),dtype=np.float64)
-    for i in range(num):
-        m[i]=projection3_numerical(vns[i])
-    return m
+    return projection3_numerical(vns)
 
 
 
+#----------------------------
+# Batched tests
+#
+# Vectorized versions of check_intersection_two_segment_numerical(),
+# check_intersection_segment_surface_numerical() and inside_outside_triangle()
+# with the same tolerances. The leading dimensions of the arguments are
+# broadcast, e.g. (n1,1,...) and (1,n2,...) give all n1*n2 pairs.
+#----------------------------
+def check_intersection_two_segment_numerical_batch(ln1: NDArray[np.float64], ln2: NDArray[np.float64]) -> NDArray[np.bool_]:
+    """check intersection between pairs of line segments.
+    
+    Parameters
+    ----------
+    ln1, ln2: array, (...,2,3)
+        coordinates of the end points, xyz1, xyz2.
+    
+    Returns
+    -------
+    array of bool, (...)
+    """
+    ln1=np.asarray(ln1,dtype=np.float64)
+    ln2=np.asarray(ln2,dtype=np.float64)
+    L1a,L1b=ln1[...,0,:],ln1[...,1,:]
+    L2a,L2b=ln2[...,0,:],ln2[...,1,:]
+    vecAB=L1b-L1a
+    vecAC=L2a-L1a
+    vecCD=L2b-L2a
+    ac_cd=np.sum(vecAC*vecCD,axis=-1)
+    cd_ab=np.sum(vecCD*vecAB,axis=-1)
+    cd_cd=np.sum(vecCD*vecCD,axis=-1)
+    ac_ab=np.sum(vecAC*vecAB,axis=-1)
+    ab_ab=np.sum(vecAB*vecAB,axis=-1)
+    t1=ac_cd*cd_ab-cd_cd*ac_ab # bunshi
+    t2=cd_ab*cd_ab-ab_ab*cd_cd # bunbo
+    ok=np.abs(t2)>=EPS
+    with np.errstate(divide='ignore',invalid='ignore'):
+        s=np.where(ok,t1/t2,-1.0)
+        t=(-ac_cd+s*cd_ab)/cd_cd
+    ok&=(s>=0.0)&(s<=1.0)&(t>=0.0)&(t<=1.0)
+    d=vecAC-s[...,np.newaxis]*vecAB+t[...,np.newaxis]*vecCD
+    return ok&(np.sum(d**2,axis=-1)<EPS)
+
+def check_intersection_two_segment_numerical_6d_tau_batch(segment_1: NDArray[np.int64], segment_2: NDArray[np.int64]) -> NDArray[np.bool_]:
+    """check intersection between pairs of 6d line segments in TAU-style.
+    
+    Parameters
+    ----------
+    segment_1, segment_2: array, (...,2,6,3)
+    
+    Returns
+    -------
+    array of bool, (...)
+    """
+    ln1=get_internal_component_sets_numerical(segment_1)
+    ln2=get_internal_component_sets_numerical(segment_2)
+    return check_intersection_two_segment_numerical_batch(ln1,ln2)
+
+def check_intersection_segment_surface_numerical_batch(line_segment: NDArray[np.float64], triangle: NDArray[np.float64]) -> NDArray[np.bool_]:
+    """check intersection between line segments and the edges of triangles.
+    
+    Parameters
+    ----------
+    line_segment: array, (...,2,3)
+    triangle: array, (...,3,3)
+    
+    Returns
+    -------
+    array of bool, (...)
+    """
+    line_segment=np.asarray(line_segment,dtype=np.float64)
+    triangle=np.asarray(triangle,dtype=np.float64)
+    #  edge: 0-1,0-2,1-2
+    edges=triangle[...,[[0,1],[0,2],[1,2]],:] # (...,3,2,3)
+    return np.any(check_intersection_two_segment_numerical_batch(line_segment[...,np.newaxis,:,:],edges),axis=-1)
+
+def check_intersection_segment_surface_numerical_6d_tau_batch(line_segment: NDArray[np.int64], triangle: NDArray[np.int64]) -> NDArray[np.bool_]:
+    """check intersection between 6d line segments and the edges of triangles in TAU-style.
+    
+    Parameters
+    ----------
+    line_segment: array, (...,2,6,3)
+    triangle: array, (...,3,6,3)
+    
+    Returns
+    -------
+    array of bool, (...)
+    """
+    ln=get_internal_component_sets_numerical(line_segment)
+    tr=get_internal_component_sets_numerical(triangle)
+    return check_intersection_segment_surface_numerical_batch(ln,tr)
+
+def triangle_area_numerical_batch(a: NDArray[np.float64]) -> NDArray[np.float64]:
+    """areas of triangles.
+    
+    Parameters
+    ----------
+    a: array, (...,3,3)
+        coordinates of the vertices, xyz1, xyz2, xyz3.
+    
+    Returns
+    -------
+    array, (...)
+    """
+    a=np.asarray(a,dtype=np.float64)
+    v3=np.cross(a[...,2,:]-a[...,0,:],a[...,1,:]-a[...,0,:])
+    return np.sqrt(np.sum(v3**2,axis=-1))/2.0
+
+def inside_outside_triangle_batch(point: NDArray[np.float64], triangle: NDArray[np.float64]) -> NDArray[np.bool_]:
+    """judge whether the points are inside triangles or not.
+    
+    Parameters
+    ----------
+    point: array, (...,3)
+    triangle: array, (...,3,3)
+    
+    Returns
+    -------
+    array of bool, (...)
+        True when inside.
+    """
+    point=np.asarray(point,dtype=np.float64)
+    triangle=np.asarray(triangle,dtype=np.float64)
+    shape=np.broadcast_shapes(point.shape[:-1],triangle.shape[:-2])
+    area0=triangle_area_numerical_batch(triangle)
+    # replace i-th vertex by the point
+    tri=np.empty(shape+(3,3,3),dtype=np.float64)
+    tri[...]=triangle[...,np.newaxis,:,:]
+    for i in range(3):
+        tri[...,i,i,:]=point
+    area=triangle_area_numerical_batch(tri)
+    return np.abs(area0-area[...,0]-area[...,1]-area[...,2])<EPS*area0
+
+def inside_outside_triangle_tau_batch(point: NDArray[np.int64], triangle: NDArray[np.int64]) -> NDArray[np.bool_]:
+    """judge whether 6d points are inside triangles or not in TAU-style.
+    
+    Parameters
+    ----------
+    point: array, (...,6,3)
+    triangle: array, (...,3,6,3)
+    
+    Returns
+    -------
+    array of bool, (...)
+    """
+    point=get_internal_component_sets_numerical(point)
+    triangle=get_internal_component_sets_numerical(triangle)
+    return inside_outside_triangle_batch(point,triangle)
+
 ################
 # Unnecessary functions？？？
 ################
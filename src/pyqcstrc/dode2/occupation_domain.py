@@ -17,7 +17,6 @@ try:
 except ImportError:
     print('import error\n')
 
-TAU=np.sqrt(3)/2.0
 
 def volume(obj):
     return utils.obj_area_6d(obj)
@@ -18,7 +18,6 @@ try:
 except ImportError:
     print('import error\n')
 
-TAU=np.sqrt(3)/2.0
 
 def intersection(obj1,obj2,select='standard',verbose=0):
     """
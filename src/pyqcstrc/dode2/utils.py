@@ -31,7 +31,7 @@ from scipy.spatial import Delaunay
 import itertools
 import time
 
-TAU=np.sqrt(3)/2
+from pyqcstrc.constants import SIN as TAU
 
 def shift_object(obj: NDArray[np.int64], shift: NDArray[np.int64]) -> NDArray[np.int64]:
     """shift an object
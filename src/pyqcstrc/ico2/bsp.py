@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+#
+# PyQCstrc - Python library for Quasi-Crystal structure
+# Copyright (c) 2021 Tsunetomo Yamada <tsunetomo.yamada@rs.tus.ac.jp>
+#
+"""Exact boolean operations of (non-convex) occupation domains.
+
+Each tetrahedron of obj1 is partitioned by a BSP tree of the boundary
+planes of obj2: a cell is split by a plane of obj2 which passes through
+its interior, until no triangle on the surface of obj2 crosses the cell.
+Such a cell is either inside or outside obj2, which is decided by its
+centroid. Cells are clipped in exact arithmetic (see
+pyqcstrc.ico2.halfspace), and only the planes of the triangles near a
+cell are tried (AABB tree, see pyqcstrc.ico2.spatial), so that the cost
+depends on the part of the surface of obj2 crossing obj1 rather than on
+the number of pairs of tetrahedra.
+
+The boundary of obj2 is a dict of arrays:
+    normals: (m,3,3) planes of the surface triangles, n.x=d
+    offsets: (m,3)
+    plane: (k) index of the plane of the triangles, -1 for degenerated ones
+    tree: AABB tree over the triangles
+    surface: (k,3,6,3) triangles on the surface
+"""
+import numpy as np
+from numpy.typing import NDArray
+
+from pyqcstrc.ico2.math1 import (projection3_batch,
+                                div_batch,
+                                sign_batch,
+                                sum_batch,
+                                )
+from pyqcstrc.buffer import SimplexBuffer
+from pyqcstrc.ico2.utils import (plane_equations,
+                                generator_surface_1,
+                                )
+from pyqcstrc.ico2.spatial import (bounding_boxes,
+                                  build_tree,
+                                  query_boxes,
+                                  )
+from pyqcstrc.ico2.predicates import (OUTSIDE,
+                                     classify_points_6d,
+                                     )
+from pyqcstrc.ico2.halfspace import (polytope,
+                                    plane_values,
+                                    clip,
+                                    tetrahedralize,
+                                    )
+
+def boundary(obj: NDArray[np.int64], surface: NDArray[np.int64]=None) -> dict:
+    """planes and AABB tree of the surface of an object.
+
+    Parameters
+    ----------
+    obj: array, (n,4,6,3)
+        object in TAU-style
+    surface: array, (k,3,6,3)
+        generator_surface_1(obj), computed when not given.
+
+    Returns
+    -------
+    dict (see module docstring)
+    """
+    if surface is None:
+        surface=generator_surface_1(obj)
+    nrm,d,valid=plane_equations(surface)
+    keys=np.concatenate([nrm.reshape(-1,9),d],axis=1)
+    _,index,inverse=np.unique(keys,return_index=True,return_inverse=True,axis=0)
+    plane=np.where(valid,inverse.reshape(-1),-1)
+    return {'normals':nrm[index],
+            'offsets':d[index],
+            'plane':plane,
+            'tree':build_tree(*bounding_boxes(projection3_batch(surface))),
+            'surface':surface,
+            }
+
+def partition(tetrahedron: NDArray[np.int64], bnd: dict) -> list:
+    """cells of a tetrahedron which are not crossed by the surface.
+
+    Parameters
+    ----------
+    tetrahedron: array, (4,6,3)
+    bnd: dict
+        output of boundary()
+
+    Returns
+    -------
+    list of dict
+        cells (see pyqcstrc.ico2.halfspace.polytope()). The tetrahedron
+        itself is the only cell when it is not crossed.
+    """
+    cells=[]
+    stack=[polytope(tetrahedron[np.newaxis])]
+    while stack:
+        poly=stack.pop()
+        if poly is None:
+            continue
+        lo,hi=bounding_boxes(poly['xyz'][np.newaxis])
+        _,tri=query_boxes(bnd['tree'],lo,hi)
+        planes=np.unique(bnd['plane'][tri])
+        planes=planes[planes>=0]
+        crossing=[]
+        if len(planes)>0:
+            s=sign_batch(plane_values(bnd['normals'][planes],bnd['offsets'][planes],poly['xyz']))
+            crossing=planes[np.any(s<0,axis=0)&np.any(s>0,axis=0)]
+        if len(crossing)==0:
+            cells.append(poly)
+        else:
+            normal,offset=bnd['normals'][crossing[0]],bnd['offsets'][crossing[0]]
+            stack.append(clip(poly,normal,offset))
+            # the other side, -n.x<=-d (denominators are kept positive)
+            stack.append(clip(poly,normal*[-1,-1,1],offset*[-1,-1,1]))
+    return cells
+
+def split_obj(obj1: NDArray[np.int64], obj2: NDArray[np.int64], bnd: dict=None):
+    """split obj1 into the parts inside and outside obj2.
+
+    Parameters
+    ----------
+    obj1, obj2: array, (n,4,6,3)
+        objects in TAU-style
+    bnd: dict
+        boundary(obj2), computed when not given.
+
+    Returns
+    -------
+    inside, outside: array, (n,4,6,3)
+        Tetrahedra of obj1 which are not crossed by the surface of obj2
+        are returned as they are. Flat tetrahedra are dropped.
+    """
+    if bnd is None:
+        bnd=boundary(obj2)
+    pieces=[]
+    centres=SimplexBuffer((6,3))
+    for tetrahedron in obj1:
+        cells=partition(tetrahedron,bnd)
+        if len(cells)==1:
+            pieces.append(tetrahedron[np.newaxis])
+        else:
+            pieces.extend([tetrahedralize(poly) for poly in cells])
+        for poly in cells:
+            v=poly['vertices']
+            centres.append(div_batch(sum_batch(v,axis=0),np.array([len(v),0,1])))
+    # a centre is strictly inside its cell, so never on the surface of obj2.
+    code=classify_points_6d(centres.array(),obj2,bnd['surface'])
+    # all tetrahedra of a cell share its code
+    num=[len(p) for p in pieces]
+    inside=np.repeat(code!=OUTSIDE,num)
+    # no cells when obj1 is empty or flat
+    pieces=np.concatenate(pieces) if pieces else np.zeros((0,4,6,3),dtype=np.int64)
+    return pieces[inside],pieces[~inside]
+
+def intersection_bsp(obj1: NDArray[np.int64], obj2: NDArray[np.int64], bnd: dict=None) -> NDArray[np.int64]:
+    """obj1 AND obj2.
+
+    Parameters
+    ----------
+    obj1, obj2: array, (n,4,6,3)
+    bnd: dict
+        boundary(obj2), computed when not given.
+
+    Returns
+    -------
+    array, (n,4,6,3)
+        None when there is no common part.
+    """
+    common,_=split_obj(obj1,obj2,bnd)
+    if len(common)==0:
+        return
+    return common
+
+def subtraction_bsp(obj1: NDArray[np.int64], obj2: NDArray[np.int64], bnd: dict=None) -> NDArray[np.int64]:
+    """obj1 NOT obj2.
+
+    Parameters
+    ----------
+    obj1, obj2: array, (n,4,6,3)
+    bnd: dict
+        boundary(obj2), computed when not given.
+
+    Returns
+    -------
+    array, (n,4,6,3)
+        None when obj1 is inside obj2.
+    """
+    _,rest=split_obj(obj1,obj2,bnd)
+    if len(rest)==0:
+        return
+    return rest
+
+def union_bsp(obj1: NDArray[np.int64], obj2: NDArray[np.int64], bnd: dict=None) -> NDArray[np.int64]:
+    """obj1 OR obj2 = obj2 + (obj1 NOT obj2), without overlap.
+
+    Parameters
+    ----------
+    obj1, obj2: array, (n,4,6,3)
+    bnd: dict
+        boundary(obj2), computed when not given.
+
+    Returns
+    -------
+    array, (n,4,6,3)
+    """
+    _,rest=split_obj(obj1,obj2,bnd)
+    return np.concatenate([obj2,rest])
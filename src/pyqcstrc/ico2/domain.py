@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+#
+# PyQCstrc - Python library for Quasi-Crystal structure
+# Copyright (c) 2021 Tsunetomo Yamada <tsunetomo.yamada@rs.tus.ac.jp>
+#
+"""Occupation domain with cached derived data.
+
+OccupationDomain holds the exact (n,4,6,3) array of an occupation domain
+in TAU-style, and computes derived data (float coordinates in Eperp,
+centroids, bounding spheres and boxes, volumes, surface, edges, planes of
+the surface) only when they are used for the first time.
+
+The exact array is read-only, so that the cache is always valid. shift()
+and symop() return new objects, which take over the derived data that can
+be translated or that are invariant.
+
+The functions in occupation_domain.py accept both OccupationDomain and
+plain arrays (see asarray()).
+"""
+import numpy as np
+from numpy.typing import NDArray
+
+from pyqcstrc.ico2.math1 import (projection3_batch,
+                                 centroid_obj,
+                                 add_batch,
+                                 )
+from pyqcstrc.ico2.utils import (shift_object,
+                                 obj_volume_6d,
+                                 tetrahedra_volume_6d,
+                                 generator_surface_1,
+                                 generator_unique_edges,
+                                 )
+from pyqcstrc.ico2.intsct import ball_radius_obj
+from pyqcstrc.ico2.predicates import barycentric_matrices
+from pyqcstrc.ico2.spatial import (bounding_boxes_numerical,
+                                   build_tree,
+                                   )
+from pyqcstrc.ico2.symmetry import symop_obj
+from pyqcstrc.ico2.bsp import boundary
+from pyqcstrc.ico2.numericalc import numerical_vector
+
+class OccupationDomain:
+    """occupation domain, set of tetrahedra in TAU-style.
+
+    Parameters
+    ----------
+    obj: array, (n,4,6,3)
+        6d coordinates of the vertices of the tetrahedra in TAU-style
+    """
+    def __init__(self, obj: NDArray[np.int64]):
+        obj=np.array(obj)
+        obj.setflags(write=False)
+        self._obj=obj
+        self._cache={}
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None or dtype==self._obj.dtype:
+            return self._obj
+        return self._obj.astype(dtype)
+
+    def __len__(self):
+        return len(self._obj)
+
+    def __getitem__(self, key):
+        return self._obj[key]
+
+    def __iter__(self):
+        return iter(self._obj)
+
+    def __repr__(self):
+        return 'OccupationDomain(%d tetrahedra)'%(len(self._obj))
+
+    @property
+    def obj(self) -> NDArray[np.int64]:
+        """exact coordinates, (n,4,6,3), read-only."""
+        return self._obj
+
+    @property
+    def ndim(self) -> int:
+        return self._obj.ndim
+
+    @property
+    def shape(self) -> tuple:
+        return self._obj.shape
+
+    def _cached(self, key, func):
+        if key not in self._cache:
+            self._cache[key]=func()
+        return self._cache[key]
+
+    def clear_cache(self):
+        """discard all derived data."""
+        self._cache={}
+
+    #----------------------------
+    # float data
+    #----------------------------
+    @property
+    def perp(self) -> NDArray[np.float64]:
+        """numeric coordinates of the vertices in Eperp, (n,4,3)."""
+        def func():
+            xyz=projection3_batch(self._obj)
+            return numerical_vector(xyz)
+        return self._cached('perp',func)
+
+    @property
+    def centroids(self) -> NDArray[np.float64]:
+        """numeric centroids of the tetrahedra in Eperp, (n,3)."""
+        return self._cached('centroids',lambda: self.perp.mean(axis=1))
+
+    @property
+    def spheres(self):
+        """bounding spheres of the tetrahedra in Eperp.
+
+        Returns
+        -------
+        centre: array, (n,3)
+        radius: array, (n)
+        """
+        def func():
+            c=self.centroids
+            return c,np.linalg.norm(self.perp-c[:,np.newaxis],axis=2).max(axis=1)
+        return self._cached('spheres',func)
+
+    @property
+    def sphere(self):
+        """bounding sphere of the occupation domain about its centroid.
+
+        Returns
+        -------
+        centre: array, (3)
+        radius: float
+        """
+        def func():
+            c=projection3_batch(self.centroid)
+            return numerical_vector(c),ball_radius_obj(self._obj,self.centroid)
+        return self._cached('sphere',func)
+
+    @property
+    def boxes(self):
+        """bounding boxes of the tetrahedra in Eperp (see spatial.bounding_boxes()).
+
+        Returns
+        -------
+        lo, hi: array, (n,3)
+        """
+        return self._cached('boxes',lambda: bounding_boxes_numerical(self.perp))
+
+    @property
+    def tree(self) -> dict:
+        """AABB tree over the tetrahedra (see spatial.build_tree())."""
+        return self._cached('tree',lambda: build_tree(*self.boxes))
+
+    @property
+    def matrices(self):
+        """barycentric matrices of the tetrahedra (see predicates.barycentric_matrices())."""
+        return self._cached('matrices',lambda: barycentric_matrices(projection3_batch(self._obj)))
+
+    #----------------------------
+    # exact data
+    #----------------------------
+    @property
+    def centroid(self) -> NDArray[np.int64]:
+        """centroid of the occupation domain, (6,3) in TAU-style."""
+        return self._cached('centroid',lambda: centroid_obj(self._obj))
+
+    @property
+    def volume(self) -> NDArray[np.int64]:
+        """volume in TAU-style."""
+        return self._cached('volume',lambda: obj_volume_6d(self._obj))
+
+    @property
+    def volumes(self) -> NDArray[np.int64]:
+        """volumes of the tetrahedra in TAU-style, (n,3)."""
+        return self._cached('volumes',lambda: tetrahedra_volume_6d(self._obj))
+
+    @property
+    def surface(self) -> NDArray[np.int64]:
+        """triangles on the surface, (m,3,6,3) (see utils.generator_surface_1())."""
+        return self._cached('surface',lambda: generator_surface_1(self._obj))
+
+    @property
+    def edges(self) -> NDArray[np.int64]:
+        """unique edges, (m,2,6,3) (see utils.generator_unique_edges())."""
+        return self._cached('edges',lambda: generator_unique_edges(self._obj))
+
+    @property
+    def boundary(self) -> dict:
+        """planes and AABB tree of the surface (see bsp.boundary())."""
+        return self._cached('boundary',lambda: boundary(self._obj,self.surface))
+
+    #----------------------------
+    # Operations
+    #----------------------------
+    def shift(self, shift: NDArray[np.int64]):
+        """shifted occupation domain.
+
+        Volumes are taken over, and the computed float data are translated.
+
+        Parameters
+        ----------
+        shift: array, (6,3)
+            6d vector in TAU-style
+
+        Returns
+        -------
+        OccupationDomain
+        """
+        od=OccupationDomain(shift_object(self._obj,shift))
+        cache=self._cache
+        d=projection3_batch(np.asarray(shift))
+        d=numerical_vector(d)
+        for key in ['volume','volumes']:
+            if key in cache:
+                od._cache[key]=cache[key]
+        if 'perp' in cache:
+            od._cache['perp']=cache['perp']+d
+        if 'centroids' in cache:
+            od._cache['centroids']=cache['centroids']+d
+        if 'spheres' in cache:
+            od._cache['spheres']=(cache['spheres'][0]+d,cache['spheres'][1])
+        if 'centroid' in cache:
+            od._cache['centroid']=add_batch(cache['centroid'],shift)
+            if 'sphere' in cache:
+                od._cache['sphere']=(cache['sphere'][0]+d,cache['sphere'][1])
+        if 'matrices' in cache:
+            origin,inverse,tol=cache['matrices']
+            od._cache['matrices']=(origin+d,inverse,tol)
+        return od
+
+    def symop(self, symop: NDArray[np.int64], centre: NDArray[np.int64]):
+        """occupation domain transformed by a symmetry operation around centre.
+
+        Volumes are taken over, since the operations of m-3-5 keep them.
+
+        Parameters
+        ----------
+        symop: array, (6,6)
+            symmetry operation
+        centre: array, (6,3)
+            6d coordinates of the centre in TAU-style
+
+        Returns
+        -------
+        OccupationDomain
+        """
+        od=OccupationDomain(symop_obj(symop,self._obj,centre))
+        for key in ['volume','volumes']:
+            if key in self._cache:
+                od._cache[key]=self._cache[key]
+        return od
+
+def asarray(obj):
+    """exact array of an occupation domain.
+
+    Parameters
+    ----------
+    obj: OccupationDomain or array
+
+    Returns
+    -------
+    array
+        obj itself when it is not an OccupationDomain.
+    """
+    if isinstance(obj,OccupationDomain):
+        return obj.obj
+    else:
+        return obj
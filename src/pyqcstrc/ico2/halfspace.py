@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+#
+# PyQCstrc - Python library for Quasi-Crystal structure
+# Copyright (c) 2021 Tsunetomo Yamada <tsunetomo.yamada@rs.tus.ac.jp>
+#
+"""Exact half-space representation of convex occupation domains.
+
+A convex object is represented by the planes of its faces, n.x<=d in
+Eperp (n: outward normal), together with its vertices. All values are
+in TAU-style, so that clipping and vertex enumeration are exact.
+
+The polytope is a dict of arrays:
+    vertices: (k,6,3) vertices in 6d
+    xyz: (k,3,3) vertices in Eperp
+    normals: (m,3,3) outward normals of the faces
+    offsets: (m,3) n.x of the faces
+    incidence: (k,m) True where vertex i is on face j
+
+Two vertices are joined by an edge when they share two faces, which is
+all the adjacency the clipping needs.
+"""
+import numpy as np
+from numpy.typing import NDArray
+
+from pyqcstrc.ico2.math1 import (projection3_batch,
+                                add_batch,
+                                sub_batch,
+                                mul_batch,
+                                div_batch,
+                                sign_batch,
+                                sum_batch,
+                                )
+from pyqcstrc.ico2.utils import (plane_equations,
+                                generator_surface_1,
+                                remove_doubling_in_perp_space,
+                                )
+
+def plane_values(normals: NDArray[np.int64], offsets: NDArray[np.int64], xyz: NDArray[np.int64]) -> NDArray[np.int64]:
+    """n.x-d for all pairs of points and planes.
+
+    Parameters
+    ----------
+    normals: array, (m,3,3)
+    offsets: array, (m,3)
+    xyz: array, (k,3,3)
+        points in Eperp
+
+    Returns
+    -------
+    array, (k,m,3)
+        in TAU-style. Negative inside, zero on the planes.
+    """
+    v=sum_batch(mul_batch(normals[np.newaxis],xyz[:,np.newaxis],normalize=False),axis=2)
+    return sub_batch(v,offsets[np.newaxis])
+
+def polytope(obj: NDArray[np.int64]) -> dict:
+    """half-space representation of a convex object.
+
+    Parameters
+    ----------
+    obj: array, (n,4,6,3)
+        convex object (set of tetrahedra) in TAU-style
+
+    Returns
+    -------
+    dict (see module docstring), or None for a flat object.
+    """
+    surface=generator_surface_1(obj)
+    nrm,d,valid=plane_equations(surface)
+    nrm,d=nrm[valid],d[valid]
+    keys=np.concatenate([nrm.reshape(-1,9),d],axis=1)
+    _,index=np.unique(keys,return_index=True,axis=0)
+    index=np.sort(index)
+    nrm,d=nrm[index],d[index]
+
+    vertices=remove_doubling_in_perp_space(surface.reshape(-1,6,3))
+    xyz=projection3_batch(vertices)
+
+    # outward normals: the centroid of the vertices is inside.
+    centre=div_batch(sum_batch(xyz,axis=0),np.array([len(xyz),0,1]))
+    s=sign_batch(plane_values(nrm,d,centre[np.newaxis]))[0]
+    if np.any(s==0):
+        return
+    nrm[s>0,:,:2]*=-1
+    d[s>0,:2]*=-1
+
+    incidence=sign_batch(plane_values(nrm,d,xyz))==0
+    # points in the middle of edges or faces of the triangulation
+    keep=np.sum(incidence,axis=1)>=3
+    return {'vertices':vertices[keep],
+            'xyz':xyz[keep],
+            'normals':nrm,
+            'offsets':d,
+            'incidence':incidence[keep],
+            }
+
+def inside(poly: dict, xyz: NDArray[np.int64]) -> NDArray[np.bool_]:
+    """points inside or on the surface of a polytope.
+
+    Parameters
+    ----------
+    poly: dict
+        output of polytope()
+    xyz: array, (k,3,3)
+        points in Eperp
+
+    Returns
+    -------
+    array, (k)
+    """
+    return np.all(sign_batch(plane_values(poly['normals'],poly['offsets'],xyz))<=0,axis=1)
+
+def clip(poly: dict, normal: NDArray[np.int64], offset: NDArray[np.int64]) -> dict:
+    """clip a polytope by a half-space, n.x<=d.
+
+    Parameters
+    ----------
+    poly: dict
+        output of polytope()
+    normal: array, (3,3)
+    offset: array, (3)
+
+    Returns
+    -------
+    dict
+        None when the rest has no volume.
+    """
+    val=plane_values(normal[np.newaxis],offset[np.newaxis],poly['xyz'])[:,0]
+    s=sign_batch(val)
+    if np.all(s<=0):
+        return poly
+    elif np.all(s>=0):
+        return
+
+    # new vertices on the edges (u,w) crossing the plane
+    incidence=poly['incidence']
+    neg=np.nonzero(s<0)[0]
+    pos=np.nonzero(s>0)[0]
+    shared=incidence[neg].astype(np.int64)@incidence[pos].T.astype(np.int64)
+    iu,iw=np.nonzero(shared>=2)
+    u,w=neg[iu],pos[iw]
+    t=div_batch(val[u],sub_batch(val[u],val[w])) # (e,3), 0<t<1
+    vu,vw=poly['vertices'][u],poly['vertices'][w]
+    new=add_batch(vu,mul_batch(t[:,np.newaxis],sub_batch(vw,vu)))
+
+    keep=s<=0
+    vertices=np.concatenate([poly['vertices'][keep],new])
+    xyz=np.concatenate([poly['xyz'][keep],projection3_batch(new)])
+    incidence=np.vstack([incidence[keep],incidence[u]&incidence[w]])
+    incidence=np.hstack([incidence,np.concatenate([s[keep]==0,np.ones(len(u),dtype=bool)])[:,np.newaxis]])
+    normals=np.concatenate([poly['normals'],normal[np.newaxis]])
+    offsets=np.concatenate([poly['offsets'],offset[np.newaxis]])
+
+    # planes which are no longer faces
+    face=np.sum(incidence,axis=0)>=3
+    return {'vertices':vertices,
+            'xyz':xyz,
+            'normals':normals[face],
+            'offsets':offsets[face],
+            'incidence':incidence[:,face],
+            }
+
+def _cross(v1: NDArray[np.int64], v2: NDArray[np.int64]) -> NDArray[np.int64]:
+    a=mul_batch(v1[...,[1,2,0],:],v2[...,[2,0,1],:],normalize=False)
+    b=mul_batch(v1[...,[2,0,1],:],v2[...,[1,2,0],:],normalize=False)
+    return sub_batch(a,b)
+
+def tetrahedralize(poly: dict) -> NDArray[np.int64]:
+    """tetrahedralization of a polytope.
+
+    Each face which does not contain the first vertex is fanned into
+    triangles, which are joined to the first vertex.
+
+    Parameters
+    ----------
+    poly: dict
+        output of polytope()
+
+    Returns
+    -------
+    array, (n,4,6,3)
+    """
+    xyz=poly['xyz']
+    incidence=poly['incidence']
+    rows=[]
+    for f in np.nonzero(~incidence[0])[0]:
+        idx=np.nonzero(incidence[:,f])[0]
+        # order the vertices of the face around idx[0]. They are in convex
+        # position, so that the rank of a vertex is the number of vertices
+        # coming before it.
+        p=sub_batch(xyz[idx[1:]],xyz[idx[0]][np.newaxis])
+        c=_cross(p[:,np.newaxis],p[np.newaxis])
+        s=sign_batch(sum_batch(mul_batch(c,poly['normals'][f],normalize=False),axis=2))
+        rank=np.sum(s>0,axis=0)
+        idx=np.concatenate([idx[:1],idx[1:][np.argsort(rank)]])
+        for a,b in zip(idx[1:-1],idx[2:]):
+            rows.append([0,idx[0],a,b])
+    return poly['vertices'][np.array(rows)]
+
+def intersection_convex_6d(obj1: NDArray[np.int64], obj2: NDArray[np.int64]) -> NDArray[np.int64]:
+    """intersection of two convex objects by clipping obj2 with the faces of obj1.
+
+    Parameters
+    ----------
+    obj1, obj2: array, (n,4,6,3)
+        convex objects in TAU-style
+
+    Returns
+    -------
+    array, (n,4,6,3)
+        None when there is no common part.
+    """
+    poly1=polytope(obj1)
+    poly2=polytope(obj2)
+    if poly1 is None or poly2 is None:
+        return
+    if np.all(inside(poly2,poly1['xyz'])): # obj1 is fully inside obj2
+        return obj1
+    elif np.all(inside(poly1,poly2['xyz'])): # obj2 is fully inside obj1
+        return obj2
+    poly=poly2
+    for normal,offset in zip(poly1['normals'],poly1['offsets']):
+        poly=clip(poly,normal,offset)
+        if poly is None:
+            return
+    return tetrahedralize(poly)
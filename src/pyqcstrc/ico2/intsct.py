@@ -4,14 +4,15 @@
 # Copyright (c) 2021 Tsunetomo Yamada <tsunetomo.yamada@rs.tus.ac.jp>
 #
 #import sys
+import warnings
 import numpy as np
 from numpy.typing import NDArray
 #import time # in subtraction_two_obj
 import itertools
 
 from pyqcstrc.ico2.math1 import (projection3,
+                                projection3_batch,
                                 centroid, 
-                                centroid_obj,
                                 coplanar_check,
                                 det_matrix,
                                 dot_product,
@@ -21,6 +22,10 @@ from pyqcstrc.ico2.math1 import (projection3,
                                 sub,
                                 mul,
                                 div,
+                                add_batch,
+                                sub_batch,
+                                mul_batch,
+                                div_batch,
                                 sub_vectors,
                                 add_vectors, 
                                 mul_vector,
@@ -31,14 +36,13 @@ from pyqcstrc.ico2.numericalc import (numeric_value,
                                     get_internal_component_sets_numerical,
                                     get_internal_component_numerical,
                                     check_intersection_two_segment_numerical_6d_tau,
-                                    check_intersection_segment_surface_numerical_6d_tau,
                                     #check_intersection_segment_surface_numerical,
                                     inside_outside_tetrahedron,
-                                    inside_outside_tetrahedron_tau,
                                     on_out_surface,
                                     )
 from pyqcstrc.ico2.utils import (remove_doubling_in_perp_space,
                                 tetrahedron_volume_6d,
+                                tetrahedra_volume_6d,
                                 obj_volume_6d,
                                 generator_surface_1,
                                 generator_unique_triangles,
@@ -46,8 +50,22 @@ from pyqcstrc.ico2.utils import (remove_doubling_in_perp_space,
                                 tetrahedralization_points,
                                 generate_convex_hull,
                                 )
+from pyqcstrc.ico2.predicates import (OUTSIDE,
+                                    ON_FACE,
+                                    classify_points_6d,
+                                    point_in_tetrahedron,
+                                    segment_triangle,
+                                    segment_triangle_6d,
+                                    segments_triangles_6d,
+                                    )
+from pyqcstrc.ico2.spatial import candidate_pairs_6d
+from pyqcstrc.ico2.halfspace import intersection_convex_6d
+from pyqcstrc.buffer import SimplexBuffer
+from pyqcstrc.parallel import (attach,
+                                detach,
+                                map_chunks,
+                                )
                     
-TAU=(1+np.sqrt(5))/2.0
 EPS=1e-6
 
 def decomposition(p: NDArray[np.int64]) -> NDArray[np.int64]:
@@ -82,16 +100,9 @@ def ball_radius_obj(obj: NDArray[np.int64], centroid: NDArray[np.int64]) -> floa
     #print("ball_radius_obj")
     
     vertices=remove_doubling_in_perp_space(obj)
-    dd=0
-    for v in vertices:
-        a=sub_vectors(v,centroid)
-        a=projection3(a)
-        dd1=length_numerical(a)
-        if dd1>dd:
-            dd=dd1
-        else:
-            pass
-    return dd
+    a=projection3_batch(sub_batch(vertices,centroid))
+    a=numerical_vector(a)
+    return np.max(np.linalg.norm(a,axis=1),initial=0)
 
 def ball_radius(tetrahedron: NDArray[np.int64], centroid: NDArray[np.int64]) -> float:
     #  this transforms a tetrahedron to a boll which covers the tetrahedron
@@ -113,22 +124,12 @@ def rough_check_intersection_tetrahedron_obj(tetrahedron: NDArray[np.int64], cen
         return False
 
 def check_intersection_two_tetrahedron_4(tetrahedron_1: NDArray[np.int64], tetrahedron_2: NDArray[np.int64]) -> int:
+    xyz1=projection3_batch(tetrahedron_1)
+    xyz2=projection3_batch(tetrahedron_2)
     # checking whether tetrahedron_1 is fully inside tetrahedron_2 or not
-    counter2=0
-    for vtx in tetrahedron_1:
-        if inside_outside_tetrahedron_tau(vtx,tetrahedron_2): # inside
-            pass
-        else:
-            counter2+=1
-            break
+    counter2=np.count_nonzero(point_in_tetrahedron(xyz1,xyz2[np.newaxis])<0)
     # checking whether tetrahedron_2 is fully inside tetrahedron_3 or not
-    counter3=0
-    for vtx in tetrahedron_2:
-        if inside_outside_tetrahedron_tau(vtx,tetrahedron_1): # inside
-            pass
-        else:
-            counter3+=1
-            break
+    counter3=np.count_nonzero(point_in_tetrahedron(xyz2,xyz1[np.newaxis])<0)
     if counter2==0:
         return 1 # tetrahedron_1 is fully inside tetrahedron_2
     elif counter3==0:
@@ -210,30 +211,15 @@ def check_intersection_two_tetrahedron_4(tetrahedron_1: NDArray[np.int64], tetra
         [2,3,0,2,3],\
         [2,3,1,2,3]]
     
-        counter1=0
-        for c in comb: # len(combination_index) = 24
-            # case 1: intersection between
-            # 6 edges of tetrahedron_1
-            # 4 surfaces of tetrahedron_2
-            segment=np.stack([tetrahedron_1[c[0]],tetrahedron_1[c[1]]])
-            surface=np.stack([tetrahedron_2[c[2]],tetrahedron_2[c[3]],tetrahedron_2[c[4]]])
-            #print(segment.shape)
-            #print(surface.shape)
-            if check_intersection_segment_surface_numerical_6d_tau(segment,surface): # intersectiing
-                counter1+=1
-                break
-            else:
-                pass
-            # case 2: intersection between
-            # 6 edges of tetrahedron_2
-            # 4 surfaces of tetrahedron_1
-            segment=np.stack([tetrahedron_2[c[0]],tetrahedron_2[c[1]]])
-            surface=np.stack([tetrahedron_1[c[2]],tetrahedron_1[c[3]],tetrahedron_1[c[4]]])
-            if check_intersection_segment_surface_numerical_6d_tau(segment,surface): # intersectiing
-                counter1+=1
-                break
-            else:
-                pass
+        comb=np.array(comb)
+        # case 1: intersection between
+        # 6 edges of tetrahedron_1
+        # 4 surfaces of tetrahedron_2
+        counter1=np.count_nonzero(segment_triangle(xyz1[comb[:,:2]],xyz2[comb[:,2:]]))
+        # case 2: intersection between
+        # 6 edges of tetrahedron_2
+        # 4 surfaces of tetrahedron_1
+        counter1+=np.count_nonzero(segment_triangle(xyz2[comb[:,:2]],xyz1[comb[:,2:]]))
         if counter1>0:
             return 3 # intersecting
         else:
@@ -301,7 +287,7 @@ def intersection_segment_surface(segment: NDArray[np.int64], surface: NDArray[np
     
     """
     # check whether the line segment and the surface are intersecting or not by numerical calc.
-    if check_intersection_segment_surface_numerical_6d_tau(segment,surface): # intersecting
+    if segment_triangle_6d(segment,surface): # intersecting
         # calc in TAU-style
         vec6AB=sub_vectors(segment[1],segment[0])
         vecAB=projection3(vec6AB)                 # AB # R
@@ -321,12 +307,12 @@ def intersection_segment_surface(segment: NDArray[np.int64], surface: NDArray[np
         bunbo=inner_product(vecP,vecCD)
         
         bunshi=inner_product(vecQ,vecCE)
-        t=div(bunshi,bunbo)
+        t=div_batch(bunshi,bunbo,normalize=False)
         
         # intersecting point: OA + t*AB
-        tmp=mul_vector(vec6AB,t) # t*AB
+        tmp=mul_batch(vec6AB,t,normalize=False) # t*AB
         #print('   t=',numeric_value(t))
-        return add_vectors(segment[0],tmp).reshape(1,6,3)
+        return add_batch(segment[0],tmp).reshape(1,6,3)
     else: # no intersection
         return 
 
@@ -412,68 +398,43 @@ def intersection_two_tetrahedron_4(tetrahedron_1: NDArray[np.int64], tetrahedron
     #tmp1=np.array([])
     #array0=np.zeros((6,3),dtype=np.int64)
     
-    counter=0
-    for c in comb:
+    xyz1=projection3_batch(tetrahedron_1)
+    xyz2=projection3_batch(tetrahedron_2)
+    comb_=np.array(comb)
+    flag1=segment_triangle(xyz1[comb_[:,:2]],xyz2[comb_[:,2:]])
+    flag2=segment_triangle(xyz2[comb_[:,:2]],xyz1[comb_[:,2:]])
+    
+    tmp=SimplexBuffer((6,3))
+    for i,c in enumerate(comb):
         # case 1: intersection between (edge of tetrahedron_1) and (surface of tetrahedron_2)
         segment=np.stack([tetrahedron_1[c[0]],tetrahedron_1[c[1]]])
         surface=np.stack([tetrahedron_2[c[2]],tetrahedron_2[c[3]],tetrahedron_2[c[4]]])
-        vtx=intersection_segment_surface(segment,surface)
+        vtx=intersection_segment_surface(segment,surface) if flag1[i] else None
         if np.all(vtx==None):
             pass
         else:
-            #print('tmp1',tmp1)
-            if counter==0 :
-                tmp=vtx # intersection points
-            else:
-                tmp=np.vstack([tmp,vtx]) # intersecting points
-            counter+=1
-            #print('tmp',tmp)
+            tmp.append(vtx) # intersecting points
         # case 2: intersection between (edge of tetrahedron_2) and (surface of tetrahedron_1)
         segment=np.stack([tetrahedron_2[c[0]],tetrahedron_2[c[1]]])
         surface=np.stack([tetrahedron_1[c[2]],tetrahedron_1[c[3]],tetrahedron_1[c[4]]])
-        vtx=intersection_segment_surface(segment,surface)
+        vtx=intersection_segment_surface(segment,surface) if flag2[i] else None
         if np.all(vtx==None):
             pass
         else:
-            #print('tmp1',tmp1)
-            if counter==0:
-                tmp=vtx # intersection points
-            else:
-                #print('   tmp.shape',tmp.shape)
-                #print('   tmp1.shape',tmp1.shape)
-                tmp=np.vstack([tmp,vtx]) # intersecting points
-            counter+=1
-            #print('tmp',tmp)
+            tmp.append(vtx) # intersecting points
     #tmp=remove_doubling_in_perp_space(tmp)
     #print('   (1) num of points=',len(tmp))
     #a=get_internal_component_sets_numerical(tmp)
     #print(a)
     
     # get vertces of tetrahedron_1 that are inside tetrahedron_2
-    for i1 in range(len(tetrahedron_1)):
-        vtx=tetrahedron_1[i1]
-        if inside_outside_tetrahedron_tau(vtx,tetrahedron_2): # inside
-            #print('tetrahedron_1[i1]',tetrahedron_1[i1])
-            #a=get_internal_component_numerical(tetrahedron_1[i1])
-            #print('      vertex of tet1',a)
-            if counter==0:
-                tmp=vtx.reshape(1,6,3)
-            else:
-                tmp=np.vstack([tmp,[vtx]])
-            counter+=1
-            #print('tmp',tmp)
+    inside1=point_in_tetrahedron(xyz1,xyz2[np.newaxis])>=0
+    inside2=point_in_tetrahedron(xyz2,xyz1[np.newaxis])>=0
+    tmp.append(tetrahedron_1[inside1])
     # get vertces of tetrahedron_2 that are inside tetrahedron_1
-    for i1 in range(len(tetrahedron_2)):
-        vtx=tetrahedron_2[i1]
-        if inside_outside_tetrahedron_tau(vtx,tetrahedron_1): # inside
-            #print('tetrahedron_2[i1]',tetrahedron_2[i1])
-            if counter==0:
-                tmp=vtx.reshape(1,6,3)
-            else:
-                tmp=np.vstack([tmp,[vtx]])
-            counter+=1
-        else:
-            pass
+    tmp.append(tetrahedron_2[inside2])
+    counter=len(tmp)
+    tmp=tmp.array()
     #print('tmp.shape',tmp.shape)
     #tmp=tmp.reshape(int(len(tmp)/6),6,3)
     #print('tmp:',tmp)
@@ -504,7 +465,7 @@ def intersection_two_tetrahedron_4(tetrahedron_1: NDArray[np.int64], tetrahedron
     else:
         return 
 
-def intersection_two_obj_1(obj1: NDArray[np.int64],obj2: NDArray[np.int64],kind=None,verbose: int=0) -> NDArray[np.int64]:
+def intersection_two_obj_1(obj1: NDArray[np.int64],obj2: NDArray[np.int64],kind=None,verbose: int=0,tree: dict=None,n_jobs: int=None,executor=None) -> NDArray[np.int64]:
     """
     Return an intersection between two objects.
     
@@ -516,6 +477,13 @@ def intersection_two_obj_1(obj1: NDArray[np.int64],obj2: NDArray[np.int64],kind=
         a set of tetrahedra to be intersected with obj1.
     kind : {'standard', 'simple'}, optional
         The default is 'standard'. 
+    tree : dict, optional
+        AABB tree over obj2 (see spatial.build_tree_6d()).
+    n_jobs : int, optional
+        number of processes, over which the tetrahedra of obj1 are
+        divided (see pyqcstrc.parallel). The default is serial.
+    executor : concurrent.futures.Executor, optional
+        process pool to be used instead of a new one.
     
     Returns
     -------
@@ -534,34 +502,48 @@ def intersection_two_obj_1(obj1: NDArray[np.int64],obj2: NDArray[np.int64],kind=
     if verbose>0:
         print("       start: intersection_two_obj_1()")
     
-    cent2=centroid_obj(obj2)
-    dd2=ball_radius_obj(obj2,cent2)
+    # broad phase: pairs of tetrahedra of which bounding boxes and spheres overlap.
+    # the other pairs are not intersecting (flag=0). They are found once, also
+    # when the tetrahedra of obj1 are divided over processes.
+    index1,index2=candidate_pairs_6d(obj1,obj2,tree)
     
-    counter0=0
-    for tetrahedron1 in obj1:
-        if rough_check_intersection_tetrahedron_obj(tetrahedron1,cent2,dd2):
-            counter1=0
+    if n_jobs not in (None,1) or executor is not None:
+        common4=SimplexBuffer((4,6,3))
+        for a in map_chunks(_intersection_two_obj_1_chunk,len(obj1),[obj1,obj2,index1,index2],(kind,),n_jobs,executor):
+            if np.all(a==None):
+                pass
+            else:
+                common4.append(a)
+        if len(common4)>0:
+            return common4.array()
+        else:
+            return 
+    else:
+        return _intersection_two_obj_1_pairs(obj1,obj2,index1,index2,0,len(obj1),kind)
+
+def _intersection_two_obj_1_pairs(obj1, obj2, index1, index2, start: int, end: int, kind) -> NDArray[np.int64]:
+    """intersection_two_obj_1() of obj1[start:end], given the candidate pairs (index1, index2)."""
+    lo,hi=np.searchsorted(index1,[start,end])
+    index1,index2=index1[lo:hi],index2[lo:hi]
+    candidates=np.split(index2,np.searchsorted(index1,np.arange(start+1,end)))
+    
+    common4=SimplexBuffer((4,6,3))
+    for tetrahedron1,idx in zip(obj1[start:end],candidates):
+        if len(idx)>0:
+            tmp_common4=SimplexBuffer((4,6,3))
             #vol1=tetrahedron_volume_6d(tetrahedron1)
             #print('vol1',vol1,numeric_value(vol1))
-            for tetrahedron2 in obj2:
+            for tetrahedron2 in obj2[idx]:
                 flag=check_intersection_two_tetrahedron_4(tetrahedron1,tetrahedron2)
                 #
                 # tetrahedron_1 is fully inside tetrahedron_2
                 if flag==1:
-                    if counter0==0:
-                        common4=tetrahedron1.reshape(1,4,6,3)
-                        counter0+=1
-                    else:
-                        common4=np.vstack([common4,[tetrahedron1]])
+                    common4.append(tetrahedron1)
                     break
                 #
                 # tetrahedron_2 is fully inside tetrahedron_1
                 elif flag==2:
-                    if counter1==0:
-                        tmp_common4=tetrahedron2.reshape(1,4,6,3)
-                        counter1+=1
-                    else:
-                        tmp_common4=np.vstack([tmp_common4,[tetrahedron2]])
+                    tmp_common4.append(tetrahedron2)
                 #
                 # tetrahedron_1 and tetrahedron_2 are intersecting
                 elif flag==3:
@@ -576,68 +558,40 @@ def intersection_two_obj_1(obj1: NDArray[np.int64],obj2: NDArray[np.int64],kind=
                     if np.all(tmp4==None):
                         pass
                     else:
-                        #print(i)
                         #v=obj_volume_6d(tmp4)
                         #print('.    common vol:',v,numeric_value(v))
-                        if counter1==0:
-                            tmp_common4=tmp4
-                            counter1+=1
-                        else:
-                            tmp_common4=np.vstack((tmp_common4,tmp4))
-                    #if counter1==0:
-                    #    tmp_common4=tmp4
-                    #    counter1+=1
-                    #else:
-                    #    tmp_common4=np.vstack((tmp_common4,tmp4))
+                        tmp_common4.append(tmp4)
                 else:
                     pass
-                #i+=1
                 
-            if counter1!=0:
-                #print('tmp_common4',tmp_common4)
-                #vol2=obj_volume_6d(tmp_common4)
+            if len(tmp_common4)!=0:
+                #vol2=obj_volume_6d(tmp_common4.array())
                 #print('vol2',vol2,numeric_value(vol2))
                 if kind=='simple':
                     vol1=tetrahedron_volume_6d(tetrahedron1)
-                    vol2=obj_volume_6d(tmp_common4)
+                    vol2=obj_volume_6d(tmp_common4.array())
                     if np.all(vol1==vol2):
-                        if counter0==0:
-                            common4=tetrahedron1.reshape(1,4,6,3)
-                            #print('common4.shape',common4.shape)
-                            counter0+=1
-                        else:
-                            #common4=np.concatenate([common4,tetrahedron1])
-                            common4=np.vstack([common4,[tetrahedron1]])
-                            #print('common4.shape',common4.shape)
+                        common4.append(tetrahedron1)
                     else:
-                        if counter0==0:
-                            common4=tmp_common4
-                            counter0+=1
-                            #print('tmp_common4.shape',tmp_common4.shape)
-                        else:
-                            #common4=np.concatenate([common4,tmp_common4])
-                            common4=np.vstack([common4,tmp_common4])
-                            #print('tmp_common4.shape',tmp_common4.shape)
+                        common4.append(tmp_common4.array())
                 else:
-                    #print('tmp_common4.shape:',tmp_common4.shape)
-                    if counter0==0:
-                        common4=tmp_common4
-                        counter0+=1
-                        #print('tmp_common4.shape',tmp_common4.shape)
-                    else:
-                        #print('common4.shape:',common4.shape)
-                        #common4=np.concatenate([common4,tmp_common4])
-                        common4=np.vstack([common4,tmp_common4])
-                        #print('tmp_common4.shape',tmp_common4.shape)
-                #print(common4.shape)
-                #return common4
-    
-    if counter0>0:
-        return common4
+                    common4.append(tmp_common4.array())
+    
+    if len(common4)>0:
+        return common4.array()
     else:
         return 
 
-def intersection_two_obj_convex(obj1: NDArray[np.int64], obj2: NDArray[np.int64], verbose: int=0) -> NDArray[np.int64]:
+def _intersection_two_obj_1_chunk(obj1, obj2, index1, index2, start: int, end: int, kind) -> NDArray[np.int64]:
+    """intersection_two_obj_1() of obj1[start:end] in a process (see pyqcstrc.parallel.map_chunks())."""
+    (obj1,shm1),(obj2,shm2)=attach(obj1),attach(obj2)
+    (index1,shm3),(index2,shm4)=attach(index1),attach(index2)
+    common=_intersection_two_obj_1_pairs(obj1,obj2,index1,index2,start,end,kind)
+    del obj1,obj2,index1,index2
+    detach(shm1,shm2,shm3,shm4)
+    return common
+
+def intersection_two_obj_convex(obj1: NDArray[np.int64], obj2: NDArray[np.int64], verbose: int=0, n_jobs: int=None, executor=None, kind: str=None) -> NDArray[np.int64]:
     """
     Return an intersection between two objects.
     
@@ -647,8 +601,18 @@ def intersection_two_obj_convex(obj1: NDArray[np.int64], obj2: NDArray[np.int64]
         a set of tetrahedra to be intersected with obj2.
     obj2 : ndarray
         a set of tetrahedra to be intersected with obj1.
-    kind : {'standard', 'simple'}, optional
-        The default is 'standard'. 
+    kind : {'halfspace', 'delaunay'}, optional
+        'halfspace' (default): obj2 is clipped by the faces of obj1 in
+        exact arithmetic (see pyqcstrc.ico2.halfspace).
+        'delaunay': tetrahedralization of the intersecting points and
+        the vertices inside the other object.
+    n_jobs : int, optional
+        number of processes, over which the pairs of edges and triangles
+        are divided (see pyqcstrc.parallel). The default is serial.
+        Only for kind='delaunay'; a warning is issued when it is given
+        with kind='halfspace', which is serial.
+    executor : concurrent.futures.Executor, optional
+        process pool to be used instead of a new one (kind='delaunay').
     
     Returns
     -------
@@ -663,6 +627,13 @@ def intersection_two_obj_convex(obj1: NDArray[np.int64], obj2: NDArray[np.int64]
     if verbose>0:
         print("       start: intersection_two_obj_convex()")
     
+    if kind not in (None,'halfspace','delaunay'):
+        raise ValueError("kind must be 'halfspace' or 'delaunay', not %r"%(kind,))
+    if kind is None or kind=='halfspace':
+        if n_jobs not in (None,1) or executor is not None:
+            warnings.warn("n_jobs and executor are used only with kind='delaunay'.",RuntimeWarning,stacklevel=2)
+        return intersection_convex_6d(obj1,obj2)
+    
     obj1_surf=generator_surface_1(obj1)
     obj2_surf=generator_surface_1(obj2)
     obj1_edge=generator_unique_edges(obj1_surf)
@@ -679,56 +650,18 @@ def intersection_two_obj_convex(obj1: NDArray[np.int64], obj2: NDArray[np.int64]
     # (1) Extract vertces of 2nd OD which are insede 1st OD --> point_a1
     #     Extract vertces of 2nd OD which are outsede 1st OD --> point_b2
     #
-    counter1a=0
-    #counter2a=0
     vertices1=remove_doubling_in_perp_space(obj1_edge) # generating vertces of 1st OD
-    for vrtx in vertices1:
-        counter2a=0
-        for tetrahedron2 in obj2:
-            if inside_outside_tetrahedron_tau(vrtx,tetrahedron2):
-                counter2a+=1
-                break
-            else:
-                pass
-        if counter2a>0:
-            if counter1a==0:
-                point_a1=vrtx.reshape(1,6,3)
-            else:
-                point_a1=np.vstack([point_a1,[vrtx]])
-            counter1a+=1
-        #else:
-        #    if counter2==0:
-        #        point_b2=vrtx.reshape(1,6,3)
-        #    else:
-        #        point_b2=np.vstack([point_b2,[vrtx]])
-        #    counter2+=1
+    mask=classify_points_6d(vertices1,obj2,obj2_surf)!=OUTSIDE
+    point_a1=vertices1[mask]
+    counter1a=len(point_a1)
     #
     # (2) Extract vertces of 1st OD which are insede 2nd OD --> point_b1
     #     Extract vertces of 1st OD which are outsede 2nd OD --> point_a2
     #
-    counter1b=0
-    #counter2b=0
     vertices2=remove_doubling_in_perp_space(obj2_edge) # generating vertces of 2nd OD
-    for vrtx in vertices2:
-        counter2b=0
-        for tetrahedron1 in obj1:
-            if inside_outside_tetrahedron_tau(vrtx,tetrahedron1):
-                counter2b+=1
-                break
-            else:
-                pass
-        if counter2b>0:
-            if counter1b==0:
-                point_b1=vrtx.reshape(1,6,3)
-            else:
-                point_b1=np.vstack([point_b1,[vrtx]])
-            counter1b+=1
-        #else:
-        #    if counter2==0:
-        #        point_a2=vrtx.reshape(1,6,3)
-        #    else:
-        #        point_a2=np.vstack([point_a2,[vrtx]])
-        #    counter2+=1
+    mask=classify_points_6d(vertices2,obj1,obj1_surf)!=OUTSIDE
+    point_b1=vertices2[mask]
+    counter1b=len(point_b1)
     if counter1a==len(vertices1): # obj1 is fully inside obj2
         return obj1
     elif counter1b==len(vertices2): # obj2 is fully inside obj1
@@ -737,32 +670,15 @@ def intersection_two_obj_convex(obj1: NDArray[np.int64], obj2: NDArray[np.int64]
         #
         # (3) Get intersecting points between obj1 and obj2
         #
-        counter=0
-        for tr1 in obj1_surf:
-            for ed2 in obj2_edge:
-                if check_intersection_segment_surface_numerical_6d_tau(ed2,tr1): # intersection
-                    tmp=intersection_segment_surface(ed2,tr1)
-                    if counter==0:
-                        p=tmp
-                    else:
-                        p=np.vstack([p,tmp])
-                    counter+=1
-                else:
-                    pass
-        for tr2 in obj2_surf:
-            for ed1 in obj1_edge:
-                if check_intersection_segment_surface_numerical_6d_tau(ed1,tr2): # intersection
-                    tmp=intersection_segment_surface(ed1,tr2)
-                    if counter==0:
-                        p=tmp
-                    else:
-                        p=np.vstack([p,tmp])
-                    counter+=1
-                else:
-                    pass
-        if counter==0:
+        p=SimplexBuffer((6,3))
+        for edge,surf in [(obj2_edge,obj1_surf),(obj1_edge,obj2_surf)]:
+            si,ti=segments_triangles_6d(edge,surf)
+            for a in map_chunks(_intersection_segments_surfaces_chunk,len(si),[edge[si],surf[ti]],(),n_jobs,executor):
+                p.append(a)
+        if len(p)==0:
             return 
         else:
+            p=p.array()
             point1=remove_doubling_in_perp_space(p)
             #
             # (3) Sum point A, point B and Intersections --->>> common part
@@ -778,12 +694,26 @@ def intersection_two_obj_convex(obj1: NDArray[np.int64], obj2: NDArray[np.int64]
             else:
                 return common
 
+def _intersection_segments_surfaces_chunk(segments, surfaces, start: int, end: int) -> NDArray[np.int64]:
+    """intersecting points of pairs of segments[start:end] and surfaces[start:end] (see pyqcstrc.parallel.map_chunks())."""
+    (segments,shm1),(surfaces,shm2)=attach(segments),attach(surfaces)
+    p=SimplexBuffer((6,3))
+    for i1 in range(start,end):
+        vtx=intersection_segment_surface(segments[i1],surfaces[i1])
+        if np.all(vtx==None):
+            pass
+        else:
+            p.append(vtx)
+    del segments,surfaces
+    detach(shm1,shm2)
+    return p.array()
+
 #########
 ###
 ###   WIP
 ###
 #########
-def subtraction_two_obj(obj1: NDArray[np.int64], obj2: NDArray[np.int64], verbose: int=0) -> NDArray[np.int64]:
+def subtraction_two_obj(obj1: NDArray[np.int64], obj2: NDArray[np.int64], verbose: int=0, n_jobs: int=None, executor=None) -> NDArray[np.int64]:
     """Operate A not B (= A NOT (A AND B)).
 
     Parameters
@@ -793,6 +723,11 @@ def subtraction_two_obj(obj1: NDArray[np.int64], obj2: NDArray[np.int64], verbos
     obj2: array, (number of tetrahedra, 4, 6, 3)
         Object B that subtracts the tetrahedron.
     verbose: int
+    n_jobs: int, optional
+        number of processes, over which the tetrahedra of obj1 are
+        divided (see pyqcstrc.parallel). The default is serial.
+    executor: concurrent.futures.Executor, optional
+        process pool to be used instead of a new one.
 
     Returns
     -------
@@ -816,22 +751,30 @@ def subtraction_two_obj(obj1: NDArray[np.int64], obj2: NDArray[np.int64], verbos
     #    start=time.time()
     #
     
+    if n_jobs not in (None,1) or executor is not None:
+        out=SimplexBuffer((4,6,3))
+        for a in map_chunks(_subtraction_two_obj_chunk,len(obj1),[obj1,obj2,surface_obj2],(),n_jobs,executor):
+            if np.all(a==None):
+                return 
+            else:
+                out.append(a)
+        if len(out)>0:
+            return out.array()
+        else:
+            return 
+    
     flag=0
-    out=None
+    out=SimplexBuffer((4,6,3))
     counter1=0
     for tetrahedron in obj1:
         if verbose>0:
             print('       %d-th tetrahedron in obj1'%(counter1))
         a=tetrahedron_not_obj_1(tetrahedron.reshape(1,4,6,3),obj2,surface_obj2,verbose)
         if np.all(a==None):
-            out=None
             flag=1
             break
         else:
-            if counter1==0:
-                out=a
-            else:
-                out=np.vstack([out,a])
+            out.append(a)
         counter1+=1
     
     #if flag==0:
@@ -839,7 +782,29 @@ def subtraction_two_obj(obj1: NDArray[np.int64], obj2: NDArray[np.int64], verbos
     #        end=time.time()
     #        time_diff=end-start
     #        print('         ends in %4.3f sec'%time_diff)
-    return out
+    if flag==1 or len(out)==0:
+        return 
+    else:
+        return out.array()
+
+def _subtraction_two_obj_chunk(obj1, obj2, surface_obj2, start: int, end: int) -> NDArray[np.int64]:
+    """subtraction_two_obj() of obj1[start:end] in a process (see pyqcstrc.parallel.map_chunks())."""
+    (obj1,shm1),(obj2,shm2),(surface_obj2,shm3)=attach(obj1),attach(obj2),attach(surface_obj2)
+    out=SimplexBuffer((4,6,3))
+    a=None
+    for i1 in range(start,end):
+        a=tetrahedron_not_obj_1(obj1[i1:i1+1],obj2,surface_obj2)
+        if np.all(a==None):
+            out=None
+            break
+        else:
+            out.append(a)
+    del obj1,obj2,surface_obj2,a
+    detach(shm1,shm2,shm3)
+    if out is None:
+        return 
+    else:
+        return out.array()
 
 def tetrahedron_not_obj_1(tetrahedron: NDArray[np.int64], obj: NDArray[np.int64], surface_obj: NDArray[np.int64], verbose: int=0) -> NDArray[np.int64]:
     """Operate tetrahedron not object = tetrahedron not (tetrahedron and object).
@@ -861,6 +826,7 @@ def tetrahedron_not_obj_1(tetrahedron: NDArray[np.int64], obj: NDArray[np.int64]
     Note
     ----
     Current implementation may return wrong object when the intersecting between the objects is not simple.
+    See pyqcstrc.ico2.bsp for exact operations of such objects.
     
     """
     
@@ -899,50 +865,17 @@ def tetrahedron_not_obj_1(tetrahedron: NDArray[np.int64], obj: NDArray[np.int64]
     # ほとんど重なっている場合、必ずしも上記(2)が求めたい頂点のみを含むとは限らず、
     # 余計なもまで作ってしまう。
     ################################################
-    counter2=0
-    for triangle2 in surface_common:
-        counter1=0
-        for vrtx2 in triangle2:
-            for triangle3 in surface_obj:
-                if on_out_surface(vrtx2,triangle3): # on
-                    counter1+=1
-                    break
-                else:
-                    pass
-        if counter1==3:
-            if counter2==0:
-                tmp=triangle2.reshape(1,3,6,3)
-            else:
-                tmp=np.vstack([tmp,[triangle2]])
-            counter2+=1
-        else:
-            pass
-    triangle_common=tmp
+    # vertices of the triangles and of tetrahedron are classified at once
+    tetrahedron=tetrahedron.reshape(4,6,3)
+    code=classify_points_6d(np.vstack([surface_common.reshape(-1,6,3),tetrahedron]),obj,surface_obj)
+    on=(code[:-4]>=ON_FACE).reshape(-1,3)
+    triangle_common=surface_common[np.all(on,axis=1)]
     #print('triangle_common.shape',triangle_common.shape)
     
     
     # get vertices of tetrahedron which are NOT inside obj
-    counter2=0
-    tetrahedron=tetrahedron.reshape(4,6,3)
-    for vrtx1 in tetrahedron:
-        counter1=0
-        for tet3 in obj:
-            #print('vrtx1.shape',vrtx1.shape)
-            #print('tet3.shape',tet3.shape)
-            if inside_outside_tetrahedron_tau(vrtx1,tet3): # inside
-                counter1+=1
-                break
-            else:
-                pass
-        if counter1==0:
-            if counter2==0:
-                tmp=vrtx1.reshape(1,6,3)
-            else:
-                tmp=np.vstack([tmp1a,[vrtx1]])
-            counter2+=1
-        else:
-            pass
-    vrtx1_out=tmp
+    vrtx1_out=tetrahedron[code[-4:]==OUTSIDE]
+    counter2=len(vrtx1_out)
     #print('vrtx1_out.shape',vrtx1_out.shape)
     
     
@@ -955,7 +888,6 @@ def tetrahedron_not_obj_1(tetrahedron: NDArray[np.int64], obj: NDArray[np.int64]
     if counter2==1:
         if verbose>0:
             print('         case 1')
-        counter3=0
         
         
         #---------------------------------------
@@ -989,15 +921,10 @@ def tetrahedron_not_obj_1(tetrahedron: NDArray[np.int64], obj: NDArray[np.int64]
         
         
         #print('triangle_common.shape',triangle_common.shape)
+        tmp=SimplexBuffer((4,6,3))
         for triangle in triangle_common:
-            #print('triangle.shape',triangle.shape)
-            tet=np.vstack([vrtx1_out,triangle]).reshape(1,4,6,3)
-            #print('tet.shape',tet.shape)
-            if counter3==0:
-                tmp=tet
-            else:
-                tmp=np.vstack([tmp,tet])
-            counter3+=1
+            tmp.append(np.vstack([vrtx1_out,triangle]))
+        tmp=tmp.array()
         #print('tmp.shape',tmp.shape)
         vol=obj_volume_6d(tmp)
         if verbose>1:
@@ -1017,13 +944,14 @@ def tetrahedron_not_obj_1(tetrahedron: NDArray[np.int64], obj: NDArray[np.int64]
             ################################################
             #print('len(tmp)',len(tmp))
             vol=np.array([0,0,1])
+            vols=tetrahedra_volume_6d(tmp)
             lst=list(range(0,len(tmp)))
             for num in range(1,len(tmp)-1):
                 flag=0
                 for comb in list(itertools.combinations(lst,num)):
                     #print(comb)
                     for i1 in range(num):
-                        v=tetrahedron_volume_6d(tmp[comb[i1]])
+                        v=vols[comb[i1]]
                         #print('    ',v)
                         vol=add(vol,v)
                     if np.all(vol==vol2):
@@ -1032,11 +960,7 @@ def tetrahedron_not_obj_1(tetrahedron: NDArray[np.int64], obj: NDArray[np.int64]
                     else:
                         pass
                 if flag==1:
-                    for i1 in range(num):
-                        if i1==0:
-                            tmp1=tmp[comb[i1]].reshape(1,4,6,3)
-                        else:
-                            tmp1=np.vstack([tmp1,[tmp[comb[i1]]]])
+                    tmp1=tmp[list(comb)]
                     break
                 else:
                     pass
@@ -4,12 +4,85 @@
 # Copyright (c) 2021 Tsunetomo Yamada <tsunetomo.yamada@rs.tus.ac.jp>
 #
 import sys
+import warnings
 import numpy as np
 from numpy.typing import NDArray
 #sys.path.append('.')
 from pyqcstrc.ico2.numericalc import coplanar_check_numeric_tau
+from pyqcstrc import qfield
+from pyqcstrc.qfield import (set_overflow_check,
+                            overflow_count,
+                            reset_overflow_count,
+                            as_array,
+                            normalize_batch,
+                            add_batch,
+                            sub_batch,
+                            sum_batch,
+                            common_denominator,
+                            promote,
+                            dot_product_1_batch,
+                            )
+from pyqcstrc.constants import (ICO_EPERP_INT,
+                                ICO_EPERP_TAU,
+                                ICO_PROJECTION,
+                                ICO_PROJECTION_PERP,
+                                )
 
-TAU=(1+np.sqrt(5))/2.0
+# TAU-style, (a+b*TAU)/c, where TAU**2 = 1+TAU (see pyqcstrc.qfield)
+FIELD=(1,1,1)
+
+def mul_batch(a: NDArray[np.int64], b:NDArray[np.int64], normalize: bool=True) -> NDArray[np.int64]:
+    """
+    # multiplication (a*b) of sets of values in TAU-style
+    
+    Parameters
+    ----------
+    a: array, (...,3)
+        values in TAU-style
+    b: array, (...,3)
+        values in TAU-style, broadcastable with a
+    normalize: bool
+        False: the gcd reduction is deferred (see pyqcstrc.qfield.lazy_reduce).
+    
+    Returns
+    -------
+    array, (...,3)
+    """
+    return qfield.mul_batch(a,b,FIELD,normalize)
+
+def div_batch(a: NDArray[np.int64], b:NDArray[np.int64], normalize: bool=True) -> NDArray[np.int64]:
+    """
+    # division (a/b) of sets of values in TAU-style
+    
+    Parameters
+    ----------
+    a: array, (...,3)
+        values in TAU-style
+    b: array, (...,3)
+        values in TAU-style, broadcastable with a
+    normalize: bool
+        False: the gcd reduction is deferred (see pyqcstrc.qfield.lazy_reduce).
+    
+    Returns
+    -------
+    array, (...,3)
+    """
+    return qfield.div_batch(a,b,FIELD,normalize)
+
+def sign_batch(x: NDArray[np.int64]) -> NDArray[np.int64]:
+    """exact sign of a set of values in TAU-style.
+    
+    Parameters
+    ----------
+    x: array, (...,3)
+        values in TAU-style
+    
+    Returns
+    -------
+    array, (...)
+        -1, 0 or 1
+    """
+    return qfield.sign_batch(x,FIELD)
 
 def add(a: NDArray[np.int64], b:NDArray[np.int64]) -> NDArray[np.int64]:
     """
@@ -26,18 +99,7 @@ def add(a: NDArray[np.int64], b:NDArray[np.int64]) -> NDArray[np.int64]:
     -------
     array
     """
-    c1=a[0]*b[2]+b[0]*a[2]
-    c2=a[1]*b[2]+b[1]*a[2]
-    c3=a[2]*b[2]
-    x=np.array([c1,c2,c3],dtype=np.int64)
-    g=np.gcd.reduce(x)
-    c1=c1/g
-    c2=c2/g
-    c3=c3/g
-    if c3<0:
-        return np.array([int(-c1),int(-c2),int(-c3)])
-    else:
-        return np.array([int(c1),int(c2),int(c3)])
+    return add_batch(a,b)
 
 def mul(a: NDArray[np.int64], b:NDArray[np.int64]) -> NDArray[np.int64]:
     """
@@ -54,22 +116,11 @@ def mul(a: NDArray[np.int64], b:NDArray[np.int64]) -> NDArray[np.int64]:
     -------
     array
     """
-    c1=a[0]*b[0]+a[1]*b[1]
-    c2=a[0]*b[1]+a[1]*b[0]+a[1]*b[1]
-    c3=a[2]*b[2]
-    x=np.array([c1,c2,c3],dtype=np.int64)
-    g=np.gcd.reduce(x)
-    c1=c1/g
-    c2=c2/g
-    c3=c3/g
-    if c3<0:
-        return np.array([int(-c1),int(-c2),int(-c3)])
-    else:
-        return np.array([int(c1),int(c2),int(c3)])
+    return mul_batch(a,b)
 
 def sub(a: NDArray[np.int64], b:NDArray[np.int64]) -> NDArray[np.int64]:
     """
-    # subtraction (a/b) in TAU-style
+    # subtraction (a-b) in TAU-style
     
     Parameters
     ----------
@@ -82,9 +133,7 @@ def sub(a: NDArray[np.int64], b:NDArray[np.int64]) -> NDArray[np.int64]:
     -------
     array
     """
-    c=np.array([-1,0,1],dtype=np.int64)
-    b=mul(c,b)
-    return add(a,b)
+    return sub_batch(a,b)
 
 def div(a: NDArray[np.int64], b:NDArray[np.int64]) -> NDArray[np.int64]:
     """
@@ -101,39 +150,7 @@ def div(a: NDArray[np.int64], b:NDArray[np.int64]) -> NDArray[np.int64]:
     -------
     array
     """
-    if np.all(b[:2]==0):
-        print('ERROR_1:division error')
-        return 
-    else:
-        if np.all(a[:2]==0):
-            return np.array([0,0,1],dtype=np.int64)
-        else:
-            if b[1]!=0:
-                if b[0]!=0:
-                    c1=(a[0]*b[0] + a[0]*b[1] - a[1]*b[1])*b[2]
-                    c2=(a[1]*b[0] - a[0]*b[1]            )*b[2]
-                    c3=(b[0]*b[0] - b[1]*b[1] + b[0]*b[1])*a[2]
-                else:
-                    c1=(-a[0]+a[1])*b[2]
-                    c2=        a[0]*b[2]
-                    c3=        b[1]*a[2]
-            else:
-                c1=a[0]*b[2]
-                c2=a[1]*b[2]
-                c3=b[0]*a[2]
-            x=np.array([c1,c2,c3],dtype=np.int64)
-            g=np.gcd.reduce(x)
-            if g!=0:
-                c1=c1/g
-                c2=c2/g
-                c3=c3/g
-                if c3<0:
-                    return np.array([int(-c1),int(-c2),int(-c3)],dtype=np.int64)
-                else:
-                    return np.array([int(c1),int(c2),int(c3)],dtype=np.int64)
-            else:
-                print('ERROR_2:division error')
-                return 
+    return div_batch(a,b)
 
 def add_vectors(vt1: NDArray[np.int64], vt2:NDArray[np.int64]) -> NDArray[np.int64]:
     """Composition of two vectors, v1+v2
@@ -150,10 +167,7 @@ def add_vectors(vt1: NDArray[np.int64], vt2:NDArray[np.int64]) -> NDArray[np.int
     Composition of two vectors: array in TAU-style
     
     """
-    a=np.zeros(vt1.shape,dtype=np.int64)
-    for i in range(len(vt1)):
-        a[i]=add(vt1[i],vt2[i])
-    return a
+    return add_batch(vt1,vt2)
 
 def sub_vectors(vt1: NDArray[np.int64], vt2:NDArray[np.int64]) -> NDArray[np.int64]:
     """Subtraction of two vectors, v1-v2
@@ -170,9 +184,7 @@ def sub_vectors(vt1: NDArray[np.int64], vt2:NDArray[np.int64]) -> NDArray[np.int
     Subtraction of two vectors: array in TAU-style
     """
     if vt1.ndim==2 and vt2.ndim==2:
-        const=np.array([-1,0,1],dtype=np.int64)
-        vt2=mul_vector(vt2,const)
-        return add_vectors(vt1,vt2)
+        return sub_batch(vt1,vt2)
     else:
         print('incorrect shape')
         return
@@ -192,10 +204,7 @@ def mul_vector(vt: NDArray[np.int64], coeff:NDArray[np.int64]) -> NDArray[np.int
     Multiplied vector: array in TAU-style
     """
     if vt.ndim==2:
-        a=np.zeros(vt.shape,dtype=np.int64)
-        for i,v in enumerate(vt):
-            a[i]=mul(v,coeff)
-        return a
+        return mul_batch(vt,coeff)
     else:
         print('incorrect shape')
         return
@@ -214,16 +223,8 @@ def mul_vectors(vts: NDArray[np.int64], coeff:NDArray[np.int64]) -> NDArray[np.i
     -------
     Multiplied vectors: array in TAU-style
     """
-    if vts.ndim==3:
-        a=np.zeros(vts.shape,dtype=np.int64)
-        for i,vt in enumerate(vts):
-            a[i]=mul_vector(vt,coeff)
-        return a
-    elif vts.ndim==4:
-        a=np.zeros(vts.shape,dtype=np.int64)
-        for i1,vt in enumerate(vts):
-            for i2,v in enumerate(vt):
-                a[i1][i2]=mul_vector(v,coeff)
+    if vts.ndim==3 or vts.ndim==4:
+        return mul_batch(vts,coeff)
     else:
         print('incorrect shape')
         return
@@ -242,19 +243,28 @@ def outer_product(vt1: NDArray[np.int64], vt2:NDArray[np.int64]) -> NDArray[np.i
     -------
     Outer product: array in TAU-style
     """
-    a=mul(vt1[1],vt2[2])
-    b=mul(vt1[2],vt2[1])
-    c1=sub(a,b)
-    #
-    a=mul(vt1[2],vt2[0])
-    b=mul(vt1[0],vt2[2])
-    c2=sub(a,b)
-    #
-    a=mul(vt1[0],vt2[1])
-    b=mul(vt1[1],vt2[0])
-    c3=sub(a,b)
-    #
-    return np.array([c1,c2,c3],dtype=np.int64)
+    # (v1[1]*v2[2]-v1[2]*v2[1], v1[2]*v2[0]-v1[0]*v2[2], v1[0]*v2[1]-v1[1]*v2[0])
+    a=mul_batch(vt1[[1,2,0]],vt2[[2,0,1]],normalize=False)
+    b=mul_batch(vt1[[2,0,1]],vt2[[1,2,0]],normalize=False)
+    return sub_batch(a,b)
+
+def dot_product_batch(mat1: NDArray[np.int64], mat2:NDArray[np.int64], normalize: bool=True) -> NDArray[np.int64]:
+    """product of stacks of matrices in TAU-style, mat1*mat2.
+    
+    Parameters
+    ----------
+    mat1: ndarray
+        (...,s,t,3) in TAU-style
+    mat2: ndarray
+        (...,t,u,3) in TAU-style, leading dimensions broadcastable with mat1
+    normalize: bool
+        False: the gcd reduction is deferred (see pyqcstrc.qfield.lazy_reduce).
+    
+    Returns
+    -------
+    product: array, (...,s,u,3) in TAU-style
+    """
+    return qfield.dot_product_batch(mat1,mat2,FIELD,normalize)
 
 def inner_product(vt1: NDArray[np.int64], vt2:NDArray[np.int64]) -> NDArray[np.int64]:
     """Inner product of two vectors, v1 and v2 in TAU-style.
@@ -276,11 +286,7 @@ def inner_product(vt1: NDArray[np.int64], vt2:NDArray[np.int64]) -> NDArray[np.i
         print('matrices have not a proper shape.')
         return 
     else:
-        a=np.array([0,0,1])
-        for i in range(s1):
-            b=mul(vt1[i],vt2[i])
-            a=add(a,b)
-        return a
+        return dot_product_batch(vt1[np.newaxis],vt2[:,np.newaxis])[0,0]
 
 def dot_product(mat1: NDArray[np.int64], mat2:NDArray[np.int64]) -> NDArray[np.int64]:
     """product of two matrices, mat1*mat2.
@@ -309,31 +315,10 @@ def dot_product(mat1: NDArray[np.int64], mat2:NDArray[np.int64]) -> NDArray[np.i
             print('incorrect shape found in dot_product')
             return 
         else:
-            mat_new=np.zeros((s,3),dtype=np.int64)
-            for k in range(s):
-                a=np.array([0,0,1])
-                for j in range(t1):
-                    b=mul(mat1[k][j],mat2[j])
-                    a=add(a,b)
-                mat_new[k]=a
-            return mat_new
+            return dot_product_batch(mat1,mat2[:,np.newaxis])[:,0]
             
     elif ndim1==3 and ndim2==3:
-        s,t1,_=mat1.shape
-        t2,u,_=mat2.shape
-        if t1!=t2:
-            print('incorrect shape found in dot_product')
-            return 
-        else:
-            mat_new=np.zeros((s,u,3),dtype=np.int64)
-            for k in range(s):
-                for j in range(u):
-                    a=np.array([0,0,1])
-                    for i in range(t1):
-                        b=mul(mat1[k][i],mat2[i][j])
-                        a=add(a,b)
-                    mat_new[k][j]=a
-            return mat_new
+        return dot_product_batch(mat1,mat2)
     else:
         print('incorrect shape found in dot_product')
         return 
@@ -362,33 +347,10 @@ def dot_product_1(mat1: NDArray[np.int64], mat2:NDArray[np.int64]) -> NDArray[np
             print('incorrect shape found in dot_product')
             return 
         else:
-            mat_new=np.zeros((s,3),dtype=np.int64)
-            for k in range(s):
-                a=np.array([0,0,1])
-                for j in range(t1):
-                    val=np.array([mat1[k][j],0,1])
-                    b=mul(val,mat2[j])
-                    a=add(a,b)
-                mat_new[k]=a
-            return mat_new
+            return dot_product_1_batch(mat1,mat2[:,np.newaxis])[:,0]
             
     elif ndim1==2 and ndim2==3:
-        s,t1,=mat1.shape
-        t2,u,_=mat2.shape
-        if t1!=t2:
-            print('incorrect shape found in dot_product')
-            return 
-        else:
-            mat_new=np.zeros((s,u,3),dtype=np.int64)
-            for k in range(s):
-                for j in range(u):
-                    a=np.array([0,0,1])
-                    for i in range(t1):
-                        val=np.array([mat1[k][j],0,1])
-                        b=mul(val,mat2[i][j])
-                        a=add(a,b)
-                    mat_new[k][j]=a
-            return mat_new
+        return dot_product_1_batch(mat1,mat2)
     else:
         print('incorrect shape found in dot_product')
         return 
@@ -396,10 +358,6 @@ def dot_product_1(mat1: NDArray[np.int64], mat2:NDArray[np.int64]) -> NDArray[np
 
 
 
-
-
-
-
 def projection(vt: NDArray[np.int64]) -> NDArray[np.int64]:
     """projection of a 6d vector onto Epar and Eperp in "TAU-style"
     NOTE: coefficient (alpha) of the projection matrix is set to be 1.
@@ -415,18 +373,9 @@ def projection(vt: NDArray[np.int64]) -> NDArray[np.int64]:
     -------
     array containing two 3d vectors projected onto Epar and Eperp in TAU-style.
     """
-    m0=np.array([ 0, 0, 1]) #  0 in 'TAU-style'
-    m1=np.array([ 1, 0, 1]) #  1
-    m2=np.array([-1, 0, 1]) # -1
-    m3=np.array([ 0, 1, 1]) #  tau
-    m4=np.array([ 0,-1, 1]) # -tau
-    v1e=mtrixcal(m1,m3,m3,m0,m2,m0,vt) # 1,tau,tau,0,-1,0
-    v2e=mtrixcal(m3,m0,m0,m1,m3,m1,vt) # tau,0,0,1,TAU,1
-    v3e=mtrixcal(m0,m1,m2,m4,m0,m3,vt) # 0,1,-1,-tau,0,tau
-    v1i=mtrixcal(m3,m2,m2,m0,m4,m0,vt) # tau,-1,-1,0,-tau,0
-    v2i=mtrixcal(m2,m0,m0,m3,m2,m3,vt) # -1,0,0,tau,-1,tau
-    v3i=mtrixcal(m0,m3,m4,m1,m0,m2,vt) # 0,tau,-tau,1,0,-1
-    return np.array([[v1e,v2e,v3e],[v1i,v2i,v3i]],dtype=np.int64)
+    vt=as_array(vt)
+    v=dot_product_batch(ICO_PROJECTION,vt[...,np.newaxis,:])
+    return v.reshape(vt.shape[:-2]+(2,3,3))
 
 def projection3(vt: NDArray[np.int64]) -> NDArray[np.int64]:
     """projection of a 6d vector onto Eperp in "TAU-style"
@@ -443,19 +392,31 @@ def projection3(vt: NDArray[np.int64]) -> NDArray[np.int64]:
     -------
     3d vectors projected onto Eperp in TAU-style.
     """
+    return projection3_batch(vt)
+
+def projection3_batch(vts: NDArray[np.int64]) -> NDArray[np.int64]:
+    """projection of a set of 6d vectors onto Eperp in "TAU-style"
+    
+    All vectors are projected at once by integer matrix operations in
+    compact representation (see projection3_compact()).
+    
+    Parameters
+    ----------
+    vts: array, (...,6,3)
+        6-dimensional vectors in TAU-style, e.g. (6,3), (N,6,3) or (n,4,6,3)
 
-    m0=np.array([ 0, 0, 1]) #  0 in 'TAU-style'
-    m1=np.array([ 1, 0, 1]) #  1
-    m2=np.array([-1, 0, 1]) # -1
-    m3=np.array([ 0, 1, 1]) #  tau
-    m4=np.array([ 0,-1, 1]) # -tau
-    #v1e=mtrixcal(m1,m3,m3,m0,m2,m0,h1,h2,h3,h4,h5,h6) # 1,tau,tau,0,-1,0
-    #v2e=mtrixcal(m3,m0,m0,m1,m3,m1,h1,h2,h3,h4,h5,h6) # tau,0,0,1,TAU,1
-    #v3e=mtrixcal(m0,m1,m2,m4,m0,m3,h1,h2,h3,h4,h5,h6) # 0,1,-1,-tau,0,tau
-    v1i=mtrixcal(m3,m2,m2,m0,m4,m0,vt) # tau,-1,-1,0,-tau,0
-    v2i=mtrixcal(m2,m0,m0,m3,m2,m3,vt) # -1,0,0,tau,-1,tau
-    v3i=mtrixcal(m0,m3,m4,m1,m0,m2,vt) # 0,tau,-tau,1,0,-1
-    return np.array([v1i,v2i,v3i],dtype=np.int64)
+    Returns
+    -------
+    array, (...,3,3)
+        3d vectors projected onto Eperp in TAU-style.
+    """
+    vts=as_array(vts)
+    if vts.ndim<2 or vts.shape[-2:]!=(6,3):
+        print('incorrect shape found in projection3_batch')
+        return 
+    num,den=to_compact(vts)
+    num,den=projection3_compact(num,den)
+    return from_compact(num,den)
 
 def projection_perp(vt: NDArray[np.int64]) -> NDArray[np.int64]:
     """This returns 6D indeces of a projection of 6D vector (v) onto Eperp
@@ -469,16 +430,8 @@ def projection_perp(vt: NDArray[np.int64]) -> NDArray[np.int64]:
     -------
     6d vectors projected onto Eperp in TAU-style.
     """
-    m1=np.array([ 1, 0, 2]) #  (TAU+2)/2/(2+TAU)=1/2 in 'TAU-style'
-    m2=np.array([-1, 2,10]) #  TAU/2/(2+TAU)
-    m3=np.array([ 1,-2,10]) # -TAU/2/(2+TAU)
-    h1=mtrixcal(m1,m3,m3,m3,m3,m3,vt) # (tau+2,-tau,-tau,-tau,-tau,-tau)/2
-    h2=mtrixcal(m3,m1,m3,m2,m2,m3,vt) # (-tau,tau+2,-tau,tau,tau,-tau)/2
-    h3=mtrixcal(m3,m3,m1,m3,m2,m2,vt) # (-tau,-tau,tau+2,-tau,tau,tau)/2
-    h4=mtrixcal(m3,m2,m3,m1,m3,m2,vt) # (-tau,tau,-tau,tau+2,-tau,tau)/2
-    h5=mtrixcal(m3,m2,m2,m3,m1,m3,vt) # (-tau,tau,tau,-tau,tau+2,-tau)/2
-    h6=mtrixcal(m3,m3,m2,m2,m3,m1,vt) # (-tau,-tau,tau,tau,-tau,tau+2)/2
-    return np.array([h1,h2,h3,h4,h5,h6],dtype=np.int64)
+    vt=as_array(vt)
+    return dot_product_batch(ICO_PROJECTION_PERP,vt[...,np.newaxis,:])[...,0,:]
     #const=1/(2.0+TAU)
     #m1 =((TAU+2)*n1 -     TAU*n2 -     TAU*n3 -     TAU*n4 -     TAU*n5 -     TAU*n6)/2.0*const
     #m2 = ( - TAU*n1 + (TAU+2)*n2 -     TAU*n3 +     TAU*n4 +     TAU*n5 -     TAU*n6)/2.0*const
@@ -488,41 +441,177 @@ def projection_perp(vt: NDArray[np.int64]) -> NDArray[np.int64]:
     #m6 = ( - TAU*n1 -     TAU*n2 +     TAU*n3 +     TAU*n4 -     TAU*n5 + (TAU+2)*n6)/2.0*const
     #return m1,m2,m3,m4,m5,m6
 
-def mtrixcal(
-    m1: NDArray[np.int64],
-    m2: NDArray[np.int64],
-    m3: NDArray[np.int64],
-    m4: NDArray[np.int64],
-    m5: NDArray[np.int64],
-    m6: NDArray[np.int64],
-    v: NDArray[np.int64],
-    ) -> NDArray[np.int64]:
-    """function used in projection()
-                        projection3()
-                        projection_perp()
+#----------------------------
+# Compact representation
+#
+# A set of 6d vectors in TAU-style, (...,6,3), is stored as integer
+# numerators (...,6,2) and common denominators, either one for each
+# vertex (shape (...)) or one for the whole object (shape ()).
+# Shift, symmetry operation and projection are integer matrix
+# operations on the numerators, and no gcd is needed until the
+# result is converted back by from_compact().
+#----------------------------
+
+# Eperp projection matrix, EPERP_INT + EPERP_TAU*TAU (see pyqcstrc.constants)
+EPERP_INT=ICO_EPERP_INT
+EPERP_TAU=ICO_EPERP_TAU
+EPERP_INT_TAU=EPERP_INT+EPERP_TAU
+
+def to_compact(obj: NDArray[np.int64], per: str='vertex'):
+    """convert 6d vectors in TAU-style into numerators with common denominators.
     
     Parameters
     ----------
-    m1,m2,m3,m4,m5,m6:array for projection materix
-    v: array
-        6-dimensional vector in TAU-style
+    obj: array, (...,6,3)
+        6d vectors in TAU-style, e.g. (6,3), (n,6,3) or (n,4,6,3)
+    per: {'vertex', 'object'}
+        'vertex' (default): one denominator for each 6d vector.
+        'object': one denominator for the whole array.
+    
+    Returns
+    -------
+    num: array, (...,6,2)
+        numerators, (a,b) in (a+b*TAU)/den
+    den: array, (...) or ()
+        common denominators (positive)
+    """
+    obj=as_array(obj)
+    # the lcm and the scaling of the numerators are overflow-checked
+    # (see pyqcstrc.qfield.common_denominator()).
+    if per=='vertex':
+        num,den=common_denominator(obj,axis=-1)
+        den=den[...,0]
+    elif per=='object':
+        num,den=common_denominator(obj.reshape(-1,3),axis=0)
+        num=num.reshape(obj.shape[:-1]+(2,))
+        den=den[0]
+    else:
+        print('per should be vertex or object')
+        return 
+    return num,den
 
+def from_compact(num: NDArray[np.int64], den: NDArray[np.int64], normalize: bool=True) -> NDArray[np.int64]:
+    """convert numerators with common denominators into 6d vectors in TAU-style.
+    
+    Parameters
+    ----------
+    num: array, (...,2)
+        numerators
+    den: array
+        common denominators, broadcastable to num.shape[:-2]
+    normalize: bool
+        False: the values are not reduced.
+    
     Returns
     -------
-    6d vectors projected onto Eperp in TAU-style.
+    array, (...,3) in TAU-style
+    """
+    num=as_array(num)
+    den=as_array(den)
+    out=np.empty(num.shape[:-1]+(3,),dtype=np.result_type(num,den))
+    out[...,:2]=num
+    out[...,2]=den[...,np.newaxis]
+    return normalize_batch(out) if normalize else out
+
+def add_compact(num1: NDArray[np.int64], den1: NDArray[np.int64], num2: NDArray[np.int64], den2: NDArray[np.int64]):
+    """summation of two sets of vectors in compact representation.
+    
+    Parameters
+    ----------
+    num1,num2: array, (...,6,2)
+        numerators
+    den1,den2: array
+        common denominators
+    
+    Returns
+    -------
+    num: array, (...,6,2)
+    den: array
     """
-    a1=mul(m1,v[0])
-    a2=mul(m2,v[1])
-    a3=mul(m3,v[2])
-    a4=mul(m4,v[3])
-    a5=mul(m5,v[4])
-    a6=mul(m6,v[5])
-    a1=add(a1,a2)
-    a1=add(a1,a3)
-    a1=add(a1,a4)
-    a1=add(a1,a5)
-    a1=add(a1,a6)
-    return a1
+    x1=np.broadcast_arrays(from_compact(num1,den1,normalize=False),from_compact(num2,den2,normalize=False))
+    num,den=common_denominator(np.stack(x1,axis=-2),axis=-1) # (...,6,2,2), (...,6,1)
+    num,_=promote(num,num,1,0,2)
+    return num.sum(axis=-2),den[...,0,0]
+
+def shift_compact(num: NDArray[np.int64], den: NDArray[np.int64], shift: NDArray[np.int64]):
+    """shift a set of vectors in compact representation.
+    
+    Parameters
+    ----------
+    num: array, (...,6,2)
+        numerators
+    den: array
+        common denominators
+    shift: array, (6,3)
+        6d vector in TAU-style
+    
+    Returns
+    -------
+    num: array, (...,6,2)
+    den: array
+    """
+    snum,sden=to_compact(shift)
+    return add_compact(num,den,snum,sden)
+
+def symop_compact(symop: NDArray[np.int64], num: NDArray[np.int64], den: NDArray[np.int64], centre: NDArray[np.int64]=None):
+    """apply symmetry operations (6x6 integer matrices) on a set of vectors in compact representation.
+    
+    Parameters
+    ----------
+    symop: array, (6,6) or (m,6,6)
+        symmetry operation, or a stack of m symmetry operations
+    num: array, (...,6,2)
+        numerators
+    den: array
+        common denominators
+    centre: array, (6,3), optional
+        6d coordinate of the symmetric centre in TAU-style.
+    
+    Returns
+    -------
+    num: array, (...,6,2), or (m,...,6,2) for a stack of operations
+    den: array
+    """
+    m=np.rint(symop).astype(np.int64)
+    if m.ndim==3:
+        # (m,6,6) -> (m,1,...,1,6,6) to broadcast over the vectors
+        m=m.reshape((len(m),)+(1,)*(num.ndim-2)+(6,6))
+    m1,num=promote(m,as_array(num),1,1,6)
+    num=np.matmul(m1,num)
+    if centre is None:
+        return num,den
+    else:
+        # x' = M(x-c)+c = Mx+(c-Mc)
+        cnum,cden=to_compact(centre)
+        m1,cnum=promote(m,cnum,1,1,7)
+        cnum=cnum-np.matmul(m1,cnum)
+        return add_compact(num,den,cnum,cden)
+
+def projection3_compact(num: NDArray[np.int64], den: NDArray[np.int64]):
+    """projection of 6d vectors in compact representation onto Eperp.
+    
+    Parameters
+    ----------
+    num: array, (...,6,2)
+        numerators
+    den: array
+        common denominators
+    
+    Returns
+    -------
+    num: array, (...,3,2)
+        numerators of 3d vectors in Eperp
+    den: array
+        common denominators (unchanged)
+    """
+    num,_=promote(as_array(num),as_array(num),1,0,18)
+    a=num[...,0]
+    b=num[...,1]
+    # (a+b*TAU)*(p+q*TAU) = (ap+bq) + (aq+bp+bq)*TAU
+    out=np.empty(num.shape[:-2]+(3,2),dtype=num.dtype)
+    out[...,0]=np.matmul(a,EPERP_INT.T)+np.matmul(b,EPERP_TAU.T)
+    out[...,1]=np.matmul(a,EPERP_TAU.T)+np.matmul(b,EPERP_INT_TAU.T)
+    return out,den
 
 def centroid(obj: NDArray[np.int64]) -> NDArray[np.int64]:
     """geometric center, centroid of tetrahedron, triangle or edge, in TAU-style.
@@ -571,16 +660,18 @@ def centroid_obj(obj: NDArray[np.int64]) -> NDArray[np.int64]:
         tmp=add_vectors(tmp,p)
     return mul_vector(tmp,np.array([1,0,len(obj)]))
 
-def coplanar_check(p: NDArray[np.int64],num_iteration: int=5) -> bool:
+def coplanar_check(p: NDArray[np.int64],num_iteration: int=None) -> bool:
     """Check whether a given set of points (in TAU-style) is coplanar or not.
     
-    メモ：xyz1とxyz2の選び方次第で、outer_product(v1,v2)が小さくなりcoplanarと間違って判定する場合がある。
-    これを避けるために適切なxyz1とxyz2の選び方が必要。以下では、ランダムにxyz1とxyz2の選ぶ。
+    メモ：点の組からランダムに選んだ３点の外積を使う判定は、選び方次第でcoplanarと間違うことがあった。
+    現在はcoplanar_check_numeric_tau()で点の組全体のrankを用いて判定する（乱数は使わない）。
     
     Parameters
     ----------
     p: array
         a set of pointsin TAU-style.
+    num_iteration: int
+        deprecated and not used. A DeprecationWarning is issued when it is given.
 
     Returns
     -------
@@ -629,7 +720,9 @@ def coplanar_check(p: NDArray[np.int64],num_iteration: int=5) -> bool:
     else:
         return True # coplanar
     """
-    return coplanar_check_numeric_tau(p,num_iteration)
+    if num_iteration is not None:
+        warnings.warn('num_iteration is deprecated and not used; the test is deterministic.',DeprecationWarning,stacklevel=2)
+    return coplanar_check_numeric_tau(p)
 
 def matrixpow(ma: NDArray[np.int64], n: int) -> NDArray[np.int64]:
     """
@@ -653,6 +746,23 @@ def matrixpow(ma: NDArray[np.int64], n: int) -> NDArray[np.int64]:
         print('matrix has not regular shape')
         return 
 
+def det_matrix_batch(mtx: NDArray[np.int64], normalize: bool=True) -> NDArray[np.int64]:
+    """Determinants of a set of 3x3 matrices in TAU style
+    
+    Parameters
+    ----------
+    mtx: array, (...,3,3,3)
+        3x3 matrices in TAU-style
+    normalize: bool
+        False: the gcd reduction is deferred (see pyqcstrc.qfield.lazy_reduce).
+    
+    Returns
+    -------
+    array, (...,3)
+        determinants in TAU-style
+    """
+    return qfield.det_matrix_batch(mtx,FIELD,normalize)
+
 def det_matrix(mtx: NDArray[np.int64]) -> NDArray[np.int64]:
     """Determinant of 3x3 matrix, mtx, in TAU style
     
@@ -665,36 +775,7 @@ def det_matrix(mtx: NDArray[np.int64]) -> NDArray[np.int64]:
     -------
     6d vectors projected onto Eperp in TAU-style.
     """
-    
-    t3=mul(mtx[0][0],mtx[1][1])
-    t1=mul(t3,mtx[2][2])
-    #
-    t3=mul(mtx[0][2],mtx[1][0])
-    t2=mul(t3,c[1])
-    #
-    t1=add(t1,t2)
-    
-    t3=mul(mtx[0][1],mtx[1][2])
-    t3=mul(t3,mtx[2][0])
-    #
-    t1=add(t1,t3)
-    
-    t3=mul(mtx[0][2],mtx[1][1])
-    t2=mul(t3,mtx[2][0])
-    #
-    t1=sub(t1,t2)
-    
-    t3=mul(mtx[0][1],mtx[1][0])
-    t2=mul(t3,mtx[2][2])
-    #
-    t1=sub(t1,t2)
-    
-    t3=mul(mtx[0][0],mtx[1][2])
-    t2=mul(t3,mtx[2][1])
-    #
-    t1=sub(t1,t2)
-    #
-    return t1
+    return det_matrix_batch(mtx)
 
 if __name__ == '__main__':
     
@@ -707,7 +788,6 @@ if __name__ == '__main__':
                                         get_internal_component_numerical,
                                         get_internal_component_sets_numerical,
                                         point_on_segment,
-                                        coplanar_check_numeric_tau,
                                         )
     
     ncycle=20
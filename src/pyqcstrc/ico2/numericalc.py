@@ -3,14 +3,27 @@
 # PyQCstrc - Python library for Quasi-Crystal structure
 # Copyright (c) 2021 Tsunetomo Yamada <tsunetomo.yamada@rs.tus.ac.jp>
 #
+import warnings
 import numpy as np
 from numpy.typing import NDArray
-import random
 
-TAU=(1+np.sqrt(5))/2.0
+from pyqcstrc.constants import (TAU,
+                                ICO_PROJECTION_NUMERICAL,
+                                ICO_PROJECTION3_NUMERICAL,
+                                )
+
 EPS=1e-6
+# relative tolerance of the smallest singular value (see coplanar_check_numeric_batch())
+COPLANAR_TOL=1e-9
+# relative error bound of the float volumes (see obj_volume_6d_numerical())
+VOLUME_TOL=1e-12
+
+# Projection of 6d vectors onto (x,y,z) in Epar and (x,y,z) in Eperp,
+# vn@PROJECTION_MATRIX_NUMERICAL (see pyqcstrc.constants, projection_numerical()).
+PROJECTION_MATRIX_NUMERICAL=ICO_PROJECTION_NUMERICAL
+PROJECTION3_MATRIX_NUMERICAL=ICO_PROJECTION3_NUMERICAL
 
-def coplanar_check_numeric_tau(pts: NDArray[np.int64], num_iteration: int=5) -> bool:
+def coplanar_check_numeric_tau(pts: NDArray[np.int64], num_iteration: int=None) -> bool:
     """check the points (pts) are in coplanar or not
     
     Parameters
@@ -18,68 +31,73 @@ def coplanar_check_numeric_tau(pts: NDArray[np.int64], num_iteration: int=5) ->
     pns: array
         6d coordinates of the points, xyz, in TAU-style
     num_iteration: int
-        number of iterations.
+        deprecated and not used. A DeprecationWarning is issued when it is given.
     
     Returns
     -------
     bool
     
     """
+    if num_iteration is not None:
+        warnings.warn('num_iteration is deprecated and not used; the test is deterministic.',DeprecationWarning,stacklevel=2)
     p=get_internal_component_sets_numerical(pts)
-    return coplanar_check_numeric(p,num_iteration)
+    return coplanar_check_numeric(p)
 
-def coplanar_check_numeric(pns: NDArray[np.float64],num_iteration: int=5) -> bool:
+def coplanar_check_numeric(pns: NDArray[np.float64],num_iteration: int=None) -> bool:
     """check the points (pns) are in coplanar or not
-    メモ：xyz1とxyz2の選び方次第で、outer_product(v1,v2)が小さくなりcoplanarと間違って判定する場合がある。
-    これを避けるために適切なxyz1とxyz2の選び方が必要。以下では、ランダムにxyz1とxyz2の選ぶ。
     
     Parameters
     ----------
     pns: array
         coordinate of the points in Eperp, xyz.
     num_iteration: int
-        number of iterations.
+        deprecated and not used (it was the number of the former random
+        samplings). A DeprecationWarning is issued when it is given.
     
     Returns
     -------
     bool
     """
-    num=len(pns)
-    if num>3:
-        flag=0
-        lst0=[i for i in range(num)]
-        for _ in range(num_iteration):
-            lst3=random.sample(lst0, 3)
-            #
-            xyz1=pns[lst3[1]]-pns[lst3[0]]
-            xyz2=pns[lst3[2]]-pns[lst3[0]]
-            vec=np.cross(xyz1,xyz2)
-            flg=0
-            if np.all(abs(vec)<EPS):
-                pass
-            else:
-                flag=1
-                break
-        if flag==1:
-            counter=0
-            lst=list(filter(lambda x: x not in lst3, lst0))
-            for i in lst:
-            #for i in list(filter(lambda x: x not in lst3, lst0)):
-                xyzi=pns[i]-pns[lst3[0]]
-                if abs(np.dot(vec,xyzi))<1e-10:
-                    pass
-                else:
-                    counter=1
-                    break
-            if counter==0:
-                return True
-            else:
-                return False
-        else:
-            'error in coplanar_check_numeric. increase num_iteration.'
-            return 
-    else:
-        return True
+    if num_iteration is not None:
+        warnings.warn('num_iteration is deprecated and not used; the test is deterministic.',DeprecationWarning,stacklevel=2)
+    return bool(coplanar_check_numeric_batch(pns))
+
+def coplanar_check_numeric_tau_batch(pts: NDArray[np.int64]) -> NDArray[np.bool_]:
+    """check the groups of points are in coplanar or not (see coplanar_check_numeric_batch()).
+    
+    Parameters
+    ----------
+    pts: array, (...,k,6,3)
+        groups of k points in TAU-style
+    
+    Returns
+    -------
+    array of bool, (...)
+    """
+    return coplanar_check_numeric_batch(get_internal_component_sets_numerical(pts))
+
+def coplanar_check_numeric_batch(pns: NDArray[np.float64]) -> NDArray[np.bool_]:
+    """check the groups of points are in coplanar or not
+    
+    The points are coplanar when the rank of their displacements from the mean
+    is 2 or less, i.e. when the smallest singular value is negligible compared
+    with the largest one. A pair of triangles is given as a group of 6 points.
+    
+    Parameters
+    ----------
+    pns: array, (...,k,3)
+        groups of k points in Eperp, xyz.
+    
+    Returns
+    -------
+    array of bool, (...)
+    """
+    pns=np.asarray(pns,dtype=np.float64)
+    if pns.shape[-2]<=3:
+        return np.ones(pns.shape[:-2],dtype=bool)
+    d=pns-pns.mean(axis=-2,keepdims=True)
+    sv=np.linalg.svd(d,compute_uv=False)
+    return sv[...,2]<=COPLANAR_TOL*sv[...,0]
 
 def point_on_segment(point: NDArray[np.int64], line_segment: NDArray[np.int64]) -> bool:
     """judge whether a point is on a line segment, A-B, or not.
@@ -179,36 +197,29 @@ def numerical_vector(vt: NDArray[np.int64]) -> NDArray[np.int64]:
 
     Parameters
     ----------
-    vt: array
+    vt: array, (...,3)
         vector in TAU-style
     
     Returns
     -------
-    array
+    array, (...)
     """
-    n=len(vt)
-    w=np.zeros(n,dtype=np.float64)
-    for i in range(n):
-        w[i]=numeric_value(vt[i])
-    return w
+    vt=np.asarray(vt)
+    return np.asarray((vt[...,0]+vt[...,1]*TAU)/vt[...,2],dtype=np.float64)
 
 def numerical_vectors(vts: NDArray[np.int64]) -> NDArray[np.int64]:
-    """Numeric value of a TAU-style vector, v.
+    """Numeric value of a set of TAU-style vectors.
 
     Parameters
     ----------
-    vts: array
-        vector in TAU-style
+    vts: array, (...,n,3)
+        vectors in TAU-style
     
     Returns
     -------
-    array
+    array, (...,n)
     """
-    n1,n2,_=vts.shape
-    w=np.zeros((n1,n2),dtype=np.float64)
-    for i1 in range(n1):
-        w[i1]=numerical_vector(vts[i1])
-    return w
+    return numerical_vector(vts)
 
 def length_numerical(vt: NDArray[np.int64]) -> float:
     """numerical value of norm of vector, v, in Tau-style
@@ -510,18 +521,53 @@ def inside_outside_tetrahedron(point: NDArray[np.float64], tetrahedron: NDArray[
 
 
 
-def obj_volume_6d_numerical(obj: NDArray[np.int64]) -> float:
+def obj_volume_6d_numerical(obj: NDArray[np.int64], threshold: float=None, return_each: bool=False):
     """This function returns volume of an object (set of tetrahedra).
         
     Parameters
     ----------
     object: array
         6-dimensional vertex coordinates of tetrahedra.
+    threshold: float
+        When the float volume is as close to threshold as its error bound,
+        it is replaced by the numeric value of the exact volume (utils.obj_volume_6d()).
+    return_each: bool
+        True: the volumes of the tetrahedra are returned as well.
+    
+    Returns
+    -------
+    vol: float
+    vols: array, (n)
+        when return_each=True
+    """
+    xyz=get_internal_component_sets_numerical(np.asarray(obj).reshape(-1,4,6,3))
+    vols=tetrahedra_volume_numerical(xyz)
+    vol=vols.sum()
+    if threshold is not None:
+        # |det| is bounded by the product of the lengths of the edges
+        e=np.linalg.norm(xyz[:,1:]-xyz[:,:1],axis=2)
+        err=VOLUME_TOL*(np.prod(e,axis=1).sum()/6.0+abs(threshold))
+        if abs(vol-threshold)<=err:
+            from pyqcstrc.ico2.utils import obj_volume_6d
+            vol=numeric_value(obj_volume_6d(obj))
+    if return_each:
+        return vol,vols
+    else:
+        return vol
+
+def tetrahedra_volume_6d_numerical(obj: NDArray[np.int64]) -> NDArray[np.float64]:
+    """volumes of a set of tetrahedra.
+        
+    Parameters
+    ----------
+    obj: array, (n,4,6,3)
+        6-dimensional vertex coordinates of tetrahedra in TAU-style.
+    
+    Returns
+    -------
+    array, (n)
     """
-    vol=0
-    for tetrahedron in obj:
-        vol+=tetrahedron_volume_6d_numerical(tetrahedron)
-    return vol
+    return tetrahedra_volume_numerical(get_internal_component_sets_numerical(obj))
 
 def tetrahedron_volume_6d_numerical(tetrahedron: NDArray[np.int64]) -> float:
     """This function returns volume of a tetrahedron
@@ -542,10 +588,22 @@ def obj_volume_numerical(obj: NDArray[np.float64]) -> float:
     object: array
         3-dimensional vertex coordinates of tetrahedra.
     """
-    vol=0
-    for tetrahedron in obj:
-        vol+=tetrahedron_volume_numerical(tetrahedron)
-    return vol
+    return tetrahedra_volume_numerical(obj).sum()
+
+def tetrahedra_volume_numerical(obj: NDArray[np.float64]) -> NDArray[np.float64]:
+    """volumes of a set of tetrahedra.
+        
+    Parameters
+    ----------
+    obj: array, (n,4,3)
+        vertex coordinates of tetrahedra.
+    
+    Returns
+    -------
+    array, (n)
+    """
+    obj=np.asarray(obj,dtype=np.float64)
+    return np.abs(np.linalg.det(obj[...,1:,:]-obj[...,:1,:]))/6.0
 
 def tetrahedron_volume_numerical(tetrahedron: NDArray[np.float64]) -> float:
     """This function returns volume of a tetrahedron
@@ -596,57 +654,43 @@ def projection_numerical(vn: NDArray[np.float64]) -> NDArray[np.float64]:
     
     Parameters
     ----------
-    vn: array
+    vn: array, (...,6)
         6-dimensional vector, xyzuvw.
     """
-    v1 =  (vn[0]-vn[4]) + TAU*(vn[1]+vn[2]) # x in Epar
-    v2 =  (vn[3]+vn[5]) + TAU*(vn[0]+vn[4]) # y in Epar
-    v3 =  (vn[1]-vn[2]) - TAU*(vn[3]-vn[5]) # z in Epar
-    v4 = -(vn[1]+vn[2]) + TAU*(vn[0]-vn[4]) # x in Eperp
-    v5 = -(vn[0]+vn[4]) + TAU*(vn[3]+vn[5]) # y in Eperp
-    v6 =  (vn[3]-vn[5]) + TAU*(vn[1]-vn[2]) # z in Eperp
-    return np.array([v1,v2,v3,v4,v5,v6],dtype=np.float64)
+    # integer and TAU parts (see pyqcstrc.constants.ICO_PROJECTION_NUMERICAL)
+    v=np.asarray(vn,dtype=np.float64)@PROJECTION_MATRIX_NUMERICAL
+    return v[...,:6]+TAU*v[...,6:]
 
 def projection_sets_numerical(vns: NDArray[np.float64]) -> NDArray[np.float64]:
-    """parallel and perpendicular components of a 6D lattice vector in direct space.
+    """parallel and perpendicular components of a set of 6D lattice vectors in direct space.
     
     Parameters
     ----------
-    vsn: array
+    vns: array, (...,6)
         set of 6-dimensional vectors, xyzuvw1, xyzuvw2, ...
     """
-    num=len(vns)
-    m=np.zeros((num,6),dtype=np.float64)
-    for i in range(num):
-        m[i]=projection_numerical(vns[i])
-    return m
+    return projection_numerical(vns)
     
 def projection3_numerical(vn: NDArray[np.float64]) -> NDArray[np.float64]:
     """perpendicular component of a 6D lattice vector in direct space.
     
     Parameters
     ----------
-    vn: array
+    vn: array, (...,6)
         6-dimensional vector, xyzuvw.
     """
-    v4 = -(vn[1]+vn[2]) + TAU*(vn[0]-vn[4]) # x in Eperp
-    v5 = -(vn[0]+vn[4]) + TAU*(vn[3]+vn[5]) # y in Eperp
-    v6 =  (vn[3]-vn[5]) + TAU*(vn[1]-vn[2]) # z in Eperp
-    return np.array([v4,v5,v6],dtype=np.float64)
+    v=np.asarray(vn,dtype=np.float64)@PROJECTION3_MATRIX_NUMERICAL
+    return v[...,:3]+TAU*v[...,3:]
 
 def projection3_sets_numerical(vns: NDArray[np.float64]) -> NDArray[np.float64]:
-    """perpendicular component of a 6D lattice vector in direct space.
+    """perpendicular component of a set of 6D lattice vectors in direct space.
     
     Parameters
     ----------
-    vsn: array
+    vns: array, (...,6)
         set of 6-dimensional vectors, xyzuvw1, xyzuvw2, ...
     """
-    num=len(vns)
-    m=np.zeros((num,3),dtype=np.float64)
-    for i in range(num):
-        m[i]=projection3_numerical(vns[i])
-    return m
+    return projection3_numerical(vns)
 
 
 
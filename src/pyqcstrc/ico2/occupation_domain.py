@@ -16,12 +16,15 @@ try:
     import pyqcstrc.ico2.numericalc as numericalc
     import pyqcstrc.ico2.symmetry as symmetry
     import pyqcstrc.ico2.intsct as intsct
+    import pyqcstrc.ico2.domain as domain
 except ImportError:
     print('import error\n')
 
-TAU=(1+np.sqrt(5))/2.0
+from pyqcstrc.constants import TAU
 
 def volume(obj):
+    if isinstance(obj,domain.OccupationDomain):
+        return obj.volume
     return utils.obj_volume_6d(obj)
     
 def symmetric(obj,centre):
@@ -41,6 +44,8 @@ def symmetric(obj,centre):
             The shape is (num,4,6,3), where num=numbre_of_tetrahedron.
     
     """
+    if isinstance(obj,domain.OccupationDomain):
+        return domain.OccupationDomain(symmetric(obj.obj,centre))
     if obj.ndim==3 or obj.ndim==4:
         return symmetry.generator_obj_symmetric_tetrahedron(obj,centre)
     else:
@@ -64,6 +69,8 @@ def symmetric_0(obj,centre,indx_symop):
             The shape is (num,4,6,3), where num=numbre_of_tetrahedron.
     
     """
+    if isinstance(obj,domain.OccupationDomain):
+        return domain.OccupationDomain(symmetric_0(obj.obj,centre,indx_symop))
     if obj.ndim==3 or obj.ndim==4:
         return symmetry.generator_obj_symmetric_tetrahedron_0(obj,centre,indx_symop)
     else:
@@ -90,6 +97,8 @@ def shift(obj,shift):
             The shape is (num,4,6,3), where num=numbre_of_tetrahedron.
     
     """
+    if isinstance(obj,domain.OccupationDomain):
+        return obj.shift(shift)
     return utils.shift_object(obj, shift)
 
 def write(obj, path='.',basename='tmp',format='xyz',color='k',verbose=0,select='tetrahedron'):
@@ -112,6 +121,7 @@ def write(obj, path='.',basename='tmp',format='xyz',color='k',verbose=0,select='
         int: 0 (succeed), 1 (fail)
     
     """
+    obj=domain.asarray(obj)
     
     if os.path.exists(path)==False:
         os.makedirs(path)
@@ -153,6 +163,7 @@ def write_vesta(obj,path='.',basename='tmp',color='k',select='normal',verbose=0)
         int: 0 (succeed), 1 (fail) when select = 'simple' or 'normal'.
         ndarray: vertices, when select = 'podatm'.
     """
+    obj=domain.asarray(obj)
     
     if os.path.exists(path)==False:
         os.makedirs(path)
@@ -205,18 +216,13 @@ def write_vesta(obj,path='.',basename='tmp',color='k',select='normal',verbose=0)
                 
             # get bond pairs, [[distance, XXX, YYY],...]
             pairs = []
+            index={key:i3 for i3,key in enumerate(utils.vertex_keys(vertices))}
+            keys=utils.vertex_keys(edges)
             for i1 in range(len(edges)):
                 dist=intsct.distance_in_perp_space(edges[i1][0],edges[i1][1])
                 a=[dist]
                 for i2 in range(2):
-                    for i3 in range(len(vertices)):
-                        tmp=np.vstack([edges[i1][i2],vertices[i3]])
-                        tmp=utils.remove_doubling_in_perp_space(tmp.reshape(2,6,3))
-                        if len(tmp)==1:
-                            a.append(i3)
-                            break
-                        else:
-                            pass
+                    a.append(index[keys[2*i1+i2]])
                 pairs.append(a)
         
             print('#VESTA_FORMAT_VERSION 3.5.0\n', file=f)
@@ -632,20 +638,13 @@ def write_vesta(obj,path='.',basename='tmp',color='k',select='normal',verbose=0)
             vertices = utils.remove_doubling_in_perp_space(edges)
             # get bond pairs, [[distance, XXX, YYY],...]
             pairs = []
-            for edge in edges:
+            index={key:i3 for i3,key in enumerate(utils.vertex_keys(vertices),start=1)}
+            keys=utils.vertex_keys(edges)
+            for i1,edge in enumerate(edges):
                 dist=intsct.distance_in_perp_space(edge[0],edge[1])
                 a=[dist]
                 for i2 in range(2):
-                    i3=0
-                    for vrtx in vertices:
-                        tmp=np.vstack([edge[i2],vrtx])
-                        tmp=utils.remove_doubling_in_perp_space(tmp.reshape(2,6,3))
-                        i3+=1
-                        if len(tmp)==1:
-                            a.append(i3)
-                            break
-                        else:
-                            pass
+                    a.append(index[keys[2*i1+i2]])
                 pairs.append(a)
                 
             print('#VESTA_FORMAT_VERSION 3.5.0\n', file=f)
@@ -863,6 +862,7 @@ def write_xyz(obj,path='.',basename='tmp',select='tetrahedron',verbose=0):
     Returns:
         int: 0 (succeed), 1 (fail)
     """
+    obj=domain.asarray(obj)
     
     def generator_xyz_dim4_tetrahedron(obj,filename):
         """
@@ -899,8 +899,9 @@ def write_xyz(obj,path='.',basename='tmp',select='tetrahedron',verbose=0):
             i1+=1
         vol=utils.obj_volume_6d(obj)
         f.write('volume = %d %d %d (%8.6f)\n'%(vol[0],vol[1],vol[2],numericalc.numeric_value(vol)))
+        vols=utils.tetrahedra_volume_6d(obj)
         for i1 in range(len(obj)):
-            v=utils.tetrahedron_volume_6d(tetrahedron)
+            v=vols[i1]
             f.write('%3d-the tetrahedron, %d %d %d (%8.6f)\n'\
                     %(i1,v[0],v[1],v[2],numericalc.numeric_value(v)))
         f.close()
@@ -1134,6 +1135,7 @@ def simplification(obj,verbose=0):
             The shape is (num,4,6,3), where num=numbre_of_tetrahedron.
     
     """
+    obj=domain.asarray(obj)
     if np.all(obj==None):
         if verbose>0:
             print('    zero volume')
@@ -1167,7 +1169,10 @@ def generate_border_edges(obj):
             The shape is (num,2,6,3), where num=numbre_of_edge.
     
     """
-    triangle_surface=utils.generator_surface_1(obj)
+    if isinstance(obj,domain.OccupationDomain):
+        triangle_surface=obj.surface
+    else:
+        triangle_surface=utils.generator_surface_1(obj)
     return utils.surface_cleaner(triangle_surface)
 
 # new in version 0.0.2a2
@@ -1175,32 +1180,14 @@ def obj2podatm(obj,serial_number=1,path='.',basename='tmp',shift=[0,0,0,0,0,0]):
     
     def find_common_vertex(obj):
         #Find common vertex of tetrahedra in obj).
-        counter1=0
+        xyz=math1.projection3_batch(obj)
         for i1 in [0,1,2,3]:
-            vtx1=obj[0][i1]
-            xyz1=math1.projection3(vtx1)
-            counter2=0
-            for i2 in range(1,len(obj)):
-                counter3=0
-                for i3 in [0,1,2,3]:
-                    xyz2=math1.projection3(obj[i2][i3])
-                    if np.all(xyz1==xyz2):
-                        counter3=1
-                        break
-                if counter3==1:
-                    counter2+=1
-                else:
-                    break
-            if counter2==len(obj)-1:
-                counter1=1
-                break
-            else:
-                pass
-        if counter1!=0:
-            return vtx1
-        else:
-            return 
+            # each of the other tetrahedra has a vertex equivalent to i1-th vertex of the 1st one
+            if np.all(np.any(np.all(xyz[1:]==xyz[0][i1],axis=(2,3)),axis=1)):
+                return obj[0][i1]
+        return 
     
+    obj=domain.asarray(obj)
     # common vertex
     vrtx0=find_common_vertex(obj)
     
@@ -1274,6 +1261,7 @@ def simple_hand_step1(obj, path, basename_tmp):
             The shape is (num,4,6,3), where num=numbre_of_tetrahedron.
     
     """
+    obj=domain.asarray(obj)
     def write_xyz_smpl(a, path, basename):
         f=open('%s'%(path)+'/%s.xyz'%(basename),'w', encoding="utf-8", errors="ignore")
         f.write('%d\n'%(len(a)))
@@ -1317,6 +1305,7 @@ def simple_hand_step2(obj, merge_list):
             The shape is (num,4,6,3), where num=numbre_of_tetrahedron.
     
     """
+    obj=domain.asarray(obj)
     
     def merge(obj,mylist):
         tmp1=np.array([obj[mylist[0]-1]])
@@ -1549,6 +1538,7 @@ def write_podatm(obj, position, vlist, path='.', basename='tmp', shift=[0.0,0.0,
         int: 0 (succeed), 1 (fail)
     
     """
+    obj=domain.asarray(obj)
     
     if os.path.exists(path) == False:
         os.makedirs(path)
@@ -1660,6 +1650,7 @@ def asymmetric(symmetric_obj, position, vecs):
         Asymmetric part of the occupation domains (numpy.ndarray):
             The shape is (num,4,6,3), where num=numbre_of_tetrahedron.
     """
+    symmetric_obj=domain.asarray(symmetric_obj)
     v0 = np.array([[0,0,1],[0,0,1],[0,0,1],[0,0,1],[0,0,1],[0,0,1]])
     vecs = math1.mul_vectors(vecs,np.array([5,0,1]))
     # vecs multiplied by [a,b,c], where [a,b,c]=(a+TAU*b)/c. 
@@ -0,0 +1,721 @@
+#!/usr/bin/env python
+#
+# PyQCstrc - Python library for Quasi-Crystal structure
+# Copyright (c) 2021 Tsunetomo Yamada <tsunetomo.yamada@rs.tus.ac.jp>
+#
+"""Filtered exact geometric predicates in Eperp.
+
+The predicates are first evaluated in float64 together with a bound of
+the rounding error (including the conversion of TAU-style values into
+floats). Only when the float result is smaller than the bound, the sign
+is evaluated exactly in TAU-style. The results of orient3d(), insphere(),
+segment_triangle() and classify_points_6d() are therefore exact, and the
+exact evaluation is needed only for (nearly) degenerate configurations.
+
+points_in_obj() screens the points with float barycentric coordinates,
+accepted or rejected outside a heuristic band (see barycentric_tol()).
+Only the points inside the band are decided by exact orientation tests.
+"""
+import math
+import numpy as np
+from numpy.typing import NDArray
+
+from pyqcstrc.ico2.math1 import (projection3_batch,
+                                add_batch,
+                                sub_batch,
+                                mul_batch,
+                                sum_batch,
+                                sign_batch,
+                                det_matrix_batch,
+                                )
+from pyqcstrc.ico2.utils import (generator_surface_1,
+                                plane_keys,
+                                )
+from pyqcstrc.ico2.spatial import (bounding_boxes,
+                                   build_tree,
+                                   query_boxes,
+                                   query_points,
+                                   )
+
+from pyqcstrc.constants import TAU
+
+# unit roundoff of float64
+EPS_MACHINE=np.finfo(np.float64).eps/2.0
+# relative error bounds of the float evaluation (see orient3d() and insphere())
+ERRBOUND_ORIENT3D=64.0*EPS_MACHINE
+ERRBOUND_INSPHERE=128.0*EPS_MACHINE
+# TAU-style values with larger integers are not converted exactly into floats
+INT_EXACT_MAX=2**53
+# up to this number of sets, exact orientation is evaluated with python int
+NUM_EXACT_SCALAR=16
+# permutations of (0,1,2) and their signs
+PERMUTATION_3=[((0,1,2),1),((1,2,0),1),((2,0,1),1),((0,2,1),-1),((2,1,0),-1),((1,0,2),-1)]
+
+_exact_count=0
+
+def exact_count() -> int:
+    """number of predicates which were evaluated exactly.
+    """
+    return _exact_count
+
+def reset_exact_count() -> None:
+    """reset the counter of exact evaluations.
+    """
+    global _exact_count
+    _exact_count=0
+    return
+
+def numerical_bound(x: NDArray[np.int64]):
+    """numeric values of TAU-style values and bounds of their magnitudes.
+
+    Parameters
+    ----------
+    x: array, (...,3)
+        values in TAU-style
+
+    Returns
+    -------
+    val: array, (...)
+        (a+b*TAU)/c
+    mag: array, (...)
+        (|a|+|b|*TAU)/|c|, which bounds the rounding error of val by 5*EPS_MACHINE*mag.
+    """
+    x=np.asarray(x)
+    a=x[...,0].astype(np.float64)
+    b=x[...,1].astype(np.float64)
+    c=x[...,2].astype(np.float64)
+    return (a+b*TAU)/c,(np.abs(a)+np.abs(b)*TAU)/np.abs(c)
+
+def not_filterable(x: NDArray[np.int64]) -> bool:
+    """True when the values cannot be converted into floats within the error bound.
+    """
+    x=np.asarray(x)
+    return x.dtype==object or (x.size!=0 and np.abs(x).max()>=INT_EXACT_MAX)
+
+def det3_numerical(m: NDArray[np.float64]) -> NDArray[np.float64]:
+    """determinants of a set of 3x3 matrices, (...,3,3), by cofactor expansion.
+    """
+    return m[...,0,0]*(m[...,1,1]*m[...,2,2]-m[...,1,2]*m[...,2,1])\
+          +m[...,0,1]*(m[...,1,2]*m[...,2,0]-m[...,1,0]*m[...,2,2])\
+          +m[...,0,2]*(m[...,1,0]*m[...,2,1]-m[...,1,1]*m[...,2,0])
+
+def perm3_numerical(m: NDArray[np.float64]) -> NDArray[np.float64]:
+    """permanents of a set of 3x3 matrices with non-negative elements, (...,3,3).
+    """
+    return m[...,0,0]*(m[...,1,1]*m[...,2,2]+m[...,1,2]*m[...,2,1])\
+          +m[...,0,1]*(m[...,1,2]*m[...,2,0]+m[...,1,0]*m[...,2,2])\
+          +m[...,0,2]*(m[...,1,0]*m[...,2,1]+m[...,1,1]*m[...,2,0])
+
+#----------------------------
+# Orientation
+#----------------------------
+def orient3d_exact(xyz: NDArray[np.int64]) -> NDArray[np.int64]:
+    """exact orientation of sets of four points in Eperp.
+
+    Parameters
+    ----------
+    xyz: array, (...,4,3,3)
+        3d coordinates of four points, p0,p1,p2,p3, in TAU-style
+
+    Returns
+    -------
+    array, (...)
+        sign of det[p1-p0,p2-p0,p3-p0]
+    """
+    xyz=np.asarray(xyz)
+    if xyz.ndim==4 or (xyz.ndim==5 and len(xyz)<=NUM_EXACT_SCALAR):
+        # a few sets: python int is faster than array operations
+        out=[orient3d_exact_value(x) for x in xyz.reshape((-1,4,3,3)).tolist()]
+        return np.array(out,dtype=np.int64).reshape(xyz.shape[:-3])
+    v=sub_batch(xyz[...,1:,:,:],xyz[...,:1,:,:],normalize=False)
+    return sign_batch(det_matrix_batch(v,normalize=False))
+
+def orient3d_exact_value(xyz: list) -> int:
+    """exact orientation of four points given as nested lists of python int, (4,3,3).
+    """
+    def mul_num(a0,a1,b0,b1):
+        # (a0+a1*TAU)*(b0+b1*TAU)
+        return a0*b0+a1*b1, a0*b1+a1*b0+a1*b1
+
+    den=1
+    for p in xyz:
+        for v in p:
+            den=den*v[2]//math.gcd(den,v[2])
+    num=[[(v[0]*(den//v[2]),v[1]*(den//v[2])) for v in p] for p in xyz]
+    d=[[(num[i][k][0]-num[0][k][0],num[i][k][1]-num[0][k][1]) for k in range(3)] for i in (1,2,3)]
+    s0,s1=0,0
+    for (i,j,k),sgn in PERMUTATION_3:
+        t0,t1=mul_num(*d[0][i],*d[1][j])
+        t0,t1=mul_num(t0,t1,*d[2][k])
+        s0+=sgn*t0
+        s1+=sgn*t1
+    # sign of s0+s1*TAU, 2*(s0+s1*TAU) = (2*s0+s1)+s1*sqrt(5)
+    p=2*s0+s1
+    if p>=0 and s1>=0:
+        return int(p>0 or s1>0)
+    elif p<=0 and s1<=0:
+        return -1
+    elif p>0:
+        return 1 if p*p>5*s1*s1 else -1
+    else:
+        return 1 if 5*s1*s1>p*p else -1
+
+def orient3d(xyz: NDArray[np.int64]) -> NDArray[np.int64]:
+    """orientation of sets of four points in Eperp.
+
+    Parameters
+    ----------
+    xyz: array, (...,4,3,3)
+        3d coordinates of four points, p0,p1,p2,p3, in TAU-style
+
+    Returns
+    -------
+    array, (...)
+        sign of det[p1-p0,p2-p0,p3-p0]: 1, 0 (coplanar) or -1
+    """
+    global _exact_count
+    xyz=np.asarray(xyz)
+    if not_filterable(xyz):
+        _exact_count+=int(np.prod(xyz.shape[:-3]))
+        return orient3d_exact(xyz)
+    val,mag=numerical_bound(xyz)
+    d=val[...,1:,:]-val[...,:1,:]
+    dm=mag[...,1:,:]+mag[...,:1,:]
+    det=det3_numerical(d)
+    err=ERRBOUND_ORIENT3D*perm3_numerical(dm)
+    out=np.array(np.sign(det),dtype=np.int64)
+    amb=np.abs(det)<=err
+    if np.any(amb):
+        _exact_count+=int(np.count_nonzero(amb))
+        out[amb]=orient3d_exact(xyz[amb])
+    return out
+
+def orient3d_6d(vts: NDArray[np.int64]) -> NDArray[np.int64]:
+    """orientation of sets of four 6d vectors in Eperp.
+
+    Parameters
+    ----------
+    vts: array, (...,4,6,3)
+        6d coordinates in TAU-style
+
+    Returns
+    -------
+    array, (...)
+        1, 0 (coplanar) or -1
+    """
+    return orient3d(projection3_batch(vts))
+
+#----------------------------
+# In-sphere
+#----------------------------
+INDEX_MINOR=[[1,2,3],[0,2,3],[0,1,3],[0,1,2]]
+
+def insphere_exact(xyz: NDArray[np.int64]) -> NDArray[np.int64]:
+    """exact in-sphere determinant of sets of five points in Eperp.
+
+    Parameters
+    ----------
+    xyz: array, (...,5,3,3)
+        3d coordinates of five points, p0,...,p4, in TAU-style
+
+    Returns
+    -------
+    array, (...)
+        sign of det[[pi-p4, |pi-p4|^2] for i=0,..,3]
+    """
+    # only the sign is needed, and the gcd reduction is skipped
+    d=sub_batch(xyz[...,:4,:,:],xyz[...,4:,:,:],normalize=False) # (...,4,3,3)
+    l=sum_batch(mul_batch(d,d,normalize=False),axis=-1,normalize=False) # (...,4,3)
+    m=det_matrix_batch(d[...,INDEX_MINOR,:,:],normalize=False) # (...,4,3)
+    t=mul_batch(l,m,normalize=False)
+    # cofactor expansion along the last column
+    t[...,0:4:2,:2]*=-1
+    return sign_batch(sum_batch(t,axis=-1,normalize=False))
+
+def insphere(xyz: NDArray[np.int64]) -> NDArray[np.int64]:
+    """position of a point relative to the sphere through four points in Eperp.
+
+    Parameters
+    ----------
+    xyz: array, (...,5,3,3)
+        3d coordinates of five points in TAU-style. The sphere passes
+        through the first four points, p0,...,p3, and p4 is tested.
+
+    Returns
+    -------
+    array, (...)
+        1 (inside), 0 (on the sphere, or p0,...,p3 are coplanar) or -1 (outside)
+    """
+    global _exact_count
+    xyz=np.asarray(xyz)
+    o=orient3d(xyz[...,:4,:,:])
+    if not_filterable(xyz):
+        _exact_count+=int(np.prod(xyz.shape[:-3]))
+        return -o*insphere_exact(xyz)
+    val,mag=numerical_bound(xyz)
+    d=val[...,:4,:]-val[...,4:,:]
+    dm=mag[...,:4,:]+mag[...,4:,:]
+    l=np.sum(d*d,axis=-1)
+    lm=np.sum(dm*dm,axis=-1)
+    det=np.zeros(d.shape[:-2],dtype=np.float64)
+    perm=np.zeros(d.shape[:-2],dtype=np.float64)
+    for i in range(4):
+        sgn=1.0 if i%2==1 else -1.0
+        det+=sgn*l[...,i]*det3_numerical(d[...,INDEX_MINOR[i],:])
+        perm+=lm[...,i]*perm3_numerical(dm[...,INDEX_MINOR[i],:])
+    err=ERRBOUND_INSPHERE*perm
+    out=np.array(np.sign(det),dtype=np.int64)
+    amb=np.abs(det)<=err
+    if np.any(amb):
+        _exact_count+=int(np.count_nonzero(amb))
+        out[amb]=insphere_exact(xyz[amb])
+    return -o*out
+
+def insphere_6d(vts: NDArray[np.int64]) -> NDArray[np.int64]:
+    """in-sphere test of sets of five 6d vectors in Eperp (see insphere()).
+
+    Parameters
+    ----------
+    vts: array, (...,5,6,3)
+        6d coordinates in TAU-style
+
+    Returns
+    -------
+    array, (...)
+        1 (inside), 0 (on the sphere) or -1 (outside)
+    """
+    return insphere(projection3_batch(vts))
+
+#----------------------------
+# Point in tetrahedron
+#----------------------------
+def point_in_tetrahedron(point: NDArray[np.int64], tetrahedron: NDArray[np.int64]) -> NDArray[np.int64]:
+    """position of points relative to tetrahedra in Eperp.
+
+    Parameters
+    ----------
+    point: array, (...,3,3)
+        3d coordinates of the points in TAU-style
+    tetrahedron: array, (...,4,3,3)
+        3d coordinates of the vertices of the tetrahedra in TAU-style,
+        leading dimensions broadcastable with point
+
+    Returns
+    -------
+    array, (...)
+        1 (inside), 0 (on the surface) or -1 (outside, or degenerated tetrahedron)
+    """
+    point=np.asarray(point)
+    tetrahedron=np.asarray(tetrahedron)
+    shape=np.broadcast_shapes(point.shape[:-2],tetrahedron.shape[:-3])
+    o=orient3d(tetrahedron)
+    # replace i-th vertex by the point
+    tets=np.empty(shape+(4,4,3,3),dtype=np.result_type(point,tetrahedron))
+    tets[...]=tetrahedron[...,np.newaxis,:,:,:]
+    for i in range(4):
+        tets[...,i,i,:,:]=point
+    s=orient3d(tets)*o[...,np.newaxis]
+    return np.where(o==0,-1,np.where(np.any(s<0,axis=-1),-1,np.where(np.all(s>0,axis=-1),1,0)))
+
+def point_in_tetrahedron_6d(point: NDArray[np.int64], tetrahedron: NDArray[np.int64]) -> NDArray[np.int64]:
+    """position of 6d points relative to tetrahedra in Eperp (see point_in_tetrahedron()).
+
+    Parameters
+    ----------
+    point: array, (...,6,3)
+        6d coordinates of the points in TAU-style
+    tetrahedron: array, (...,4,6,3)
+        6d coordinates of the vertices of the tetrahedra in TAU-style
+
+    Returns
+    -------
+    array, (...)
+        1 (inside), 0 (on the surface) or -1 (outside)
+    """
+    return point_in_tetrahedron(projection3_batch(point),projection3_batch(tetrahedron))
+
+#----------------------------
+# Segment and triangle
+#----------------------------
+def segment_triangle(segment: NDArray[np.int64], triangle: NDArray[np.int64]) -> NDArray[np.bool_]:
+    """intersection between line segments and triangles in Eperp.
+
+    A segment which is parallel to (or lies in) the plane of the triangle
+    is regarded as not intersecting, as in the Möller–Trumbore algorithm.
+
+    Parameters
+    ----------
+    segment: array, (...,2,3,3)
+        3d coordinates of the end points, A,B, in TAU-style
+    triangle: array, (...,3,3,3)
+        3d coordinates of the vertices, C,D,E, in TAU-style, leading
+        dimensions broadcastable with segment
+
+    Returns
+    -------
+    array, (...)
+        True when the closed segment and the closed triangle intersect.
+    """
+    segment=np.asarray(segment)
+    triangle=np.asarray(triangle)
+    shape=np.broadcast_shapes(segment.shape[:-3],triangle.shape[:-3])
+    a=np.empty(shape+(5,4,3,3),dtype=np.result_type(segment,triangle))
+    A,B=segment[...,0,:,:],segment[...,1,:,:]
+    C,D,E=triangle[...,0,:,:],triangle[...,1,:,:],triangle[...,2,:,:]
+    # sides of the end points to the plane CDE
+    a[...,0,:3,:,:]=triangle
+    a[...,0,3,:,:]=A
+    a[...,1,:3,:,:]=triangle
+    a[...,1,3,:,:]=B
+    # sides of the edges CD, DE and EC to the line AB
+    for i,(p,q) in enumerate([(C,D),(D,E),(E,C)]):
+        a[...,2+i,0,:,:]=A
+        a[...,2+i,1,:,:]=B
+        a[...,2+i,2,:,:]=p
+        a[...,2+i,3,:,:]=q
+    o=orient3d(a)
+    t=o[...,2:]
+    return (o[...,0]!=o[...,1])&(np.all(t>=0,axis=-1)|np.all(t<=0,axis=-1))
+
+def segment_triangle_6d(segment: NDArray[np.int64], triangle: NDArray[np.int64]) -> NDArray[np.bool_]:
+    """intersection between 6d line segments and triangles in Eperp (see segment_triangle()).
+
+    Parameters
+    ----------
+    segment: array, (...,2,6,3)
+        6d coordinates in TAU-style
+    triangle: array, (...,3,6,3)
+        6d coordinates in TAU-style
+
+    Returns
+    -------
+    array, (...)
+    """
+    return segment_triangle(projection3_batch(segment),projection3_batch(triangle))
+
+#----------------------------
+# Points in occupation domain
+#
+# The barycentric coordinates of points in each tetrahedron are computed
+# with float inverse matrices which are prepared once per object. Only
+# the (point, tetrahedron) pairs of which a coordinate is close to zero
+# are decided exactly by point_in_tetrahedron(). The band around zero
+# (see barycentric_tol()) is a heuristic, not a proven error bound: it
+# grows with the condition number of the tetrahedron and with the
+# magnitudes of the coordinates, far above the rounding errors.
+#----------------------------
+# relative tolerance of the float barycentric coordinates
+BARYCENTRIC_TOL=1e-9
+# max. number of (point, tetrahedron) pairs evaluated at once
+CHUNK_SIZE=1<<16
+
+def barycentric_matrices(tetrahedra: NDArray[np.int64]):
+    """float data for the barycentric coordinates in a set of tetrahedra in Eperp.
+    
+    Parameters
+    ----------
+    tetrahedra: array, (n,4,3,3)
+        3d coordinates of the vertices in TAU-style
+    
+    Returns
+    -------
+    origin: array, (n,3)
+        the first vertices
+    inverse: array, (n,3,3)
+        inverse matrices of [v1-v0,v2-v0,v3-v0]
+    tol: array, (n)
+        tolerance of the barycentric coordinates relative to their
+        magnitude (see barycentric_tol()), or -1 for degenerated tetrahedra
+    """
+    tetrahedra=np.asarray(tetrahedra)
+    n=len(tetrahedra)
+    val,_=numerical_bound(tetrahedra) # (n,4,3)
+    origin=val[:,0,:]
+    e=np.swapaxes(val[:,1:,:]-val[:,:1,:],1,2) # columns are the edges
+    valid=orient3d(tetrahedra)!=0
+    inverse=np.zeros((n,3,3),dtype=np.float64)
+    inverse[valid]=np.linalg.inv(e[valid])
+    cond=np.abs(inverse).sum(axis=2).max(axis=1)*np.abs(e).sum(axis=2).max(axis=1)
+    tol=np.where(valid,BARYCENTRIC_TOL*(1.0+cond),-1.0)
+    return origin,inverse,tol
+
+def barycentric_tol(tol: NDArray[np.float64], inverse: NDArray[np.float64], origin: NDArray[np.float64], point: NDArray[np.float64]) -> NDArray[np.float64]:
+    """tolerance of the float barycentric coordinates of (point, tetrahedron) pairs.
+
+    The error of inverse@(point-origin) comes from the inverse matrix,
+    which is relative to the size of the coordinates (tol), and from the
+    subtraction, which is relative to |point|+|origin|. Both are scaled by
+    the norm of the inverse matrix.
+
+    Parameters
+    ----------
+    tol: array, (...)
+        output of barycentric_matrices()
+    inverse: array, (...,3,3)
+    origin, point: array, (...,3)
+
+    Returns
+    -------
+    array, (...)
+        -1 for degenerated tetrahedra
+    """
+    norm=np.abs(inverse).sum(axis=-1).max(axis=-1)
+    d=np.abs(point-origin).max(axis=-1)
+    mag=np.abs(point).max(axis=-1)+np.abs(origin).max(axis=-1)
+    return np.where(tol>=0,tol*(1.0+norm*d)+BARYCENTRIC_TOL*norm*mag,-1.0)
+
+def points_in_obj(points: NDArray[np.int64], obj: NDArray[np.int64], matrices=None, chunk_size: int=CHUNK_SIZE, tree=None):
+    """find the tetrahedra of an object containing the points in Eperp.
+    
+    Parameters
+    ----------
+    points: array, (m,3,3)
+        3d coordinates of the points in TAU-style
+    obj: array, (n,4,3,3)
+        3d coordinates of the vertices of the tetrahedra in TAU-style
+    matrices: tuple
+        output of barycentric_matrices(obj), which is computed when not given.
+    chunk_size: int
+        max. number of (point, tetrahedron) pairs evaluated at once.
+    tree: dict
+        output of spatial.build_tree() over the tetrahedra. When given,
+        only the pairs found by the tree are evaluated.
+    
+    Returns
+    -------
+    mask: array, (m)
+        True when the point is inside or on the surface of a tetrahedron.
+    index: array, (m)
+        index of the first tetrahedron containing the point, or -1
+    """
+    points=np.asarray(points)
+    obj=np.asarray(obj)
+    m=len(points)
+    n=len(obj)
+    mask=np.zeros(m,dtype=bool)
+    index=np.full(m,-1,dtype=np.int64)
+    if m==0 or n==0:
+        return mask,index
+    if matrices is None:
+        matrices=barycentric_matrices(obj)
+    origin,inverse,tol=matrices
+    val,_=numerical_bound(points) # (m,3)
+    if tree is not None:
+        qi,ti=query_points(tree,val)
+        first=np.full(m,n,dtype=np.int64)
+        for i in range(0,len(qi),chunk_size):
+            k,l=qi[i:i+chunk_size],ti[i:i+chunk_size]
+            lam=np.einsum('kij,kj->ki',inverse[l],val[k]-origin[l])
+            lam=np.concatenate([1.0-lam.sum(axis=-1,keepdims=True),lam],axis=-1)
+            lmin=lam.min(axis=-1)
+            t=barycentric_tol(tol[l],inverse[l],origin[l],val[k])
+            inside=(lmin>t)&(t>=0)
+            amb=(np.abs(lmin)<=t)&(t>=0)
+            if np.any(amb):
+                inside[amb]=point_in_tetrahedron(points[k[amb]],obj[l[amb]])>=0
+            np.minimum.at(first,k[inside],l[inside])
+        mask=first<n
+        index[mask]=first[mask]
+        return mask,index
+    step=max(1,chunk_size//n)
+    for i in range(0,m,step):
+        d=val[i:i+step,np.newaxis,:]-origin # (k,n,3)
+        lam=np.einsum('nij,knj->kni',inverse,d)
+        lam=np.concatenate([1.0-lam.sum(axis=-1,keepdims=True),lam],axis=-1)
+        lmin=lam.min(axis=-1)
+        t=barycentric_tol(tol,inverse,origin,val[i:i+step,np.newaxis,:])
+        inside=(lmin>t)&(t>=0)
+        amb=(np.abs(lmin)<=t)&(t>=0)
+        if np.any(amb):
+            k,l=np.nonzero(amb)
+            inside[k,l]=point_in_tetrahedron(points[i+k],obj[l])>=0
+        mask[i:i+step]=np.any(inside,axis=1)
+        index[i:i+step]=np.where(mask[i:i+step],np.argmax(inside,axis=1),-1)
+    return mask,index
+
+def points_in_obj_6d(points: NDArray[np.int64], obj: NDArray[np.int64], matrices=None, chunk_size: int=CHUNK_SIZE, tree=None):
+    """find the tetrahedra of an object containing 6d points in Eperp (see points_in_obj()).
+    
+    Parameters
+    ----------
+    points: array, (m,6,3)
+        6d coordinates of the points in TAU-style
+    obj: array, (n,4,6,3)
+        6d coordinates of the tetrahedra in TAU-style
+    matrices: tuple
+        output of barycentric_matrices(projection3_batch(obj))
+    chunk_size: int
+    tree: dict
+        output of spatial.build_tree_6d(obj)
+    
+    Returns
+    -------
+    mask: array, (m)
+    index: array, (m)
+    """
+    return points_in_obj(projection3_batch(points),projection3_batch(obj),matrices,chunk_size,tree)
+
+#----------------------------
+# Edges and faces of occupation domains
+#
+# All (segment, triangle) pairs of two sets are found at once. The pairs
+# of which bounding boxes overlap are taken from an AABB tree over the
+# triangles, and they are decided by segment_triangle() in chunks.
+#----------------------------
+# max. number of (segment, triangle) pairs decided at once
+SEGMENT_CHUNK_SIZE=1<<12
+
+def segments_triangles(segments: NDArray[np.int64], triangles: NDArray[np.int64], chunk_size: int=SEGMENT_CHUNK_SIZE):
+    """find the intersecting pairs of line segments and triangles in Eperp.
+    
+    Parameters
+    ----------
+    segments: array, (m,2,3,3)
+        3d coordinates of the end points in TAU-style
+    triangles: array, (n,3,3,3)
+        3d coordinates of the vertices in TAU-style
+    chunk_size: int
+        max. number of pairs decided at once.
+    
+    Returns
+    -------
+    segment, triangle: array
+        indices of the intersecting pairs (see segment_triangle()), sorted
+        by triangle and then by segment.
+    """
+    segments=np.asarray(segments)
+    triangles=np.asarray(triangles)
+    if len(segments)==0 or len(triangles)==0:
+        return np.zeros(0,dtype=np.int64),np.zeros(0,dtype=np.int64)
+    tree=build_tree(*bounding_boxes(triangles))
+    si,ti=query_boxes(tree,*bounding_boxes(segments))
+    hit=np.zeros(len(si),dtype=bool)
+    for i in range(0,len(si),chunk_size):
+        hit[i:i+chunk_size]=segment_triangle(segments[si[i:i+chunk_size]],triangles[ti[i:i+chunk_size]])
+    si,ti=si[hit],ti[hit]
+    s=np.lexsort((si,ti))
+    return si[s],ti[s]
+
+def segments_triangles_6d(segments: NDArray[np.int64], triangles: NDArray[np.int64], chunk_size: int=SEGMENT_CHUNK_SIZE):
+    """find the intersecting pairs of 6d line segments and triangles in Eperp (see segments_triangles()).
+    
+    Parameters
+    ----------
+    segments: array, (m,2,6,3)
+        6d coordinates in TAU-style
+    triangles: array, (n,3,6,3)
+        6d coordinates in TAU-style
+    chunk_size: int
+    
+    Returns
+    -------
+    segment, triangle: array
+    """
+    return segments_triangles(projection3_batch(segments),projection3_batch(triangles),chunk_size)
+
+#----------------------------
+# Classification of points
+#
+# A point is classified against an object by the planes of the surface
+# triangles on which it lies: none (inside or outside, decided by
+# points_in_obj()), one (on a face), two (on an edge) or more (on a
+# vertex). Coplanar surface triangles count as one face, and all the
+# decisions are exact.
+#----------------------------
+OUTSIDE=0
+INSIDE=1
+ON_FACE=2
+ON_EDGE=3
+ON_VERTEX=4
+
+def point_on_triangle(point: NDArray[np.int64], triangle: NDArray[np.int64]) -> NDArray[np.bool_]:
+    """whether points are on closed triangles in Eperp.
+    
+    Parameters
+    ----------
+    point: array, (...,3,3)
+        3d coordinates of the points in TAU-style
+    triangle: array, (...,3,3,3)
+        3d coordinates of the vertices in TAU-style, leading dimensions
+        broadcastable with point
+    
+    Returns
+    -------
+    array, (...)
+        False for degenerated triangles.
+    """
+    point=np.asarray(point)
+    triangle=np.asarray(triangle)
+    shape=np.broadcast_shapes(point.shape[:-2],triangle.shape[:-3])
+    A,B,C=triangle[...,0,:,:],triangle[...,1,:,:],triangle[...,2,:,:]
+    v1=sub_batch(B,A)
+    v2=sub_batch(C,A)
+    # normal vector, and a point D off the plane
+    nrm=sub_batch(mul_batch(v1[...,[1,2,0],:],v2[...,[2,0,1],:],normalize=False),
+                  mul_batch(v1[...,[2,0,1],:],v2[...,[1,2,0],:],normalize=False))
+    D=add_batch(A,nrm)
+    a=np.empty(shape+(4,4,3,3),dtype=np.result_type(point,triangle,D))
+    # side of the point to the plane ABC
+    a[...,0,:3,:,:]=triangle
+    a[...,0,3,:,:]=point
+    # sides of the point to the planes through the edges and D
+    for i,(p,q) in enumerate([(A,B),(B,C),(C,A)]):
+        a[...,1+i,0,:,:]=p
+        a[...,1+i,1,:,:]=q
+        a[...,1+i,2,:,:]=D
+        a[...,1+i,3,:,:]=point
+    o=orient3d(a)
+    t=o[...,1:]
+    valid=np.any(nrm[...,:2]!=0,axis=(-2,-1))
+    return valid&(o[...,0]==0)&(np.all(t>=0,axis=-1)|np.all(t<=0,axis=-1))
+
+def classify_points_6d(points: NDArray[np.int64], obj: NDArray[np.int64], surface: NDArray[np.int64]=None, chunk_size: int=SEGMENT_CHUNK_SIZE) -> NDArray[np.int64]:
+    """classify 6d points against an object in Eperp.
+    
+    Parameters
+    ----------
+    points: array, (m,6,3)
+        6d coordinates of the points in TAU-style
+    obj: array, (n,4,6,3)
+        6d coordinates of the tetrahedra in TAU-style
+    surface: array, (k,3,6,3)
+        surface triangles of obj, generator_surface_1(obj) when not given.
+    chunk_size: int
+        max. number of (point, triangle) pairs decided at once.
+    
+    Returns
+    -------
+    code: array, (m)
+        OUTSIDE, INSIDE, ON_FACE, ON_EDGE or ON_VERTEX
+    """
+    points=np.asarray(points)
+    obj=np.asarray(obj)
+    m=len(points)
+    code=np.full(m,OUTSIDE,dtype=np.int64)
+    if m==0 or len(obj)==0:
+        return code
+    if surface is None:
+        surface=generator_surface_1(obj)
+    ids={}
+    plane=np.array([-1 if key is None else ids.setdefault(key,len(ids)) for key in plane_keys(surface)],dtype=np.int64)
+    xyz=projection3_batch(points)
+    tri=projection3_batch(surface)
+    # (point, triangle) pairs with overlapping bounding boxes
+    tree=build_tree(*bounding_boxes(tri))
+    qi,ti=query_boxes(tree,*bounding_boxes(xyz[:,np.newaxis]))
+    keep=plane[ti]>=0
+    qi,ti=qi[keep],ti[keep]
+    on=np.zeros(len(qi),dtype=bool)
+    for i in range(0,len(qi),chunk_size):
+        on[i:i+chunk_size]=point_on_triangle(xyz[qi[i:i+chunk_size]],tri[ti[i:i+chunk_size]])
+    # number of planes on which the points are
+    pairs=np.unique(np.stack([qi[on],plane[ti[on]]],axis=1),axis=0)
+    num=np.bincount(pairs[:,0],minlength=m)
+    code[num==1]=ON_FACE
+    code[num==2]=ON_EDGE
+    code[num>=3]=ON_VERTEX
+    rest=np.nonzero(num==0)[0]
+    if len(rest)>0:
+        mask,_=points_in_obj(xyz[rest],projection3_batch(obj))
+        code[rest[mask]]=INSIDE
+    return code
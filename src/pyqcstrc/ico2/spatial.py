@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+#
+# PyQCstrc - Python library for Quasi-Crystal structure
+# Copyright (c) 2021 Tsunetomo Yamada <tsunetomo.yamada@rs.tus.ac.jp>
+#
+"""Spatial index of simplices in Eperp.
+
+An AABB tree is built once over the bounding boxes of the tetrahedra
+(or triangles, edges) of an object. Boxes are padded so that points on
+the surface of a simplex are always found, and queries return candidate
+pairs only; the exact decision is left to the predicates.
+
+The tree is a dict of arrays:
+    lo, hi: (k,3) bounding boxes of the nodes
+    left, right: (k) children of the nodes, -1 for leaves
+    start, end: (k) range of the leaves in order
+    order: (n) indices of the simplices
+    box_lo, box_hi: (n,3) bounding boxes of the simplices
+Node 0 is the root.
+"""
+import numpy as np
+from numpy.typing import NDArray
+
+from pyqcstrc.ico2.math1 import projection3_batch
+from pyqcstrc.ico2.numericalc import numerical_vector
+
+# relative padding of the bounding boxes
+BOX_TOL=1e-9
+# max. number of simplices in a leaf
+LEAF_SIZE=8
+
+def bounding_boxes(xyz: NDArray[np.int64]):
+    """bounding boxes of a set of simplices in Eperp.
+
+    Parameters
+    ----------
+    xyz: array, (n,k,3,3)
+        3d coordinates of the vertices of n simplices in TAU-style
+
+    Returns
+    -------
+    lo, hi: array, (n,3)
+        lower and upper corners, padded by BOX_TOL
+    """
+    xyz=np.asarray(xyz)
+    return bounding_boxes_numerical(numerical_vector(xyz))
+
+def bounding_boxes_numerical(v: NDArray[np.float64]):
+    """bounding boxes of a set of simplices in Eperp (see bounding_boxes()).
+
+    Parameters
+    ----------
+    v: array, (n,k,3)
+        numeric coordinates of the vertices
+
+    Returns
+    -------
+    lo, hi: array, (n,3)
+    """
+    v=np.asarray(v,dtype=np.float64)
+    lo=v.min(axis=-2)
+    hi=v.max(axis=-2)
+    pad=BOX_TOL*(1.0+np.maximum(np.abs(lo),np.abs(hi)))
+    return lo-pad,hi+pad
+
+def bounding_boxes_6d(obj: NDArray[np.int64]):
+    """bounding boxes of a set of 6d simplices in Eperp (see bounding_boxes()).
+
+    Parameters
+    ----------
+    obj: array, (n,k,6,3)
+        6d coordinates in TAU-style
+
+    Returns
+    -------
+    lo, hi: array, (n,3)
+    """
+    return bounding_boxes(projection3_batch(obj))
+
+def bounding_spheres_numerical(v: NDArray[np.float64]):
+    """bounding spheres of a set of simplices about their centroids.
+
+    Parameters
+    ----------
+    v: array, (n,k,3)
+        numeric coordinates of the vertices
+
+    Returns
+    -------
+    centre: array, (n,3)
+    radius: array, (n)
+        padded by BOX_TOL
+    """
+    v=np.asarray(v,dtype=np.float64)
+    centre=v.mean(axis=-2)
+    radius=np.linalg.norm(v-centre[...,np.newaxis,:],axis=-1).max(axis=-1)
+    return centre,radius+BOX_TOL*(1.0+radius+np.abs(centre).max(axis=-1))
+
+def build_tree(lo: NDArray[np.float64], hi: NDArray[np.float64], leaf_size: int=LEAF_SIZE) -> dict:
+    """build an AABB tree over bounding boxes.
+
+    The boxes are split at the median of their centres along the longest
+    axis, until a node has leaf_size boxes or less.
+
+    Parameters
+    ----------
+    lo, hi: array, (n,3)
+        bounding boxes
+    leaf_size: int
+
+    Returns
+    -------
+    tree: dict
+    """
+    lo=np.asarray(lo,dtype=np.float64)
+    hi=np.asarray(hi,dtype=np.float64)
+    n=len(lo)
+    centre=(lo+hi)*0.5
+    order=np.arange(n)
+    node_lo,node_hi,left,right,start,end=[],[],[],[],[],[]
+
+    def new_node(s,e):
+        idx=order[s:e]
+        if e>s:
+            node_lo.append(lo[idx].min(axis=0))
+            node_hi.append(hi[idx].max(axis=0))
+        else:
+            node_lo.append(np.full(3,np.inf))
+            node_hi.append(np.full(3,-np.inf))
+        left.append(-1)
+        right.append(-1)
+        start.append(s)
+        end.append(e)
+        return len(left)-1
+
+    stack=[new_node(0,n)]
+    while stack:
+        i=stack.pop()
+        s,e=start[i],end[i]
+        if e-s<=leaf_size:
+            continue
+        idx=order[s:e]
+        c=centre[idx]
+        axis=np.argmax(c.max(axis=0)-c.min(axis=0))
+        m=(e-s)//2
+        order[s:e]=idx[np.argsort(c[:,axis],kind='stable')]
+        left[i]=new_node(s,s+m)
+        right[i]=new_node(s+m,e)
+        stack.append(left[i])
+        stack.append(right[i])
+    return {'lo':np.array(node_lo),
+            'hi':np.array(node_hi),
+            'left':np.array(left,dtype=np.int64),
+            'right':np.array(right,dtype=np.int64),
+            'start':np.array(start,dtype=np.int64),
+            'end':np.array(end,dtype=np.int64),
+            'order':order,
+            'box_lo':lo,
+            'box_hi':hi,
+            }
+
+def build_tree_6d(obj: NDArray[np.int64], leaf_size: int=LEAF_SIZE) -> dict:
+    """build an AABB tree over a set of 6d simplices in Eperp.
+
+    Parameters
+    ----------
+    obj: array, (n,k,6,3)
+        6d coordinates in TAU-style
+    leaf_size: int
+
+    Returns
+    -------
+    tree: dict
+    """
+    lo,hi=bounding_boxes_6d(obj)
+    return build_tree(lo,hi,leaf_size)
+
+def query_boxes(tree: dict, lo: NDArray[np.float64], hi: NDArray[np.float64]):
+    """find the simplices of which bounding boxes overlap query boxes.
+
+    All queries descend the tree together, level by level.
+
+    Parameters
+    ----------
+    tree: dict
+        output of build_tree()
+    lo, hi: array, (m,3)
+        query boxes. A point is given as lo=hi.
+
+    Returns
+    -------
+    query, index: array
+        pairs of the indices of the query boxes and the simplices,
+        sorted by query and then by index.
+    """
+    lo=np.asarray(lo,dtype=np.float64).reshape(-1,3)
+    hi=np.asarray(hi,dtype=np.float64).reshape(-1,3)
+    q=np.arange(len(lo))
+    node=np.zeros(len(lo),dtype=np.int64)
+    out_q,out_i=[],[]
+    while len(q)>0:
+        hit=np.all((tree['lo'][node]<=hi[q])&(lo[q]<=tree['hi'][node]),axis=1)
+        q,node=q[hit],node[hit]
+        leaf=tree['left'][node]<0
+        # simplices in the leaves
+        s=tree['start'][node[leaf]]
+        n=tree['end'][node[leaf]]-s
+        ql=np.repeat(q[leaf],n)
+        k=np.repeat(s-np.cumsum(n)+n,n)+np.arange(n.sum())
+        il=tree['order'][k]
+        ok=np.all((tree['box_lo'][il]<=hi[ql])&(lo[ql]<=tree['box_hi'][il]),axis=1)
+        out_q.append(ql[ok])
+        out_i.append(il[ok])
+        # descend
+        q=np.concatenate([q[~leaf],q[~leaf]])
+        node=np.concatenate([tree['left'][node[~leaf]],tree['right'][node[~leaf]]])
+    query=np.concatenate(out_q) if out_q else np.zeros(0,dtype=np.int64)
+    index=np.concatenate(out_i) if out_i else np.zeros(0,dtype=np.int64)
+    s=np.lexsort((index,query))
+    return query[s],index[s]
+
+def query_points(tree: dict, points: NDArray[np.float64]):
+    """find the simplices of which bounding boxes contain points.
+
+    Parameters
+    ----------
+    tree: dict
+        output of build_tree()
+    points: array, (m,3)
+        numeric coordinates in Eperp
+
+    Returns
+    -------
+    query, index: array
+        pairs of the indices of the points and the simplices (see query_boxes()).
+    """
+    return query_boxes(tree,points,points)
+
+def candidate_pairs_6d(obj1: NDArray[np.int64], obj2: NDArray[np.int64], tree: dict=None):
+    """find the pairs of simplices of two objects which may intersect.
+
+    Both bounding boxes and bounding spheres of a pair have to overlap.
+    Simplices which only touch each other are included.
+
+    Parameters
+    ----------
+    obj1, obj2: array, (n1,k,6,3), (n2,k,6,3)
+        6d coordinates in TAU-style
+    tree: dict, optional
+        AABB tree over obj2 (see build_tree_6d()).
+
+    Returns
+    -------
+    index1, index2: array
+        pairs of the indices of the simplices in obj1 and obj2,
+        sorted by index1 and then by index2.
+    """
+    xyz1=projection3_batch(obj1)
+    xyz2=projection3_batch(obj2)
+    v1=numerical_vector(xyz1)
+    v2=numerical_vector(xyz2)
+    if tree is None:
+        tree=build_tree(*bounding_boxes_numerical(v2))
+    i1,i2=query_boxes(tree,*bounding_boxes_numerical(v1))
+    c1,r1=bounding_spheres_numerical(v1)
+    c2,r2=bounding_spheres_numerical(v2)
+    ok=np.linalg.norm(c1[i1]-c2[i2],axis=1)<=r1[i1]+r2[i2]
+    return i1[ok],i2[ok]
@@ -8,9 +8,9 @@ import sys
 from pyqcstrc.ico2.math1 import (add, 
                                 matrixpow, 
                                 dot_product, 
-                                dot_product_1, 
-                                sub_vectors, 
-                                add_vectors,
+                                to_compact,
+                                from_compact,
+                                symop_compact,
                                 )
 from pyqcstrc.ico2.utils import (remove_doubling_in_perp_space, 
                                 remove_doubling,
@@ -20,19 +20,13 @@ import numpy as np
 def symop_obj(symop,obj,centre):
     """ Apply a symmetric operation on an object around given centre. in TAU-style
     
+    symop can be a stack of operations, (m,6,6), which gives (m,)+obj.shape.
     """
     ndim=obj.ndim
-    if ndim==3:
-        return symop_vecs(symop,obj,centre)
-    elif ndim==4:
-        obj1=np.zeros(obj.shape,dtype=np.int64)
-        i=0
-        for vts in obj:
-            obj1[i]=symop_vecs(symop,vts,centre)
-            i+=1
-        return obj1
-    elif ndim==2:
-        return symop_vec(symop,obj,centre)
+    if ndim==2 or ndim==3 or ndim==4:
+        num,den=to_compact(obj)
+        num,den=symop_compact(symop,num,den,centre)
+        return from_compact(num,den)
     else:
         print('object has an incorrect shape!')
         return 
@@ -41,20 +35,13 @@ def symop_vecs(symop,tetrahedron,centre):
     """ Apply a symmetric operation on set of vectors around given centre. in TAU-style
     
     """
-    tetrahedron1=np.zeros(tetrahedron.shape,dtype=np.int64)
-    i=0
-    for vt in tetrahedron:
-        tetrahedron1[i]=symop_vec(symop,vt,centre)
-        i+=1
-    return tetrahedron1
+    return symop_obj(symop,tetrahedron,centre)
 
 def symop_vec(symop,vt,centre):
     """ Apply a symmetric operation on a vector around given centre. in TAU-style
     
     """
-    vt=sub_vectors(vt,centre)
-    vt=dot_product_1(symop,vt)
-    return add_vectors(vt,centre)
+    return symop_obj(symop,vt,centre)
 
 
 
@@ -63,14 +50,10 @@ def symop_vec(symop,vt,centre):
 def generator_obj_symmetric_obj(obj,centre):
     
     if obj.ndim==3 or obj.ndim==4:
-        mop=icosasymop()
+        # all 120 operations at once
+        mop=np.array(icosasymop())
         num=len(mop)
-        shape=tuple([num])
-        a=np.zeros(shape+obj.shape,dtype=np.int64)
-        i=0
-        for op in mop:
-            a[i]=symop_obj(op,obj,centre)
-            i+=1
+        a=symop_obj(mop,obj,centre)
         if obj.ndim==4:
             n1,n2,_,_=obj.shape
             a=a.reshape(num*n1,n2,6,3)
@@ -90,14 +73,8 @@ def generator_obj_symmetric_tetrahedron(obj,centre):
 def generator_obj_symmetric_tetrahedron_specific_symop(obj,centre,list_of_symmetry_operation_index):
     # using specific symmetry operations
     if obj.ndim==3 or obj.ndim==4:
-        mop=icosasymop()
-        shape=tuple([len(index_of_symmetry_operation)])
-        a=np.zeros(shape+obj.shape,dtype=np.int64)
-        i=0
-        for i in index_of_symmetry_operation:
-            a[i]=symop_obj(mop[i],obj,centre)
-            i+=1
-        return a
+        mop=np.array(icosasymop())
+        return symop_obj(mop[list(list_of_symmetry_operation_index)],obj,centre)
     else:
         print('object has an incorrect shape!')
         return
@@ -7,6 +7,7 @@
 import timeit
 import os
 import sys
+import warnings
 import numpy as np
 
 try:
@@ -16,12 +17,14 @@ try:
     import pyqcstrc.ico2.symmetry as symmetry
     import pyqcstrc.ico2.utils as utils
     import pyqcstrc.ico2.occupation_domain as od
+    import pyqcstrc.ico2.domain as domain
+    import pyqcstrc.ico2.bsp as bsp
 except ImportError:
     print('import error\n')
 
-TAU=(1+np.sqrt(5))/2.0
+from pyqcstrc.constants import TAU
 
-def intersection(obj1,obj2,kind=None,verbose=0):
+def intersection(obj1,obj2,kind=None,verbose=0,n_jobs=None,executor=None):
     """
     Return an intersection between two objects: obj1 AND obj2.
     
@@ -31,8 +34,13 @@ def intersection(obj1,obj2,kind=None,verbose=0):
         a set of tetrahedra to be intersected with obj2.
     obj2 : ndarray
         a set of tetrahedra to be intersected with obj1.
-    kind : {'standard', 'simple'}, optional
+    kind : {'standard', 'simple', 'bsp'}, optional
         The default is 'standard'. 
+    n_jobs : int, optional
+        number of processes (see pyqcstrc.parallel), not used with 'bsp'.
+        The default is serial. -1 uses all CPUs.
+    executor : concurrent.futures.Executor, optional
+        process pool to be used instead of a new one (not with 'bsp').
     
     Returns
     -------
@@ -48,9 +56,22 @@ def intersection(obj1,obj2,kind=None,verbose=0):
     
     'simple' intersection ...
     
+    'bsp' intersection splits the tetrahedra of obj1 by the planes of the
+    surface of obj2 in exact arithmetic (see pyqcstrc.ico2.bsp). obj1 and
+    obj2 need not be convex.
+    
     """
+    # AABB tree and planes cached in OccupationDomain
+    od2=obj2 if isinstance(obj2,domain.OccupationDomain) else None
+    obj1=domain.asarray(obj1)
+    obj2=domain.asarray(obj2)
     if obj1.ndim==4 and obj2.ndim==4:
-        common=intsct.intersection_two_obj_1(obj1,obj2,kind)
+        if kind=='bsp':
+            if n_jobs not in (None,1) or executor is not None:
+                warnings.warn("n_jobs and executor are not used with kind='bsp'.",RuntimeWarning,stacklevel=2)
+            common=bsp.intersection_bsp(obj1,obj2,None if od2 is None else od2.boundary)
+        else:
+            common=intsct.intersection_two_obj_1(obj1,obj2,kind,tree=None if od2 is None else od2.tree,n_jobs=n_jobs,executor=executor)
         if np.all(common==None):
             if verbose>0:
                 print('no common part')
@@ -62,7 +83,7 @@ def intersection(obj1,obj2,kind=None,verbose=0):
             print('incorrect ndim')
         return 
 
-def intersection_convex(obj1,obj2,verbose=0):
+def intersection_convex(obj1,obj2,verbose=0,n_jobs=None,executor=None,kind=None):
     """
     Intersection of two occupation domains projected onto perp space: obj1 AND obj2.
     The common part forms convex hull.
@@ -73,6 +94,14 @@ def intersection_convex(obj1,obj2,verbose=0):
         The shape is (num,4,6,3) or (num*4,6,3), where num=numbre_of_tetrahedron.
     obj2 (numpy.ndarray):
         The shape is (num,4,6,3) or (num*4,6,3), where num=numbre_of_tetrahedron.
+    n_jobs (int, optional):
+        number of processes (see pyqcstrc.parallel), for kind='delaunay' only.
+        The default is serial. -1 uses all CPUs.
+    executor (concurrent.futures.Executor, optional):
+        process pool to be used instead of a new one (kind='delaunay').
+    kind ({'halfspace', 'delaunay'}, optional):
+        The default is 'halfspace', exact clipping of obj2 by the faces of obj1.
+        ValueError is raised for other values.
     
     Returns
     -------
@@ -80,8 +109,10 @@ def intersection_convex(obj1,obj2,verbose=0):
         The shape is (num,4,6,3), where num=numbre_of_tetrahedron.
 
     """
+    obj1=domain.asarray(obj1)
+    obj2=domain.asarray(obj2)
     if obj1.ndim==4 and obj2.ndim==4:
-        common=intsct.intersection_two_obj_convex(obj1,obj2)
+        common=intsct.intersection_two_obj_convex(obj1,obj2,n_jobs=n_jobs,executor=executor,kind=kind)
         if np.all(common==None):
             if verbose>0:
                 print('no common part')
@@ -93,7 +124,7 @@ def intersection_convex(obj1,obj2,verbose=0):
             print('incorrect ndim')
         return
         
-def subtraction(obj1,obj2,verbose=0):
+def subtraction(obj1,obj2,verbose=0,n_jobs=None,executor=None,kind=None):
     """
     Subtraction of two occupation domains projected onto perp space: obj1 NOT obj2 = obj1 NOT (obj1 AND obj2).
     
@@ -103,6 +134,16 @@ def subtraction(obj1,obj2,verbose=0):
         The shape is (num,4,6,3) or (num*4,6,3), where num=numbre_of_tetrahedron.
     obj2 (numpy.ndarray):
         The shape is (num,4,6,3) or (num*4,6,3), where num=numbre_of_tetrahedron.
+    n_jobs (int, optional):
+        number of processes (see pyqcstrc.parallel), for kind='standard'.
+        The default is serial. -1 uses all CPUs.
+    executor (concurrent.futures.Executor, optional):
+        process pool to be used instead of a new one (kind='standard').
+    kind ({'bsp', 'standard'}, optional):
+        'bsp' (default): the tetrahedra of obj1 are split by the planes of the
+        surface of obj2 in exact arithmetic (see pyqcstrc.ico2.bsp).
+        'standard': intsct.subtraction_two_obj().
+        ValueError is raised for other values.
     
     Returns
     -------
@@ -110,9 +151,50 @@ def subtraction(obj1,obj2,verbose=0):
         The shape is (num,4,6,3), where num=numbre_of_tetrahedron.
 
     """
+    if kind not in (None,'bsp','standard'):
+        raise ValueError("kind must be 'bsp' or 'standard', not %r"%(kind,))
+    # planes cached in OccupationDomain
+    od2=obj2 if isinstance(obj2,domain.OccupationDomain) else None
+    obj1=domain.asarray(obj1)
+    obj2=domain.asarray(obj2)
+    if obj1.ndim==4 and obj2.ndim==4:
+        if kind=='standard':
+            return intsct.subtraction_two_obj(obj1,obj2,verbose,n_jobs,executor)
+        else:
+            if n_jobs not in (None,1) or executor is not None:
+                warnings.warn("n_jobs and executor are used only with kind='standard'.",RuntimeWarning,stacklevel=2)
+            return bsp.subtraction_bsp(obj1,obj2,None if od2 is None else od2.boundary)
+    else:
+        if verbose>0:
+            print('incorrect ndim')
+        return
+
+def union(obj1,obj2,verbose=0):
+    """
+    Union of two occupation domains projected onto perp space: obj1 OR obj2.
+    
+    The result consists of obj2 and the tetrahedra of obj1 NOT obj2, which do
+    not overlap (see pyqcstrc.ico2.bsp).
     
+    Parameters
+    ----------
+    obj1 (numpy.ndarray):
+        The shape is (num,4,6,3) or (num*4,6,3), where num=numbre_of_tetrahedron.
+    obj2 (numpy.ndarray):
+        The shape is (num,4,6,3) or (num*4,6,3), where num=numbre_of_tetrahedron.
+    
+    Returns
+    -------
+    obj1 OR obj2
+        The shape is (num,4,6,3), where num=numbre_of_tetrahedron.
+
+    """
+    # planes cached in OccupationDomain
+    bnd=obj2.boundary if isinstance(obj2,domain.OccupationDomain) else None
+    obj1=domain.asarray(obj1)
+    obj2=domain.asarray(obj2)
     if obj1.ndim==4 and obj2.ndim==4:
-        return intsct.subtraction_two_obj(obj1,obj2,verbose)
+        return bsp.union_bsp(obj1,obj2,bnd)
     else:
         if verbose>0:
             print('incorrect ndim')
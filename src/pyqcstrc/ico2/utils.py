@@ -5,45 +5,49 @@
 #
 import sys
 #sys.path.append('.')
-from pyqcstrc.ico2.math1 import (projection3,
+from pyqcstrc.ico2.math1 import (projection3_batch,
+                                sub_batch,
+                                mul_batch,
+                                div_batch,
+                                sign_batch,
+                                sum_batch,
+                                det_matrix_batch,
+                                normalize_batch,
                                 add,
                                 sub,
                                 mul,
                                 div,
-                                add_vectors,
                                 sub_vectors,
                                 outer_product,
                                 inner_product,
                                 centroid,
                                 coplanar_check,
+                                to_compact,
+                                from_compact,
+                                shift_compact,
                                 )
+from pyqcstrc.buffer import SimplexBuffer
 from pyqcstrc.ico2.numericalc import (numeric_value,
                                     numerical_vector,
                                     numerical_vectors,
                                     point_on_segment,
-                                    coplanar_check_numeric_tau,
-                                    get_internal_component_numerical,
+                                    coplanar_check_numeric_tau_batch,
                                     get_internal_component_sets_numerical,
                                     )
 import numpy as np
 from numpy.typing import NDArray
 from scipy.spatial import Delaunay
 import itertools
+import collections
 import time
 
 def shift_object(obj: NDArray[np.int64], shift: NDArray[np.int64]) -> NDArray[np.int64]:
     """shift an object
     """
     if obj.ndim==4:
-        obj_new=np.zeros(obj.shape,dtype=np.int64)
-        i1=0
-        for tetrahedron in obj:
-            i2=0
-            for vertex in tetrahedron:
-                obj_new[i1][i2]=add_vectors(vertex,shift)
-                i2+=1
-            i1+=1
-        return obj_new
+        num,den=to_compact(obj)
+        num,den=shift_compact(num,den,shift)
+        return from_compact(num,den)
     else:
         print('object has an incorrect shape!')
         return 
@@ -63,24 +67,38 @@ def obj_volume_6d(obj: NDArray[np.int64]) -> NDArray[np.int64]:
     volume: array
         Volume in TAU-style.
     """
-    w=np.array([0,0,1])
-    if obj.ndim==4:
-        for tetrahedron in obj:
-            v=tetrahedron_volume_6d(tetrahedron)
-            w=add(w,v)
-        return w
-    elif obj.ndim==5:
-        for tset in obj:
-            for tetrahedron in tset:
-                v=tetrahedron_volume_6d(tetrahedron)
-                w=add(w,v)
-        return w
+    if obj.ndim==4 or obj.ndim==5:
+        return sum_batch(tetrahedra_volume_6d(obj.reshape(-1,4,6,3)))
     elif obj.ndim==3:
         return tetrahedron_volume_6d(obj)
     else:
         print('object has an incorrect shape!')
         return 
 
+def tetrahedra_volume_6d(obj: NDArray[np.int64]) -> NDArray[np.int64]:
+    """Calculate volumes of a set of tetrahedra in TAU style.
+    
+    Parameters
+    ----------
+    obj: array, (...,4,6,3)
+        6d vectors of tetrahedron vertices in TAU-style.
+    
+    Returns
+    -------
+    volume: array, (...,3)
+        Volume of each tetrahedron in TAU-style.
+    """
+    if obj.ndim<3 or obj.shape[-3:]!=(4,6,3):
+        print('object has an incorrect shape!')
+        return 
+    xyz=projection3_batch(obj)
+    v=sub_batch(xyz[...,1:,:,:],xyz[...,:1,:,:],normalize=False)
+    v=det_matrix_batch(v,normalize=False)
+    # avoid a negative value
+    v=mul_batch(v,np.array([1,0,6]))
+    v[...,:2]*=np.where(sign_batch(v)<0,-1,1)[...,np.newaxis]
+    return v
+
 def tetrahedron_volume_6d(tetrahedron: NDArray[np.int64]) -> NDArray[np.int64]:
     """Calculate volume of tetrahedron in TAU style.
     
@@ -95,10 +113,7 @@ def tetrahedron_volume_6d(tetrahedron: NDArray[np.int64]) -> NDArray[np.int64]:
         Volume in TAU-style.
     """
     if tetrahedron.ndim==3:
-        vts=np.zeros((4,3,3),dtype=np.int64)
-        for i in range(4):
-            vts[i]=projection3(tetrahedron[i])
-        return tetrahedron_volume(vts)
+        return tetrahedra_volume_6d(tetrahedron)
     else:
         print('object has an incorrect shape!')
         return 
@@ -182,18 +197,142 @@ def remove_doubling_in_perp_space(vts: NDArray[np.int64]) -> NDArray[np.int64]:
     
     # first run remove_doubling()
     vts=remove_doubling(vts)
-    num=len(vts)
     
     # then, remove doubling in perp space.
-    a=np.zeros((num,3,3),dtype=np.int64)
-    for i in range(num):
-        a[i]=projection3(vts[i])
+    a=projection3_batch(vts)
     b=np.unique(a,return_index=True,axis=0)[1]
-    num=len(b)
-    a=np.zeros((num,6,3),dtype=np.int64)
-    for i in range(num):
-        a[i]=vts[b[i]]
-    return a
+    return vts[b]
+
+#----------------------------
+# Canonical keys
+#
+# A normalized TAU-style value (gcd=1, positive denominator) is unique,
+# so the integers of the normalized Eperp coordinates identify a vertex
+# exactly. A simplex is identified by the sorted tuple of its vertex keys,
+# which does not depend on the order of the vertices. The keys are
+# hashable, and can be used in dict and set.
+#----------------------------
+def vertex_keys(vts: NDArray[np.int64], perp: bool=True) -> list:
+    """canonical keys of a set of 6d vectors.
+    
+    Parameters
+    ----------
+    vts: array, (...,6,3)
+        6d vectors in TAU-style
+    perp: bool
+        True (default): keys of the vectors in Eperp.
+        False: keys of the 6d vectors.
+    
+    Returns
+    -------
+    keys: list of tuple of int
+        in the order of vts.reshape(-1,6,3)
+    """
+    vts=np.asarray(vts)
+    if perp:
+        xyz=projection3_batch(vts)
+    else:
+        xyz=normalize_batch(vts)
+    n=xyz.shape[-2]*3
+    return [tuple(v) for v in xyz.reshape(-1,n).tolist()]
+
+def simplex_keys(obj: NDArray[np.int64], perp: bool=True) -> list:
+    """canonical keys of a set of simplices (edges, triangles or tetrahedra).
+    
+    Parameters
+    ----------
+    obj: array, (...,k,6,3)
+        simplices of k vertices in TAU-style
+    perp: bool
+        True (default): keys in Eperp.
+        False: keys of the 6d vectors.
+    
+    Returns
+    -------
+    keys: list of tuple
+        sorted tuples of k vertex keys, in the order of obj.reshape(-1,k,6,3)
+    """
+    obj=np.asarray(obj)
+    k=obj.shape[-3]
+    keys=vertex_keys(obj,perp)
+    return [tuple(sorted(keys[i:i+k])) for i in range(0,len(keys),k)]
+
+def unique_simplices(obj: NDArray[np.int64]) -> NDArray[np.int64]:
+    """indices of unique simplices in Eperp.
+    
+    Parameters
+    ----------
+    obj: array, (n,k,6,3)
+        simplices of k vertices in TAU-style
+    
+    Returns
+    -------
+    indices: array
+        index of the first one of each set of equivalent simplices, sorted
+        by the x,y,z of their centroids in Eperp.
+    """
+    first={}
+    for i1,key in enumerate(simplex_keys(obj)):
+        first.setdefault(key,i1)
+    b=np.array(list(first.values()),dtype=np.int64)
+    xyz=sum_batch(projection3_batch(obj[b]),axis=1)
+    xyz=numerical_vector(xyz)
+    return b[np.lexsort((xyz[:,2],xyz[:,1],xyz[:,0]))]
+
+def plane_equations(triangles: NDArray[np.int64]):
+    """equations of the planes of a set of triangles in Eperp, n.x=d.
+    
+    The normal vector is scaled so that its first non-zero component is 1.
+    
+    Parameters
+    ----------
+    triangles: array, (n,3,6,3)
+        triangles in TAU-style
+    
+    Returns
+    -------
+    nrm: array, (n,3,3)
+        normal vectors in TAU-style
+    d: array, (n,3)
+        distances from the origin (times |n|) in TAU-style
+    valid: array, (n)
+        False for degenerated triangles.
+    """
+    xyz=projection3_batch(np.asarray(triangles)) # (n,3,3,3)
+    v1=sub_batch(xyz[:,1],xyz[:,0])
+    v2=sub_batch(xyz[:,2],xyz[:,0])
+    # cross product
+    a=mul_batch(v1[:,[1,2,0]],v2[:,[2,0,1]],normalize=False)
+    b=mul_batch(v1[:,[2,0,1]],v2[:,[1,2,0]],normalize=False)
+    nrm=sub_batch(a,b) # (n,3,3)
+    nonzero=np.any(nrm[...,:2]!=0,axis=2)
+    valid=np.any(nonzero,axis=1)
+    k=np.argmax(nonzero,axis=1)
+    pivot=nrm[np.arange(len(nrm)),k]
+    pivot[~valid]=[1,0,1]
+    nrm=div_batch(nrm,pivot[:,np.newaxis])
+    d=sum_batch(mul_batch(nrm,xyz[:,0],normalize=False),axis=1)
+    return nrm,d,valid
+
+def plane_keys(triangles: NDArray[np.int64]) -> list:
+    """canonical keys of the planes of a set of triangles in Eperp.
+    
+    The key consists of the normal and the distance from the origin
+    (see plane_equations()).
+    
+    Parameters
+    ----------
+    triangles: array, (n,3,6,3)
+        triangles in TAU-style
+    
+    Returns
+    -------
+    keys: list of tuple
+        None for degenerated triangles.
+    """
+    nrm,d,valid=plane_equations(triangles)
+    keys=np.concatenate([nrm.reshape(-1,9),d],axis=1).tolist()
+    return [tuple(key) if v else None for key,v in zip(keys,valid)]
 
 #----------------------------
 # Surface, trianges, and edges
@@ -241,69 +380,15 @@ def generator_surface_1(obj: NDArray[np.int64], verbose: int=0) -> NDArray[np.in
         #
         
         # (2) 重複のない三角形（すなはちobject表面の三角形）のみを得る。
-        # 三角形が重複していれば重心も同じことを利用する。重心が一致すれば重複しているとは限らないが、
-        # objが正しく与えられているとすれば問題ない。
         #
-        # まず重心xyzを求める
-        xyz=np.zeros((n1*4,3),dtype=np.float64)
-        for i1 in range(n1*4):
-            vt=centroid(triangles[i1])
-            xyz[i1]=get_internal_component_numerical(vt)
-        
-        """
-        # 以下のやり方では効率悪い。
-        # triangleの数が多ければ時間がかかる(O(n^2))ので改良が必要
-        #===========ここから============
-        # xyzをxでソートし、indexを得る。
-        indx_xyz=np.argsort(xyz[:,0])
-        #print('number of trianges:',len(indx_xyz))
-        #print('indx_xyz:',indx_xyz)
-        #print(xyz[indx_xyz])
-        
-        # 重複しているtriangleはスキップ。表面のtriangleのみを選び出す。
-        lst=[]
-        for i1 in indx_xyz:
-            counter=0
-            for i2 in indx_xyz:
-                if i1==i2:
-                    pass
-                else:
-                    if np.allclose(xyz[i1],xyz[i2]): # equivalent
-                        counter+=1
-                        break
-            if counter==0:
-                lst.append(i1)
-        #===========ここまで============
-        """
-        #"""
-        # xyz座標のソートをx,y,zに対して行い、重複チェックを効率化(O(n))。
-        #===========ここから============
-        # xyzをx,y,zの順で優先的にソートし、indexを得る。
+        # 三角形の正準キーを数え、一度しか現れない三角形を選ぶ (exact)。
+        # 出力の順序は重心xyzのx,y,zの順のソートに従う。
+        keys=simplex_keys(triangles)
+        count=collections.Counter(keys)
+        xyz=sum_batch(projection3_batch(triangles),axis=1)
+        xyz=numerical_vector(xyz)
         indx_xyz=np.lexsort((xyz[:,2],xyz[:,1],xyz[:,0]))
-        #print('number of trianges:',len(indx_xyz))
-        #print('indx_xyz:',indx_xyz)
-        
-        # 表面のtriangleのみを選び出すには、重複しているtriangleを除けば良い。
-        # 上でxyzをx,y,zの順で優先的にソートできていれば、着目している点をその前後と比べるだけで重複があるか判断できる。
-        lst=[]
-        if np.allclose(xyz[indx_xyz[0]],xyz[indx_xyz[1]]):
-            pass
-        else:
-            lst.append(indx_xyz[0])
-        for i1 in range(1,len(indx_xyz)-1):
-            counter=0
-            for i2 in [-1,1]:
-                if np.allclose(xyz[indx_xyz[i1]],xyz[indx_xyz[i1+i2]]): # equivalent
-                    counter+=1
-                    break
-            if counter==0:
-                lst.append(indx_xyz[i1])
-        if np.allclose(xyz[indx_xyz[-1]],xyz[indx_xyz[-2]]):
-            pass
-        else:
-            lst.append(indx_xyz[-1])
-        #===========ここまで============
-        #"""
+        lst=[i1 for i1 in indx_xyz if count[keys[i1]]==1]
         
         #print('lst:',lst)
         num=len(lst)
@@ -350,20 +435,10 @@ def generator_unique_triangles(obj: NDArray[np.int64]) -> NDArray[np.int64]:
         return triangles
     else:
         # (2) ユニークな三角形を得る。
-        # 三角形が重複していれば重心も同じことを利用する。重心が一致すれば重複しているとは限らないが、
-        # objが正しく与えられているとすれば問題ない。
         #print('number of trianges:',len(triangles))
-        a=np.zeros((n1*4,3),dtype=np.float64)
-        for i1 in range(n1*4):
-            vt=centroid(triangles[i1])
-            a[i1]=get_internal_component_numerical(vt)
-        b=np.unique(a,return_index=True,axis=0)[1]
-        num=len(b)
-        #print('number of unique trianges:',num)
-        a=np.zeros((num,3,6,3),dtype=np.int64)
-        for i1 in range(num):
-            a[i1]=triangles[b[i1]]
-        return a
+        b=unique_simplices(triangles)
+        #print('number of unique trianges:',len(b))
+        return triangles[b]
 
 def get_tetrahedron_surface(tetrahedron: NDArray[np.int64]) -> NDArray[np.int64]:
     """Return four triangles of tetrahedron.
@@ -448,18 +523,9 @@ def generator_unique_edges(obj: NDArray[np.int64]) -> NDArray[np.int64]:
     
     # (2) 重複のないユニークな辺を得る。
     #print('number of edges:',len(edges))
-    num_edges=len(edges)
-    a=np.zeros((num_edges,3),dtype=np.float64)
-    for i1 in range(num_edges):
-        vt=centroid(edges[i1])
-        a[i1]=get_internal_component_numerical(vt)
-    b=np.unique(a,return_index=True,axis=0)[1]
-    num=len(b)
-    #print('number of unique edges:',num)
-    a=np.zeros((num,2,6,3),dtype=np.int64)
-    for i1 in range(num):
-        a[i1]=edges[b[i1]]
-    return a
+    b=unique_simplices(edges)
+    #print('number of unique edges:',len(b))
+    return edges[b]
 
 def get_triangle_edge(triangle: NDArray[np.int64]) -> NDArray[np.int64]:
     """Return three edges of triange.
@@ -554,18 +620,20 @@ def surface_cleaner(surface: NDArray[np.int64]) -> NDArray[np.int64]:
     #print('num. of lst_sets:',len(lst_sets))
     
     #同一平面上にある三角形の辺のうち、どの三角形とも共有していない独立な辺を求める．
+    buf=SimplexBuffer((2,6,3))
     for i in range(len(lst_sets)):
         #print('num. of coplanar triangles',len(lst_sets[i]))
         edges=gen_border_edges_of_coplanar_triangles(lst_sets[i])
-        if i==0:
-            edges_new=edges
-        else:
-            edges_new=np.vstack([edges_new,edges])
+        if len(edges)>0:
+            buf.append(edges)
+    edges_new=buf.array()
     
     # ２辺を１つの辺にまとめられるのであれば、まとめる
     #print('edges_new.shape',edges_new.shape)
     edges_new=generator_unique_edges(edges_new)
     #print('edges_new.shape',edges_new.shape)
+    buf=SimplexBuffer((2,6,3),edges_new.dtype,len(edges_new))
+    buf.append(edges_new)
     num=len(edges_new)
     lst0=[i for i in range(num)]
     lst=lst0
@@ -589,7 +657,8 @@ def surface_cleaner(surface: NDArray[np.int64]) -> NDArray[np.int64]:
             #print('  lst',lst)
             #print('  edges_new.shape',edges_new.shape)
             #print('  a.shape',a.shape)
-            edges_new=np.vstack([edges_new,[a]])
+            buf.append(a)
+            edges_new=buf.array()
             lst.append(num)
             num+=1
             #print('  lst',lst)
@@ -606,40 +675,18 @@ def surface_cleaner(surface: NDArray[np.int64]) -> NDArray[np.int64]:
 
 def get_sets_of_coplanar_triangles(surface: NDArray[np.int64]) -> NDArray[np.int64]:
     """
-    同一平面上にある三角形の集合を作る。surfaceに含まれるtriangleについて
-    順に同一平面上にあるかどうかをチェックし、もし以前のどの三角形とも同一平面
-    にない時はそのインデックスをlst_indx_groupに収納する。また、lst_indx_triangle
-    にもそのインデックスを収納する。一方、すでにチェックした三角形と同一平面に
-    にある場合はlst_indx_triangleに同一平面三角形のインデックスを収納
+    同一平面上にある三角形の集合を作る。各三角形の平面のkey (plane_keys()) で
+    グループ分けする。グループは最初の三角形のインデックス順、グループ内の三角形
+    はsurfaceでの順に並ぶ。縮退した三角形はそれぞれ単独のグループとする。
     """
-    num=len(surface)
-    lst_indx_group=[0]
-    lst_indx_triangle=[0]
-    for i1 in range(1,num):
-        counter=0
-        for i2 in lst_indx_group:
-            if coplanar_check_two_triangles(surface[i1],surface[i2]): # coplanar
-                counter=1
-                break
-            else: # non coplanar
-                pass
-        if counter==0:
-            lst_indx_triangle.append(i1)
-            lst_indx_group.append(i1)
-        else:
-            lst_indx_triangle.append(i2)
-    lst_sets=[]
-    for i1 in lst_indx_group:
-        tmp=[]
-        for i2 in range(num):
-            if i1==lst_indx_triangle[i2]:
-                tmp.append(surface[i2])
-        num_triangle=len(tmp)
-        a=np.zeros((num_triangle,3,6,3),dtype=np.int64)
-        for i2 in range(num_triangle):
-            a[i2]=tmp[i2]
-        lst_sets.append(a)
-    return lst_sets
+    group={}
+    lst_indx_triangle=[]
+    for i1,key in enumerate(plane_keys(surface)):
+        if key is None:
+            key=i1
+        lst_indx_triangle.append(group.setdefault(key,len(group)))
+    lst_indx_triangle=np.array(lst_indx_triangle,dtype=np.int64)
+    return [surface[lst_indx_triangle==i1] for i1 in range(len(group))]
 
 def gen_border_edges_of_coplanar_triangles(coplanar_triangles: NDArray[np.int64]) -> NDArray[np.int64]:
     """
@@ -649,17 +696,10 @@ def gen_border_edges_of_coplanar_triangles(coplanar_triangles: NDArray[np.int64]
     edges=generator_all_edges(coplanar_triangles)
     #print(' num. of edges:',len(edges))
     #print(' num. of unique_edges:',len(unique_edges))
+    count=collections.Counter(simplex_keys(edges))
     lst=[]
-    for edge1 in unique_edges:
-        counter=0
-        for edge2 in edges:
-            tmp=np.vstack([edge1,edge2])
-            tmp=remove_doubling_in_perp_space(tmp)
-            if len(tmp)==2:
-                counter+=1
-                if counter==2:
-                    break
-        if counter==1:
+    for edge1,key in zip(unique_edges,simplex_keys(unique_edges)):
+        if count[key]==1:
             lst.append(edge1)
         else:
             pass
@@ -683,9 +723,8 @@ def equivalent(obj1: NDArray[np.int64], obj2: NDArray[np.int64]) -> bool:
         n1,_,_=a.shape
         n2,_,_=a.shape
         if n1==n2:
-            a=np.vstack([a,b])
-            a=remove_doubling_in_perp_space(a)
-            if len(a)==n:
+            a=vertex_keys(np.vstack([a,b]))
+            if len(set(a))==n:
                 return True # equivalent traiangle
             else:
                 return False # not equivalent traiangles
@@ -693,8 +732,8 @@ def equivalent(obj1: NDArray[np.int64], obj2: NDArray[np.int64]) -> bool:
             return False
     
     def check2(a,b):
-        a=projection3(a)
-        b=projection3(b)
+        a=projection3_batch(a)
+        b=projection3_batch(b)
         if np.all(a==b):
             return True # equivalent traiangle
         else:
@@ -723,9 +762,8 @@ def equivalent(obj1: NDArray[np.int64], obj2: NDArray[np.int64]) -> bool:
 def equivalent_tetrahedra(tetrahedron_1: NDArray[np.int64], tetrahedron_2: NDArray[np.int64]) -> bool:
     """Checking whether tetrahedron_1 and _2 are equivalent or not.
     """
-    a=np.vstack([tetrahedron_1,tetrahedron_2])
-    a=remove_doubling_in_perp_space(a)
-    if len(a)==4:
+    a=vertex_keys(np.vstack([tetrahedron_1,tetrahedron_2]))
+    if len(set(a))==4:
         return True # equivalent traiangle
     else:
         return False # not equivalent traiangles
@@ -755,9 +793,8 @@ def equivalent_tetrahedra(tetrahedron_1: NDArray[np.int64], tetrahedron_2: NDArr
 def equivalent_triangles(triangle1: NDArray[np.int64], triangle2: NDArray[np.int64]) -> bool:
     """Checking whether triangle1 and triangle2 are equivalent or not.
     """
-    a=np.vstack([triangle1,triangle2])
-    a=remove_doubling_in_perp_space(a)
-    if len(a)==3:
+    a=vertex_keys(np.vstack([triangle1,triangle2]))
+    if len(set(a))==3:
         return True # equivalent traiangle
     else:
         return False # not equivalent traiangles
@@ -765,17 +802,15 @@ def equivalent_triangles(triangle1: NDArray[np.int64], triangle2: NDArray[np.int
 def equivalent_edges(edge1: NDArray[np.int64], edge2: NDArray[np.int64]) -> bool:
     """Checking whether edge1 and edge2 are equivalent or not.
     """
-    a=np.vstack([edge1,edge2])
-    a=remove_doubling_in_perp_space(a)
-    if len(a)==2:
+    a=vertex_keys(np.vstack([edge1,edge2]))
+    if len(set(a))==2:
         return True # equivalent
     else:
         return False # not equivalent
 
 def equivalent_vertices(vertex1: NDArray[np.int64], vertex2: NDArray[np.int64]) -> bool:
-    xyz1=projection3(vertex1)
-    xyz2=projection3(vertex2)
-    if np.all(xyz1==xyz2):
+    key1,key2=vertex_keys(np.array([vertex1,vertex2]))
+    if key1==key2:
         return True # equivalent
     else:
         return False
@@ -840,37 +875,19 @@ def decomposition(tmp2v: NDArray[np.int64]) -> NDArray[np.int64]:
 
 def tetrahedralization_points(points: NDArray[np.int64]) -> NDArray[np.int64]:
     
-    i1=0
-    for p in points:
-        v=projection3(p)
-        v=numerical_vector(v)
-        if i1==0:
-            tmp=v
-        else:
-            tmp=np.vstack([tmp,v])
-        i1+=1
-        
+    tmp=numerical_vector(projection3_batch(points))
     ltmp=decomposition(tmp)
-    p=points
-    if ltmp!=[0]:
-        counter=0
-        for i in ltmp:
-            tmp3=np.array([p[i[0]],p[i[1]],p[i[2]],p[i[3]]]).reshape(4,6,3)
-            vol=tetrahedron_volume_6d(tmp3)
-            if vol[0]==0 and vol[1]==0:
-                pass
-            else:
-                if counter==0:
-                    tmp1=tmp3.reshape(72) # 4*6*3=72
-                else:
-                    tmp1=np.append(tmp1,tmp3)
-                counter+=1
-        if counter!=0:
-            return tmp1.reshape(int(len(tmp1)/72),4,6,3) # 4*6*3=72
+    if ltmp is None or len(ltmp)==0:
+        return 
+    else:
+        # tetrahedra with zero volume are removed
+        tmp1=points[np.array(ltmp)]
+        vol=tetrahedra_volume_6d(tmp1)
+        tmp1=tmp1[(vol[:,0]!=0)|(vol[:,1]!=0)]
+        if len(tmp1)!=0:
+            return tmp1
         else:
             return 
-    else:
-        return 
 
 ##############################
 ####
@@ -963,9 +980,8 @@ def merge_two_tetrahedra(tetrahedron_1: NDArray[np.int64], tetrahedron_2: NDArra
 def check_connectivity_tetrahedra(tetrahedron_1: NDArray[np.int64], tetrahedron_2: NDArray[np.int64]) -> bool:
     """Checking whether tetrahedron_1 and _2 are sharing a triangle surface or not.
     """
-    a=np.vstack([tetrahedron_1,tetrahedron_2])
-    a=remove_doubling_in_perp_space(a)
-    if len(a)==5:
+    a=vertex_keys(np.vstack([tetrahedron_1,tetrahedron_2]))
+    if len(set(a))==5:
         return True # equivalent traiangle
     else:
         return False # not equivalent traiangles
@@ -1051,19 +1067,27 @@ def coplanar_check_two_triangles(triange1: NDArray[np.int64], triange2: NDArray[
     
     Note
     ----
-    Current implementation may return wrong judgement when the cross product of the first two vectors chosen randomly
-    are very small in coplanar_check() and coplanar_check_numeric_tau().
-    
-    vtxはソートされており、coplanar_checkやcoplanar_check_numeric_tauでの外積計算の際に小さい値になるとcoplanar判定を間違うので注意。
+    The rank of the six vertices in Eperp is checked numerically (see coplanar_check_numeric_batch()).
     """
-    vtx=np.vstack([triange1,triange2])
-    vtx=remove_doubling_in_perp_space(vtx)
+    return bool(coplanar_check_triangles(triange1,triange2))
+
+def coplanar_check_triangles(triangles1: NDArray[np.int64], triangles2: NDArray[np.int64]) -> NDArray[np.bool_]:
+    """Checking whether pairs of triangles are coplanar or not.
     
-    #if coplanar_check(vtx): # in ico2.math1
-    if coplanar_check_numeric_tau(vtx): # in ico2.numericalc
-        return True # coplanar
-    else:
-        return False
+    Parameters
+    ----------
+    triangles1, triangles2: array, (...,3,6,3)
+        triangles in TAU-style, broadcastable
+    
+    Returns
+    -------
+    array of bool, (...)
+    """
+    triangles1=np.asarray(triangles1)
+    triangles2=np.asarray(triangles2)
+    shape=np.broadcast_shapes(triangles1.shape[:-3],triangles2.shape[:-3])
+    vtx=np.concatenate([np.broadcast_to(triangles1,shape+(3,6,3)),np.broadcast_to(triangles2,shape+(3,6,3))],axis=-3)
+    return coplanar_check_numeric_tau_batch(vtx)
 
 #################################
 ####
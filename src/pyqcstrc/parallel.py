@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+#
+# PyQCstrc - Python library for Quasi-Crystal structure
+# Copyright (c) 2021 Tsunetomo Yamada <tsunetomo.yamada@rs.tus.ac.jp>
+#
+"""Process-pool execution of independent chunks of work.
+
+A loop over n independent items (e.g. tetrahedra of obj1) is split into
+contiguous chunks, which are run by a process pool. The input arrays are
+put into shared memory once (share()), and the tasks receive small
+handles from which the workers attach views (attach()), instead of
+pickling the arrays for every task. Object arrays (python int, see
+pyqcstrc.qfield) cannot be shared and are sent as they are.
+
+The results are returned in the order of the chunks, so that the output
+does not depend on the number of processes.
+"""
+import os
+import numpy as np
+from numpy.typing import NDArray
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+# number of chunks per process, for load balancing
+CHUNKS_PER_JOB=4
+
+def num_jobs(n_jobs: int=None) -> int:
+    """number of processes.
+
+    Parameters
+    ----------
+    n_jobs: int
+        None or 1: serial. Negative values count from the number of CPUs,
+        e.g. -1: all CPUs, -2: all CPUs but one.
+
+    Returns
+    -------
+    int
+    """
+    if n_jobs is None:
+        return 1
+    elif n_jobs<0:
+        return max((os.cpu_count() or 1)+1+n_jobs,1)
+    else:
+        return max(n_jobs,1)
+
+def chunks(n: int, num: int):
+    """split range(n) into num contiguous chunks (or less).
+
+    Returns
+    -------
+    list of (start, end)
+    """
+    bounds=np.linspace(0,n,min(max(num,1),max(n,1))+1).astype(np.int64)
+    return [(int(s),int(e)) for s,e in zip(bounds[:-1],bounds[1:]) if e>s]
+
+def share(a: NDArray[np.int64]):
+    """put an array into shared memory.
+
+    Parameters
+    ----------
+    a: array
+
+    Returns
+    -------
+    handle:
+        tuple (name, shape, dtype), or the array itself for object arrays
+    shm: SharedMemory or None
+        to be closed and unlinked by the caller
+    """
+    a=np.asarray(a)
+    if a.dtype==object or a.nbytes==0:
+        return a,None
+    shm=shared_memory.SharedMemory(create=True,size=a.nbytes)
+    np.ndarray(a.shape,dtype=a.dtype,buffer=shm.buf)[...]=a
+    return (shm.name,a.shape,a.dtype.str),shm
+
+def attach(handle):
+    """view of a shared array (see share()).
+
+    Parameters
+    ----------
+    handle:
+        output of share(). An array is returned as it is.
+
+    Returns
+    -------
+    a: array
+    shm: SharedMemory or None
+        to be closed by detach() after all the views are deleted.
+    """
+    if isinstance(handle,tuple):
+        name,shape,dtype=handle
+        shm=shared_memory.SharedMemory(name=name)
+        return np.ndarray(shape,dtype=np.dtype(dtype),buffer=shm.buf),shm
+    else:
+        return handle,None
+
+def detach(*shms):
+    """close shared memory attached by attach()."""
+    for shm in shms:
+        if shm is not None:
+            shm.close()
+
+def map_chunks(func, n: int, arrays: list, args: tuple=(), n_jobs: int=None, executor=None):
+    """run func(*arrays, start, end, *args) on chunks of range(n).
+
+    Parameters
+    ----------
+    func: function
+        module-level function (picklable), which gets handles of the
+        arrays (see attach()), or the arrays themselves when serial.
+    n: int
+        number of items
+    arrays: list of arrays
+        shared by all the chunks
+    args: tuple
+        other arguments
+    n_jobs: int
+        number of processes (see num_jobs())
+    executor: concurrent.futures.Executor, optional
+        used instead of a new ProcessPoolExecutor(n_jobs).
+
+    Returns
+    -------
+    generator
+        results of the chunks in order. The remaining chunks are
+        cancelled when the iteration stops early.
+    """
+    jobs=num_jobs(n_jobs) if n_jobs is not None or executor is None else (os.cpu_count() or 1)
+    if executor is None and jobs==1:
+        yield func(*arrays,0,n,*args)
+        return
+    handles,shms=[],[]
+    try:
+        for a in arrays:
+            h,shm=share(a)
+            handles.append(h)
+            if shm is not None:
+                shms.append(shm)
+        ex=ProcessPoolExecutor(jobs) if executor is None else executor
+        futures=[ex.submit(func,*handles,s,e,*args) for s,e in chunks(n,jobs*CHUNKS_PER_JOB)]
+        try:
+            for f in futures:
+                yield f.result()
+        finally:
+            for f in futures:
+                f.cancel()
+            if executor is None:
+                ex.shutdown()
+            else:
+                wait(futures)
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,573 @@
+#!/usr/bin/env python
+#
+# PyQCstrc - Python library for Quasi-Crystal structure
+# Copyright (c) 2021 Tsunetomo Yamada <tsunetomo.yamada@rs.tus.ac.jp>
+#
+"""Exact arithmetic in real quadratic fields.
+
+A value is stored as three integers, [a,b,c] = (a+b*w)/c, where w is an
+irrational root of r*w**2 = p+q*w. The field is given by the constant
+(p,q,r), e.g.
+
+    TAU-style (ico2): w=TAU=(1+sqrt(5))/2,  TAU**2=1+TAU  -> (1,1,1)
+    SIN-style (dode2, deca): w=SIN=sqrt(3)/2,  4*SIN**2=3   -> (3,0,4)
+
+Each package plugs in its own constant, and the field-independent
+operations (addition, subtraction, normalization) do not need it.
+"""
+import math
+import numpy as np
+from numpy.typing import NDArray
+
+INT64_MAX=np.iinfo(np.int64).max
+
+#----------------------------
+# Overflow check
+#
+# Batch kernels run on int64 arrays as long as the bound of the
+# intermediate values fits in int64. Otherwise the batch is computed
+# on object arrays of python int (arbitrary precision), and the result
+# is returned as int64 again when it fits after gcd reduction.
+# The number of such fallbacks is counted in overflow_count().
+#----------------------------
+_overflow_check=True
+_overflow_count=0
+
+def set_overflow_check(flag: bool=True) -> None:
+    """switch on/off the overflow check in the batch kernels.
+
+    Parameters
+    ----------
+    flag: bool
+        True (default): checked arithmetic.
+        False: plain int64 arithmetic, without any check.
+    """
+    global _overflow_check
+    _overflow_check=flag
+    return
+
+def overflow_count() -> int:
+    """number of times the arbitrary-precision fallback fired.
+    """
+    return _overflow_count
+
+def reset_overflow_count() -> None:
+    """reset the counter of the arbitrary-precision fallback.
+    """
+    global _overflow_count
+    _overflow_count=0
+    return
+
+def as_array(a: NDArray[np.int64]) -> NDArray[np.int64]:
+    """convert input into int64 array (object array of python int is kept as it is).
+    """
+    a=np.asarray(a)
+    if a.dtype==object:
+        return a
+    else:
+        return a.astype(np.int64,copy=False)
+
+def promote(a: NDArray[np.int64], b: NDArray[np.int64], ka: int, kb: int, coeff: int):
+    """promote a and b to object arrays when coeff*max|a|^ka*max|b|^kb may exceed int64.
+    """
+    global _overflow_count
+    if a.dtype==object or b.dtype==object:
+        _overflow_count+=1
+        return a.astype(object),b.astype(object)
+    elif _overflow_check==False or a.size==0 or b.size==0:
+        return a,b
+    else:
+        ma=int(np.abs(a).max())
+        mb=int(np.abs(b).max())
+        if coeff*ma**ka*mb**kb>INT64_MAX:
+            _overflow_count+=1
+            return a.astype(object),b.astype(object)
+        else:
+            return a,b
+
+def field_value(field: tuple) -> float:
+    """numeric value of the irrational, w, of the field.
+
+    Parameters
+    ----------
+    field: tuple
+        (p,q,r), where r*w**2 = p+q*w
+
+    Returns
+    -------
+    float
+    """
+    p,q,r=field
+    return (q+math.sqrt(q*q+4*p*r))/(2*r)
+
+#----------------------------
+# Normalization
+#----------------------------
+def normalize_batch(x: NDArray[np.int64]) -> NDArray[np.int64]:
+    """reduce a set of values by their gcd and make the denominators positive.
+
+    Parameters
+    ----------
+    x: array, (...,3)
+        values, (a+b*w)/c
+
+    Returns
+    -------
+    array, (...,3)
+        int64, or object when the values do not fit in int64.
+    """
+    x=as_array(x)
+    if x.ndim==1:
+        return normalize_value(*x.tolist())
+    g=np.gcd(np.gcd(x[...,0],x[...,1]),x[...,2])
+    g[g==0]=1
+    g[x[...,2]<0]*=-1
+    x=x//g[...,np.newaxis]
+    if x.dtype==object and (x.size==0 or np.abs(x).max()<=INT64_MAX):
+        return x.astype(np.int64)
+    else:
+        return x
+
+def normalize_value(c1: int, c2: int, c3: int) -> NDArray[np.int64]:
+    """reduce a value, (c1+c2*w)/c3, by gcd and make the denominator positive.
+
+    Parameters
+    ----------
+    c1,c2,c3: int
+
+    Returns
+    -------
+    array
+        int64, or object when the value does not fit in int64.
+    """
+    global _overflow_count
+    g=math.gcd(math.gcd(c1,c2),c3)
+    if g==0:
+        g=1
+    if c3<0:
+        g=-g
+    c1,c2,c3=c1//g,c2//g,c3//g
+    if max(abs(c1),abs(c2),abs(c3))>INT64_MAX:
+        _overflow_count+=1
+        return np.array([c1,c2,c3],dtype=object)
+    else:
+        return np.array([c1,c2,c3],dtype=np.int64)
+
+#----------------------------
+# Lazy normalization
+#
+# The kernels take normalize=False to skip the gcd reduction of their
+# results when they feed straight into another operation (e.g. in an
+# accumulation). Such intermediate values may have a common factor and
+# a negative denominator, which all the kernels accept. They are reduced
+# anyway once their integers exceed LAZY_BOUND, so that a product of a
+# few of them still fits in int64. Values which are compared, hashed or
+# stored must be normalized, i.e. the last operation of a chain is
+# called with normalize=True (default), or by normalize_batch().
+#----------------------------
+LAZY_BOUND=2**20
+
+def lazy_reduce(x: NDArray[np.int64]) -> NDArray[np.int64]:
+    """reduce a set of values only when their integers exceed LAZY_BOUND.
+
+    Parameters
+    ----------
+    x: array, (...,3)
+        values, (a+b*w)/c
+
+    Returns
+    -------
+    array, (...,3)
+        the values as they are, or normalized ones.
+    """
+    x=np.asarray(x)
+    if x.dtype==object or (x.size!=0 and np.abs(x).max()>LAZY_BOUND):
+        return normalize_batch(x)
+    else:
+        return x.astype(np.int64,copy=False)
+
+def reduce_value(c1: int, c2: int, c3: int, normalize: bool) -> NDArray[np.int64]:
+    """a value, (c1+c2*w)/c3, normalized or lazily reduced.
+    """
+    if normalize or max(abs(c1),abs(c2),abs(c3))>LAZY_BOUND:
+        return normalize_value(c1,c2,c3)
+    else:
+        return np.array([c1,c2,c3],dtype=np.int64)
+
+#----------------------------
+# Arithmetic
+#----------------------------
+def add_batch(a: NDArray[np.int64], b:NDArray[np.int64], normalize: bool=True) -> NDArray[np.int64]:
+    """summation (a+b) of sets of values.
+
+    Parameters
+    ----------
+    a: array, (...,3)
+    b: array, (...,3)
+        broadcastable with a
+    normalize: bool
+        False: the gcd reduction is deferred (see lazy_reduce()).
+
+    Returns
+    -------
+    array, (...,3)
+    """
+    a=as_array(a)
+    b=as_array(b)
+    if a.ndim==1 and b.ndim==1:
+        a0,a1,a2=a.tolist()
+        b0,b1,b2=b.tolist()
+        return reduce_value(a0*b2+b0*a2, a1*b2+b1*a2, a2*b2, normalize)
+    a,b=promote(a,b,1,1,2)
+    c=np.empty(np.broadcast_shapes(a.shape,b.shape),dtype=a.dtype)
+    c[...,0]=a[...,0]*b[...,2]+b[...,0]*a[...,2]
+    c[...,1]=a[...,1]*b[...,2]+b[...,1]*a[...,2]
+    c[...,2]=a[...,2]*b[...,2]
+    return normalize_batch(c) if normalize else lazy_reduce(c)
+
+def sub_batch(a: NDArray[np.int64], b:NDArray[np.int64], normalize: bool=True) -> NDArray[np.int64]:
+    """subtraction (a-b) of sets of values.
+
+    Parameters
+    ----------
+    a: array, (...,3)
+    b: array, (...,3)
+        broadcastable with a
+    normalize: bool
+        False: the gcd reduction is deferred (see lazy_reduce()).
+
+    Returns
+    -------
+    array, (...,3)
+    """
+    a=as_array(a)
+    b=as_array(b)
+    if a.ndim==1 and b.ndim==1:
+        a0,a1,a2=a.tolist()
+        b0,b1,b2=b.tolist()
+        return reduce_value(a0*b2-b0*a2, a1*b2-b1*a2, a2*b2, normalize)
+    a,b=promote(a,b,1,1,2)
+    c=np.empty(np.broadcast_shapes(a.shape,b.shape),dtype=a.dtype)
+    c[...,0]=a[...,0]*b[...,2]-b[...,0]*a[...,2]
+    c[...,1]=a[...,1]*b[...,2]-b[...,1]*a[...,2]
+    c[...,2]=a[...,2]*b[...,2]
+    return normalize_batch(c) if normalize else lazy_reduce(c)
+
+def mul_batch(a: NDArray[np.int64], b:NDArray[np.int64], field: tuple, normalize: bool=True) -> NDArray[np.int64]:
+    """multiplication (a*b) of sets of values.
+
+    (a0+a1*w)*(b0+b1*w) = ((r*a0*b0+p*a1*b1) + (r*(a0*b1+a1*b0)+q*a1*b1)*w)/r
+
+    Parameters
+    ----------
+    a: array, (...,3)
+    b: array, (...,3)
+        broadcastable with a
+    field: tuple
+        (p,q,r), where r*w**2 = p+q*w
+    normalize: bool
+        False: the gcd reduction is deferred (see lazy_reduce()).
+
+    Returns
+    -------
+    array, (...,3)
+    """
+    p,q,r=field
+    a=as_array(a)
+    b=as_array(b)
+    if a.ndim==1 and b.ndim==1:
+        a0,a1,a2=a.tolist()
+        b0,b1,b2=b.tolist()
+        return reduce_value(r*a0*b0+p*a1*b1, r*(a0*b1+a1*b0)+q*a1*b1, r*a2*b2, normalize)
+    a,b=promote(a,b,1,1,2*r+abs(p)+abs(q))
+    c=np.empty(np.broadcast_shapes(a.shape,b.shape),dtype=a.dtype)
+    c[...,0]=r*a[...,0]*b[...,0]+p*a[...,1]*b[...,1]
+    c[...,1]=r*(a[...,0]*b[...,1]+a[...,1]*b[...,0])+q*a[...,1]*b[...,1]
+    c[...,2]=r*a[...,2]*b[...,2]
+    return normalize_batch(c) if normalize else lazy_reduce(c)
+
+def div_batch(a: NDArray[np.int64], b:NDArray[np.int64], field: tuple, normalize: bool=True) -> NDArray[np.int64]:
+    """division (a/b) of sets of values.
+
+    a/b is a multiplied by the conjugate of b, divided by the norm of b:
+        conj(b0+b1*w) = ((r*b0+q*b1) - r*b1*w)/r
+        r*norm(b0+b1*w) = r*b0**2+q*b0*b1-p*b1**2
+
+    Parameters
+    ----------
+    a: array, (...,3)
+    b: array, (...,3)
+        broadcastable with a
+    field: tuple
+        (p,q,r), where r*w**2 = p+q*w
+    normalize: bool
+        False: the gcd reduction is deferred (see lazy_reduce()).
+
+    Returns
+    -------
+    array, (...,3)
+    """
+    p,q,r=field
+    a=as_array(a)
+    b=as_array(b)
+    if a.ndim==1 and b.ndim==1:
+        a0,a1,a2=a.tolist()
+        b0,b1,b2=b.tolist()
+        if b0==0 and b1==0:
+            print('ERROR_1:division error')
+            return
+        c0=r*b0+q*b1
+        c1=-r*b1
+        return reduce_value((r*a0*c0+p*a1*c1)*b2,
+                            (r*(a0*c1+a1*c0)+q*a1*c1)*b2,
+                            r*a2*(r*b0*b0+q*b0*b1-p*b1*b1),
+                            normalize)
+    elif np.any((b[...,0]==0)&(b[...,1]==0)):
+        print('ERROR_1:division error')
+        return
+    else:
+        a,b=promote(a,b,1,2,(2*r+abs(p)+abs(q))*(r+abs(p)+abs(q)))
+        a0,a1,a2=a[...,0],a[...,1],a[...,2]
+        b0,b1,b2=b[...,0],b[...,1],b[...,2]
+        c0=r*b0+q*b1
+        c1=-r*b1
+        c=np.empty(np.broadcast_shapes(a.shape,b.shape),dtype=a.dtype)
+        c[...,0]=(r*a0*c0+p*a1*c1)*b2
+        c[...,1]=(r*(a0*c1+a1*c0)+q*a1*c1)*b2
+        c[...,2]=r*a2*(r*b0*b0+q*b0*b1-p*b1*b1)
+        return normalize_batch(c) if normalize else lazy_reduce(c)
+
+def sign_batch(x: NDArray[np.int64], field: tuple) -> NDArray[np.int64]:
+    """exact sign of a set of values.
+
+    Parameters
+    ----------
+    x: array, (...,3)
+    field: tuple
+        (p,q,r), where r*w**2 = p+q*w
+
+    Returns
+    -------
+    array, (...)
+        -1, 0 or 1
+    """
+    p,q,r=field
+    d=q*q+4*p*r
+    x=as_array(x)
+    x,_=promote(x,x,1,1,(2*r+abs(q))**2*(d+1))
+    # 2*r*(a+b*w) = s+t*sqrt(d), where s=2*r*a+q*b and t=b
+    s=2*r*x[...,0]+q*x[...,1]
+    t=x[...,1]
+    ss=np.sign(s)
+    st=np.sign(t)
+    sgn=np.where(ss*st>=0,np.sign(ss+st),ss*np.sign(s*s-d*t*t))
+    return (sgn*np.sign(x[...,2])).astype(np.int64)
+
+def numeric_batch(x: NDArray[np.int64], field: tuple) -> NDArray[np.float64]:
+    """numeric values of a set of values.
+
+    Parameters
+    ----------
+    x: array, (...,3)
+    field: tuple
+        (p,q,r), where r*w**2 = p+q*w
+
+    Returns
+    -------
+    array, (...)
+    """
+    x=np.asarray(x)
+    return (x[...,0]+x[...,1]*field_value(field))/x[...,2]
+
+#----------------------------
+# Sums and products over common denominators
+#----------------------------
+def common_denominator(x: NDArray[np.int64], axis: int=-1):
+    """bring a set of values to their common denominator along an axis.
+
+    Parameters
+    ----------
+    x: array, (...,3)
+    axis: int
+        axis of x[...,0] along which the common denominator is taken.
+
+    Returns
+    -------
+    num: array, (...,2)
+        numerators, (a,b) in (a+b*w)/den
+    den: array
+        common denominators, x.shape[:-1] with the axis kept as size 1.
+    """
+    global _overflow_count
+    x=as_array(x)
+    d=x[...,2]
+    if d.size==0:
+        den=np.ones(np.sum(d,axis=axis,keepdims=True).shape,dtype=x.dtype)
+        return x[...,:2],den
+    if x.dtype!=object and _overflow_check:
+        # running lcm, lcm(l,d)=(l/gcd(l,d))*d, is checked at each step
+        # so that the first step which may overflow is detected.
+        acc=np.lcm.accumulate(d,axis=axis)
+        l=np.concatenate([np.ones_like(np.take(d,[0],axis=axis)),np.delete(acc,-1,axis=axis)],axis=axis)
+        bound=(l//np.gcd(l,d)).astype(np.float64)*np.abs(d)
+        if bound.max()>=2.0**62 or np.abs(acc).max()*float(np.abs(x[...,:2]).max())>=2.0**62:
+            _overflow_count+=1
+            x=x.astype(object)
+            d=x[...,2]
+        else:
+            den=np.take(acc,[-1],axis=axis)
+            return x[...,:2]*(den//d)[...,np.newaxis],den
+    den=np.lcm.reduce(d,axis=axis,keepdims=True)
+    num=x[...,:2]*(den//d)[...,np.newaxis]
+    return num,den
+
+def sum_batch(x: NDArray[np.int64], axis: int=0, normalize: bool=True) -> NDArray[np.int64]:
+    """summation of a set of values along an axis.
+
+    The values are brought to their common denominator and summed as
+    integers, followed by a single gcd reduction.
+
+    Parameters
+    ----------
+    x: array, (...,3)
+    axis: int
+        axis of x[...,0] along which the values are summed.
+    normalize: bool
+        False: the gcd reduction is deferred (see lazy_reduce()).
+
+    Returns
+    -------
+    array, (...,3) without the axis
+    """
+    global _overflow_count
+    x=as_array(x)
+    axis=axis%(x.ndim-1)
+    num,den=common_denominator(x,axis=axis)
+    if num.dtype!=object and _overflow_check and num.size!=0 and num.shape[axis]*int(np.abs(num).max())>INT64_MAX:
+        _overflow_count+=1
+        num=num.astype(object)
+    den=np.squeeze(den,axis=axis)
+    c=np.empty(den.shape+(3,),dtype=np.result_type(num,den))
+    c[...,:2]=np.sum(num,axis=axis)
+    c[...,2]=den
+    return normalize_batch(c) if normalize else lazy_reduce(c)
+
+def dot_product_batch(mat1: NDArray[np.int64], mat2:NDArray[np.int64], field: tuple, normalize: bool=True) -> NDArray[np.int64]:
+    """product of stacks of matrices, mat1*mat2.
+
+    The product is reduced to integer matrix products of the rational
+    and irrational parts over common denominators of the rows of mat1
+    and the columns of mat2, followed by a single gcd reduction.
+
+    Parameters
+    ----------
+    mat1: ndarray
+        (...,s,t,3)
+    mat2: ndarray
+        (...,t,u,3), leading dimensions broadcastable with mat1
+    field: tuple
+        (p,q,r), where r*w**2 = p+q*w
+    normalize: bool
+        False: the gcd reduction is deferred (see lazy_reduce()).
+
+    Returns
+    -------
+    product: array, (...,s,u,3)
+    """
+    p,q,r=field
+    mat1=as_array(mat1)
+    mat2=as_array(mat2)
+    t=mat1.shape[-2]
+    if mat1.ndim<3 or mat2.ndim<3 or t!=mat2.shape[-3]:
+        print('incorrect shape found in dot_product')
+        return
+    n1,d1=common_denominator(mat1,axis=-1) # (...,s,t,2), (...,s,1)
+    n2,d2=common_denominator(mat2,axis=-2) # (...,t,u,2), (...,1,u)
+    n1,n2=promote(n1,n2,1,1,(2*r+abs(p)+abs(q))*max(t,1))
+    d1,d2=promote(d1,d2,1,1,r)
+    a0,a1=n1[...,0],n1[...,1]
+    b0,b1=n2[...,0],n2[...,1]
+    a1b1=np.matmul(a1,b1)
+    c0=r*np.matmul(a0,b0)+p*a1b1
+    c=np.empty(c0.shape+(3,),dtype=np.result_type(c0,d1,d2))
+    c[...,0]=c0
+    c[...,1]=r*(np.matmul(a0,b1)+np.matmul(a1,b0))+q*a1b1
+    c[...,2]=r*d1*d2
+    return normalize_batch(c) if normalize else lazy_reduce(c)
+
+def dot_product_1_batch(mat1: NDArray[np.int64], mat2:NDArray[np.int64], normalize: bool=True) -> NDArray[np.int64]:
+    """product of stacks of integer matrices and matrices of values, mat1*mat2.
+
+    Parameters
+    ----------
+    mat1: ndarray
+        (...,s,t), integer
+    mat2: ndarray
+        (...,t,u,3), leading dimensions broadcastable with mat1
+    normalize: bool
+        False: the gcd reduction is deferred (see lazy_reduce()).
+
+    Returns
+    -------
+    product: array, (...,s,u,3)
+    """
+    mat1=np.rint(mat1).astype(np.int64)
+    mat2=as_array(mat2)
+    t=mat1.shape[-1]
+    if mat1.ndim<2 or mat2.ndim<3 or t!=mat2.shape[-3]:
+        print('incorrect shape found in dot_product')
+        return
+    n2,d2=common_denominator(mat2,axis=-2) # (...,t,u,2), (...,1,u)
+    mat1,n2=promote(mat1,n2,1,1,max(t,1))
+    c0=np.matmul(mat1,n2[...,0])
+    c=np.empty(c0.shape+(3,),dtype=c0.dtype)
+    c[...,0]=c0
+    c[...,1]=np.matmul(mat1,n2[...,1])
+    c[...,2]=d2
+    return normalize_batch(c) if normalize else lazy_reduce(c)
+
+def det_matrix_batch(mtx: NDArray[np.int64], field: tuple, normalize: bool=True) -> NDArray[np.int64]:
+    """Determinants of a set of 3x3 matrices.
+
+    Each matrix is brought to the common denominator of its elements,
+    and the determinant is computed on the integer numerators.
+
+    Parameters
+    ----------
+    mtx: array, (...,3,3,3)
+        3x3 matrices
+    field: tuple
+        (p,q,r), where r*w**2 = p+q*w
+    normalize: bool
+        False: the gcd reduction is deferred (see lazy_reduce()).
+
+    Returns
+    -------
+    array, (...,3)
+        determinants
+    """
+    p,q,r=field
+    def mul_num(a,b):
+        # r*(a0+a1*w)*(b0+b1*w); the output keeps the operand dtype, as
+        # np.stack would re-infer int64 from 0-d object results.
+        c=np.empty(a.shape[:-1]+(2,),dtype=np.result_type(a,b))
+        c[...,0]=r*a[...,0]*b[...,0]+p*a[...,1]*b[...,1]
+        c[...,1]=r*(a[...,0]*b[...,1]+a[...,1]*b[...,0])+q*a[...,1]*b[...,1]
+        return c
+
+    mtx=as_array(mtx)
+    shape=mtx.shape[:-3]
+    num,den=common_denominator(mtx.reshape(shape+(9,3)),axis=-1)
+    num,_=promote(num,num,1,2,6*(2*r+abs(p)+abs(q))**2)
+    if num.dtype==object or (_overflow_check and den.size!=0 and r*r*int(den.max())**3>INT64_MAX):
+        num,den=num.astype(object),den.astype(object)
+    m=num.reshape(shape+(3,3,2))
+    # cofactor expansion along the first row, r**2*det
+    c0=mul_num(m[...,1,1,:],m[...,2,2,:])-mul_num(m[...,1,2,:],m[...,2,1,:])
+    c1=mul_num(m[...,1,2,:],m[...,2,0,:])-mul_num(m[...,1,0,:],m[...,2,2,:])
+    c2=mul_num(m[...,1,0,:],m[...,2,1,:])-mul_num(m[...,1,1,:],m[...,2,0,:])
+    d=mul_num(m[...,0,0,:],c0)+mul_num(m[...,0,1,:],c1)+mul_num(m[...,0,2,:],c2)
+    c=np.empty(shape+(3,),dtype=d.dtype)
+    c[...,:2]=d
+    c[...,2]=r*r*den[...,0]**3
+    return normalize_batch(c) if normalize else lazy_reduce(c)
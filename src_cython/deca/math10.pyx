@@ -6,6 +6,7 @@ import sys
 import numpy as np
 cimport numpy as np
 cimport cython
+from pyqcstrc import qfield
 
 DTYPE_double = np.float64
 DTYPE_int = int
@@ -19,84 +20,24 @@ cdef np.ndarray M4=np.array([-1, 0, 2])
 cdef np.ndarray M5=np.array([ 0, 1, 1])
 cdef np.ndarray M6=np.array([ 0,-1, 1])
 
+# arithmetic in SIN-style is shared with pyqcstrc.dode2 (see pyqcstrc.qfield)
+FIELD=(3,0,4)
+
 cpdef list add(DTYPE_int_t p1,DTYPE_int_t p2,DTYPE_int_t p3,DTYPE_int_t q1,DTYPE_int_t q2,DTYPE_int_t q3): # A+B
-    cdef DTYPE_int_t c1,c2,c3,gcd
-    cdef np.ndarray[DTYPE_int_t,ndim=1] x
-    c1=p1*q3+q1*p3
-    c2=p2*q3+q2*p3
-    c3=p3*q3
-    x=np.array([c1,c2,c3])
-    gcd=np.gcd.reduce(x)
-    if c3/gcd<0:
-        return [int(-c1/gcd),int(-c2/gcd),int(-c3/gcd)]
-    else:
-        return [int(c1/gcd),int(c2/gcd),int(c3/gcd)]
+    return qfield.add_batch([p1,p2,p3],[q1,q2,q3]).tolist()
 
 cpdef list sub(DTYPE_int_t p1,DTYPE_int_t p2,DTYPE_int_t p3,DTYPE_int_t q1,DTYPE_int_t q2,DTYPE_int_t q3): # A-B
-    cdef DTYPE_int_t c1,c2,c3,gcd
-    cdef np.ndarray[DTYPE_int_t,ndim=1] x
-    c1=p1*q3-q1*p3
-    c2=p2*q3-q2*p3
-    c3=p3*q3
-    x=np.array([c1,c2,c3])
-    gcd=np.gcd.reduce(x)
-    if c3/gcd<0:
-        return [int(-c1/gcd),int(-c2/gcd),int(-c3/gcd)]
-    else:
-        return [int(c1/gcd),int(c2/gcd),int(c3/gcd)]
+    return qfield.sub_batch([p1,p2,p3],[q1,q2,q3]).tolist()
 
 cpdef list mul(DTYPE_int_t p1,DTYPE_int_t p2,DTYPE_int_t p3,DTYPE_int_t q1,DTYPE_int_t q2,DTYPE_int_t q3): # A*B
-    cdef DTYPE_int_t c1,c2,c3,gcd
-    cdef np.ndarray[DTYPE_int_t,ndim=1] x
-    c1=4*p1*q1+3*p2*q2
-    c2=4*(p1*q2+p2*q1)
-    c3=4*p3*q3
-    x=np.array([c1,c2,c3])
-    gcd=np.gcd.reduce(x)
-    #print('c1,c2,c3,gcd = %d %d %d %d'%(c1,c2,c3,gcd))
-    if c3/gcd<0:
-        return [int(-c1/gcd),int(-c2/gcd),int(-c3/gcd)]
-    else:
-        return [int(c1/gcd),int(c2/gcd),int(c3/gcd)]
+    return qfield.mul_batch([p1,p2,p3],[q1,q2,q3],FIELD).tolist()
 
 cpdef list div(DTYPE_int_t p1,DTYPE_int_t p2,DTYPE_int_t p3,DTYPE_int_t q1,DTYPE_int_t q2,DTYPE_int_t q3): # A/B
-    cdef DTYPE_int_t c1,c2,c3,gcd
-    cdef np.ndarray[DTYPE_int_t,ndim=1] x
     if q1==0 and q2==0:
         print('ERROR_1:division error')
         return 1
     else:
-        if p1==0 and p2==0:
-            return [0,0,1]
-        else:
-            if q1!=0 and q2!=0:
-                if 4*q1**2-3*q2**2!=0:
-                    c1=q3*(4*p1*q1-3*p2*q2)
-                    c2=-4*q3*(p1*q2-p2*q1)
-                    c3=p3*(4*q1**2-3*q2**2)
-                else:
-                    c1=3*p2*q3
-                    c2=4*p1*q3
-                    c3=6*p3*q2
-            elif q1==0 and q2!=0:
-                c1=3*p2*q3
-                c2=4*p1*q3
-                c3=3*p3*q2
-            else:
-            #elif q1!=0 and q2==0:
-                c1=p1*q3
-                c2=p2*q3
-                c3=p3*q1
-            x=np.array([c1,c2,c3])
-            gcd=np.gcd.reduce(x)
-            if gcd!=0:
-                if c3/gcd<0:
-                    return [int(-c1/gcd),int(-c2/gcd),int(-c3/gcd)]
-                else:
-                    return [int(c1/gcd),int(c2/gcd),int(c3/gcd)]
-            else:
-                print('ERROR_2:division error',c1,c2,c3,p1,p2,p3,q1,q2,q3)
-                return 1
+        return qfield.div_batch([p1,p2,p3],[q1,q2,q3],FIELD).tolist()
 
 cpdef int gcd(DTYPE_int_t p1,DTYPE_int_t p2,DTYPE_int_t p3):
     cdef np.ndarray[DTYPE_int_t,ndim=1] x